@@ -0,0 +1,186 @@
+"""
+Prüfung der Alexa Request-Signatur (`SignatureCertChainUrl` + `Signature-256`) und des Zeitstempels.
+
+Die Zertifikatskette wird pro URL genau einmal geladen und gegen die vertrauenswürdigen Roots
+(certifi) geprüft. Danach liegt nur noch der öffentliche Schlüssel des Leaf-Zertifikats im Cache
+(bis zu dessen Ablauf). Pro Request bleibt damit eine RSA-Signaturprüfung übrig (deutlich < 1 ms).
+
+Fehlgeschlagene URLs (nicht erreichbar, kein gültiges PEM, Kette ungültig) werden für
+`FAILED_CERT_URL_TTL_SECONDS` gemerkt, damit gefälschte Requests keine neuen Downloads auslösen.
+
+Aktivierung: `ALEXA_VERIFY_SIGNATURE=true`.
+"""
+import asyncio
+import base64
+import logging
+import posixpath
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+import certifi
+import httpx
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.x509.verification import DNSName, PolicyBuilder, Store, VerificationError
+
+from const import ALEXA_TIMESTAMP_TOLERANCE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ALEXA_CERT_HOST = "s3.amazonaws.com"
+ALEXA_CERT_PATH_PREFIX = "/echo.api/"
+ALEXA_CERT_SAN = "echo-api.amazon.com"
+FAILED_CERT_URL_TTL_SECONDS = 60
+
+
+class SignatureVerificationError(Exception):
+    """Request stammt nicht (nachweisbar) von Alexa oder ist zu alt."""
+
+
+def validate_cert_chain_url(url: str) -> None:
+    parsed = urlparse(url)
+    path = posixpath.normpath(parsed.path) if parsed.path else ""
+    if (
+        parsed.scheme.lower() != "https"
+        or (parsed.hostname or "").lower() != ALEXA_CERT_HOST
+        or not path.startswith(ALEXA_CERT_PATH_PREFIX)
+        or parsed.port not in (None, 443)
+    ):
+        raise SignatureVerificationError(f"Ungültige SignatureCertChainUrl: {url}")
+
+
+async def _download_pem(url: str) -> bytes:
+    async with httpx.AsyncClient() as http_client:
+        response = await http_client.get(url, timeout=5.0)
+        response.raise_for_status()
+        return response.content
+
+
+class _CachedCert:
+    def __init__(self, public_key, not_after: datetime):
+        self.public_key = public_key
+        self.not_after = not_after
+
+
+class AlexaSignatureVerifier:
+    def __init__(
+        self,
+        trusted_roots: Optional[List[x509.Certificate]] = None,
+        fetch_pem: Callable[[str], Awaitable[bytes]] = _download_pem,
+        timestamp_tolerance_seconds: int = ALEXA_TIMESTAMP_TOLERANCE_SECONDS,
+        failed_url_ttl_seconds: float = FAILED_CERT_URL_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._trusted_roots = trusted_roots
+        self._fetch_pem = fetch_pem
+        self.timestamp_tolerance_seconds = timestamp_tolerance_seconds
+        self.failed_url_ttl_seconds = failed_url_ttl_seconds
+        self._clock = clock
+        self._store: Optional[Store] = None
+        self._certs: Dict[str, _CachedCert] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        # URL -> (Zeitpunkt, Fehler) fehlgeschlagener Ladeversuche
+        self._failed: Dict[str, Tuple[float, SignatureVerificationError]] = {}
+
+    def _trust_store(self) -> Store:
+        # certifi einmalig laden (~150 Roots), nicht pro Request
+        if self._store is None:
+            roots = self._trusted_roots
+            if roots is None:
+                with open(certifi.where(), "rb") as f:
+                    roots = x509.load_pem_x509_certificates(f.read())
+            self._store = Store(roots)
+        return self._store
+
+    async def _load_cert(self, url: str) -> _CachedCert:
+        start = time.perf_counter()
+        try:
+            pem = await self._fetch_pem(url)
+        except Exception as e:
+            raise SignatureVerificationError(f"Zertifikatskette nicht ladbar: {e}") from e
+        try:
+            chain = x509.load_pem_x509_certificates(pem)
+        except ValueError as e:
+            raise SignatureVerificationError(f"Zertifikatskette kein gültiges PEM: {e}") from e
+        if not chain:
+            raise SignatureVerificationError("Zertifikatskette leer")
+        leaf, intermediates = chain[0], chain[1:]
+
+        verifier = PolicyBuilder().store(self._trust_store()).build_server_verifier(DNSName(ALEXA_CERT_SAN))
+        try:
+            verifier.verify(leaf, intermediates)
+        except VerificationError as e:
+            raise SignatureVerificationError(f"Zertifikatskette ungültig: {e}") from e
+
+        logger.info(f"Alexa Zertifikat geprüft und gecached ({(time.perf_counter() - start) * 1000:.0f} ms): {url}")
+        return _CachedCert(leaf.public_key(), leaf.not_valid_after_utc)
+
+    async def _public_key(self, url: str):
+        cached = self._certs.get(url)
+        if cached and cached.not_after > datetime.now(timezone.utc):
+            return cached.public_key
+
+        failed = self._failed.get(url)
+        if failed is not None:
+            if self._clock() - failed[0] < self.failed_url_ttl_seconds:
+                raise failed[1]
+            del self._failed[url]
+
+        # Gleichzeitige Requests mit neuer URL teilen sich einen Download
+        task = self._pending.get(url)
+        if task is None:
+            task = asyncio.create_task(self._load_cert(url))
+            self._pending[url] = task
+            task.add_done_callback(lambda _: self._pending.pop(url, None))
+        try:
+            cached = await asyncio.shield(task)
+        except SignatureVerificationError as e:
+            self._failed[url] = (self._clock(), e)
+            logger.warning(f"Alexa Zertifikat nicht verwendbar: {e}")
+            raise
+        self._certs[url] = cached
+        return cached.public_key
+
+    def check_timestamp(self, timestamp: Optional[str]) -> None:
+        try:
+            request_time = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            raise SignatureVerificationError(f"Ungültiger Zeitstempel: {timestamp}")
+        if request_time.tzinfo is None:
+            request_time = request_time.replace(tzinfo=timezone.utc)
+        age = abs((datetime.now(timezone.utc) - request_time).total_seconds())
+        if age > self.timestamp_tolerance_seconds:
+            raise SignatureVerificationError(f"Zeitstempel zu alt: {age:.0f} s")
+
+    async def verify(self, headers: Mapping[str, str], body: bytes, timestamp: Optional[str]) -> None:
+        """Wirft `SignatureVerificationError`, wenn Signatur, Zertifikat oder Zeitstempel nicht passen."""
+        url = headers.get("signaturecertchainurl")
+        signature_256 = headers.get("signature-256")
+        signature = signature_256 or headers.get("signature")
+        if not url or not signature:
+            raise SignatureVerificationError("Signatur-Header fehlen")
+        validate_cert_chain_url(url)
+
+        public_key = await self._public_key(url)
+        try:
+            public_key.verify(
+                base64.b64decode(signature),
+                body,
+                padding.PKCS1v15(),
+                hashes.SHA256() if signature_256 else hashes.SHA1(),
+            )
+        except (InvalidSignature, ValueError) as e:
+            raise SignatureVerificationError("Signatur ungültig") from e
+
+        self.check_timestamp(timestamp)
+
+    def clear(self) -> None:
+        self._certs.clear()
+        self._failed.clear()
+
+
+alexa_signature_verifier = AlexaSignatureVerifier()
@@ -0,0 +1,28 @@
+"""
+Pydantic Models für die generischen (nicht Alexa-spezifischen) Query-Endpunkte.
+"""
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class QueryRequest(BaseModel):
+    text: str = Field(..., min_length=1, description="Freitext-Anfrage, z.B. 'Lohnt sich die Waschmaschine?'")
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=20, description="Mehrere Freitext-Anfragen")
+
+
+class BatchQueryItem(BaseModel):
+    query: str
+    category: Optional[str] = None
+    text: Optional[str] = None
+    error: Optional[str] = None
+    duration_ms: float
+
+
+class BatchQueryResponse(BaseModel):
+    items: List[BatchQueryItem]
+    context_ms: Optional[float] = None
+    total_ms: float
@@ -0,0 +1,89 @@
+"""
+Cache für vorberechnete Energie-Beratungen pro Gerät (gefüllt von `advice_precompute.py`).
+"""
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from const import ADVICE_CACHE_MAX_AGE_SECONDS, ADVICE_RECOMPUTE_AFTER_SECONDS
+
+# Ab welcher Änderung ein Energie-Wert als "wesentlich" gilt (Bucket-Größe pro Key aus ENERGY_MAPPING)
+FINGERPRINT_BUCKETS = {
+    "netz_saldo_watt": 250,
+    "pv_aktuell_watt": 250,
+    "pv_rest_prognose_kwh": 1,
+    "batterie_haus_prozent": 10,
+    "batterie_auto_prozent": 10,
+    "aktuelle-co2-prozent": 5,
+    "niedrigste-co2-prozent": 5,
+    "waschkueche_power": 250,
+    "haus_power": 250,
+}
+
+
+def energy_fingerprint(energy_context: Dict[str, Any]) -> Tuple:
+    """
+    Vergröberter Abdruck des Energie-Contexts: Gleicher Abdruck -> gleiche Beratung.
+    Numerische Werte werden auf ihren Bucket gerundet, alles andere exakt verglichen.
+    """
+    items = []
+    for key in sorted(energy_context):
+        val = energy_context[key]
+        bucket = FINGERPRINT_BUCKETS.get(key)
+        if bucket and isinstance(val, (int, float)):
+            val = round(val / bucket)
+        items.append((key, val))
+    return tuple(items)
+
+
+def _device_key(device: Optional[str]) -> Optional[str]:
+    return device.strip().lower() if device else None
+
+
+class AdviceEntry:
+    def __init__(self, text: str, fingerprint: Tuple):
+        self.text = text
+        self.fingerprint = fingerprint
+        self.computed_at = time.monotonic()
+        self.checked_at = self.computed_at
+
+
+class AdviceCache:
+    def __init__(self, max_age_seconds: int, recompute_after_seconds: int):
+        self.max_age_seconds = max_age_seconds
+        self.recompute_after_seconds = recompute_after_seconds
+        self._entries: Dict[str, AdviceEntry] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_age_seconds > 0
+
+    def get_fresh(self, device: Optional[str]) -> Optional[str]:
+        """Antwort für das Gerät, falls sie seit der letzten Prüfung nicht veraltet ist."""
+        entry = self._entries.get(_device_key(device))
+        if not self.enabled or entry is None:
+            return None
+        if time.monotonic() - entry.checked_at > self.max_age_seconds:
+            return None
+        return entry.text
+
+    def put(self, device: str, text: str, fingerprint: Tuple) -> None:
+        if self.enabled:
+            self._entries[_device_key(device)] = AdviceEntry(text, fingerprint)
+
+    def needs_recompute(self, device: str, fingerprint: Tuple) -> bool:
+        entry = self._entries.get(_device_key(device))
+        if entry is None or entry.fingerprint != fingerprint:
+            return True
+        return time.monotonic() - entry.computed_at > self.recompute_after_seconds
+
+    def confirm(self, device: str) -> None:
+        """Die Energie-Werte haben sich nicht wesentlich geändert -> Antwort bleibt gültig."""
+        entry = self._entries.get(_device_key(device))
+        if entry is not None:
+            entry.checked_at = time.monotonic()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+advice_cache = AdviceCache(ADVICE_CACHE_MAX_AGE_SECONDS, ADVICE_RECOMPUTE_AFTER_SECONDS)
@@ -1,106 +1,173 @@
-import json
-from typing import List, Any, Dict
+import logging
+from typing import List, Any, AsyncIterator, Dict, Optional, Tuple
+from category_handler.advice_cache import advice_cache, energy_fingerprint
 from category_handler.base import BaseHandler, HandlerResult
-from genai_client.client import get_client
-from const import tools_schema
+from category_handler.tool_dispatch import ToolDispatcher, extract_function_calls
+from genai_client.client import get_client, stream_text
+from genai_client.hedging import hedging_policy
+from const import tools_schema, ADVICE_DEVICES, AI_HANDLER_MODEL_NAME
+from serialization.fragment_cache import prompt_json
+
+logger = logging.getLogger(__name__)
+
+# Statischer Prompt-Teil: bei jedem Request gleich -> system_instruction (als Cached Content, siehe PromptCache)
+SYSTEM_INSTRUCTION = """
+Du bist ein Energieberater aus einem Smart Home.
+
+[KONTEXT]
+Im Input stehen die aktuellen Energie-Werte und der Verlauf der letzten 7 Tage.
+Im Verlauf zeigt das Array die Differenz zum Vortag (z.B. Verbrauch gestern, vorgestern...).
+Index 0 = Gestern, Index 1 = Vorgestern, usw.
+
+[ENTSCHEIDUNGS-LOGIK]
+Der User will Beratung über den Zeitpunkt, wann er das genannte Gerät nutzen sollte.
+
+BERATUNG / FRAGE ("Soll ich", "Ist jetzt guter Zeitpunkt")
+Antworte nur mit Text basierend auf diesen Regeln:
+        - Formulierung: kurzer Satz bis höchstens 30 Wörter, wenn möglich konkrete Sensorwerte mit eintragen, die zur Entscheidung geführt haben.
+        - WICHTIG: Nutze die Historie!
+            - Wenn der historische Verbrauch über PV Prognose liegt, diese gar nicht mehr empfehlen.
+        - Bitte nenne Uhrzeiten in deutscher Zeitzone.
+        - Wenn Du Zukunfstwerte zeigst (co2 Intensität z.B.), nenne auch den aktuellen Wert.
+        - Annahmen / Rahmenbedingungen:
+            'netz_saldo_watt' Positiv bedeutet Netzbezug, negativ PV-Einspeisung.
+            'sensor.senec_house_power' ist der Hausverbrauch
+            'sensor.senec_wallbox_1_power' ist der Wallbox Verbrauch, nicht im Hausverbrauch enthalten.
+            'sensor.shelly_ac_em1_power' ist der Verbrauch der Wärmepumpe, ist im Hausverbrauch enthalten.
+            'aktuelle-co2-prozent': aktuelle CO2 Prozent im Strommix, unter 30% ist sauber.
+            'niedrigste-co2-prozent': niedrigster co2 prozentsatz im Strommix in den nächsten Stunden
+            'niedrigste-co2-uhrzeit': uhrzeit, wann strom am saubersten sein wird.
+            'batterie_haus_prozent und sensor.senec_battery_state_power'. Nehme 10kWh Akku an, negative Power bedeutet Akku entlädt
+            'waschkueche_power' ist die Summe des aktuellen Verbrauchs von Waschmaschine und Trockner.
+            Geräte: Spülmaschine rechne 2500W, Waschmaschine rechne 1000W, Trockner rechne 600W.
+        - Empfehle 'JETZT', wenn der Überschuss für den typischen Geräteverbrauch reicht (netz_saldo_watt < (-Geräteverbrauch)).
+        - ansonsten Empfehle 'WARTEN', wenn 'pv_rest_prognose_kwh' voraussichtlich ausreicht:
+                    - nicht wenn Akku < 50% und < 7kWh für heute prognostiziert
+        - ansonsten Empfehle 'SPÄTER/NACHTS'
+                    - falls aktuelle-co2-prozent gerade nicht sauber ist,
+                        und niedrigste-co2-prozent mindestens 25% niedriger ist
+                        und niedrigste-co2-uhrzeit mindestens 2h in der Zukunft ist
+        - ansonsten Empfehle 'EGAL' und liefere kurze Begründung, weshalb es egal ist.
+
+[BEISPIELE - LERNE DARAUS!]
+Input: "Device: Waschmaschine"
+Antwort: "Ja, mach an! Wir speisen gerade 2500 Watt ein."
+
+Input: "Device: Trockner"
+Antwort: "Lieber warten. Aktuell kein Überschuss, aber später kommt Sonne."
+
+Input: "Device: Auto"
+Antwort: "Es gibt heute keinen PV Strom mehr, aber CO2 Intensität wird um 18:00 niedrig sein."
+
+Input: "Device: Auto"
+Antwort: "Es gibt heute keinen PV Strom mehr, und CO2 Intensität wird nicht mehr besser."
+"""
+LLM_CONFIG = {"system_instruction": SYSTEM_INSTRUCTION, "tools": [{"function_declarations": tools_schema}]}
+
+
+def resolve_device(parameters: List[Any]) -> Optional[str]:
+    """
+    Bekanntes Gerät aus ADVICE_DEVICES, wenn der Parameter genau dieser Slot-Wert ist ("Waschmaschine").
+    Freitext ("Waschmaschine morgen um 8?") gibt `None`: Er geht immer ans LLM und wird nicht gecacht,
+    sonst bekäme die spezielle Frage die allgemeine Antwort (und umgekehrt).
+    """
+    if not parameters:
+        return None
+    value = str(parameters[0]).strip().lower()
+    for device in ADVICE_DEVICES:
+        if device.lower() == value:
+            return device
+    return None
 
-AI_MODEL_NAME = "gemini-flash-lite-latest"
 
 class AdviceHandler(BaseHandler):
     async def execute(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> HandlerResult:
-        print("AdviceHandler aufgerufen.")
-        response_text = "Fehler."
-        
+        logger.info("AdviceHandler aufgerufen.")
+
+        # Vorberechnete Antwort (Hintergrund-Job) sofort zurückgeben, solange sie nicht veraltet ist
+        device = resolve_device(parameters)
+        cached_text = advice_cache.get_fresh(device)
+        if cached_text:
+            logger.info(f"Vorberechnete Beratung für {device}.")
+            return HandlerResult(text=cached_text)
+
         smart_home_context = await ha_service.get_smart_home_context()
+        response_text, cacheable = await self.generate_advice(smart_home_context, parameters, ha_service)
 
-        print(f"Energie-Werte: {json.dumps(smart_home_context['energy_context'])}")
-        system_prompt = f"""
-            Du bist ein Energieberater aus einem Smart Home.
-            
-            [KONTEXT]
-            Energie-Werte: {json.dumps(smart_home_context["energy_context"])}
-            
-            [KONTEXT - Verlauf (Letzte 7 Tage)]
-            Das Array zeigt die Differenz zum Vortag (z.B. Verbrauch gestern, vorgestern...).
-            Index 0 = Gestern, Index 1 = Vorgestern, usw.
-            Historie: {json.dumps(smart_home_context.get("energy_history", {}))}
-            
-            [ENTSCHEIDUNGS-LOGIK]
-            Der User will Beratung über den Zeitpunkt, wann er das genannte Gerät nutzen sollte.
-            
-            BERATUNG / FRAGE ("Soll ich", "Ist jetzt guter Zeitpunkt")
-            Antworte nur mit Text basierend auf diesen Regeln:
-                    - Formulierung: kurzer Satz bis höchstens 30 Wörter, wenn möglich konkrete Sensorwerte mit eintragen, die zur Entscheidung geführt haben.
-                    - WICHTIG: Nutze die Historie! 
-                        - Wenn der historische Verbrauch über PV Prognose liegt, diese gar nicht mehr empfehlen.
-                    - Bitte nenne Uhrzeiten in deutscher Zeitzone.
-                    - Wenn Du Zukunfstwerte zeigst (co2 Intensität z.B.), nenne auch den aktuellen Wert.
-                    - Annahmen / Rahmenbedingungen:    
-                        'netz_saldo_watt' Positiv bedeutet Netzbezug, negativ PV-Einspeisung.
-                        'sensor.senec_house_power' ist der Hausverbrauch
-                        'sensor.senec_wallbox_1_power' ist der Wallbox Verbrauch, nicht im Hausverbrauch enthalten.
-                        'sensor.shelly_ac_em1_power' ist der Verbrauch der Wärmepumpe, ist im Hausverbrauch enthalten.
-                        'aktuelle-co2-prozent': aktuelle CO2 Prozent im Strommix, unter 30% ist sauber. 
-                        'niedrigste-co2-prozent': niedrigster co2 prozentsatz im Strommix in den nächsten Stunden
-                        'niedrigste-co2-uhrzeit': uhrzeit, wann strom am saubersten sein wird. 
-                        'batterie_haus_prozent und sensor.senec_battery_state_power'. Nehme 10kWh Akku an, negative Power bedeutet Akku entlädt
-                        'waschkueche_power' ist die Summe des aktuellen Verbrauchs von Waschmaschine und Trockner.
-                        Geräte: Spülmaschine rechne 2500W, Waschmaschine rechne 1000W, Trockner rechne 600W.    
-                    - Empfehle 'JETZT', wenn der Überschuss für den typischen Geräteverbrauch reicht (netz_saldo_watt < (-Geräteverbrauch)).
-                    - ansonsten Empfehle 'WARTEN', wenn 'pv_rest_prognose_kwh' voraussichtlich ausreicht:
-                                - nicht wenn Akku < 50% und < 7kWh für heute prognostiziert
-                    - ansonsten Empfehle 'SPÄTER/NACHTS'
-                                - falls aktuelle-co2-prozent gerade nicht sauber ist, 
-                                    und niedrigste-co2-prozent mindestens 25% niedriger ist 
-                                    und niedrigste-co2-uhrzeit mindestens 2h in der Zukunft ist 
-                    - ansonsten Empfehle 'EGAL' und liefere kurze Begründung, weshalb es egal ist.
-            
-            [BEISPIELE - LERNE DARAUS!]
-            Input: "Device: Waschmaschine"
-            Antwort: "Ja, mach an! Wir speisen gerade 2500 Watt ein."
-            
-            Input: "Device: Trockner"
-            Antwort: "Lieber warten. Aktuell kein Überschuss, aber später kommt Sonne."
-            
-            Input: "Device: Auto"
-            Antwort: "Es gibt heute keinen PV Strom mehr, aber CO2 Intensität wird um 18:00 niedrig sein."
-            
-            Input: "Device: Auto"
-            Antwort: "Es gibt heute keinen PV Strom mehr, und CO2 Intensität wird nicht mehr besser."
-            
-            Input: "{parameters}"
-            """
+        if cacheable and device:
+            advice_cache.put(device, response_text, energy_fingerprint(smart_home_context["energy_context"]))
+
+        return HandlerResult(text=response_text)
+
+    async def generate_advice(self, smart_home_context: Dict[str, Any], parameters: List[Any], ha_service: Any = None) -> Tuple[str, bool]:
+        """
+        Erzeugt die Beratung für den gegebenen Context.
+        Gibt (Antworttext, cachebar) zurück – Antworten mit Tool Call oder Fehler werden nicht gecacht.
+        Ohne `ha_service` (Vorberechnung) werden Tool Calls nicht ausgeführt.
+        """
+        response_text = "Fehler."
+        cacheable = False
+
+        logger.info("Energie-Werte", extra={"payload": smart_home_context["energy_context"]})
         # --- PROMPT BAUEN ---
+        prompt = self.build_prompt(smart_home_context, parameters)
 
         try:
-            response = get_client().models.generate_content(
-                model=AI_MODEL_NAME,
-                contents=system_prompt,
-                config={"tools": [{"function_declarations": tools_schema}]},
+            # Mit Timeout und Hedging, über den gemeinsamen Scheduler (Quote, Priorität, Retry bei 429)
+            response = await hedging_policy.generate_content(
+                get_client(),
+                model=AI_HANDLER_MODEL_NAME,
+                contents=prompt,
+                config=LLM_CONFIG,
             )
 
-            # Tool Call Check (v2 SDK Style)
-            tool_called = False
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if part.function_call:
-                        tool_called = True
-                        fc = part.function_call
-                        if fc.name == "control_device":
-                            eid = fc.args.get("entity_id")
-                            act = fc.args.get("action")
-                            dom = eid.split(".")[0] if "." in eid else ""
-                            if await ha_service.execute_ha_service(dom, act, eid):
-                                response_text = f"Okay, {act} für {eid} ausgeführt."
-                            else:
-                                response_text = f"Fehler beim Schalten von {eid}."
-                        break
-
-            if not tool_called:
+            # Tool Calls (alle, parallel) über den gemeinsamen Dispatcher – nicht bei der Vorberechnung
+            function_calls = extract_function_calls(response)
+            if function_calls and ha_service is not None:
+                dispatcher = ToolDispatcher(ha_service, smart_home_context.get("controllable_devices", []))
+                response_text = await dispatcher.dispatch(response)
+            elif not function_calls:
                 response_text = response.text if response.text else "Keine Antwort."
+                cacheable = bool(response.text)
 
         except Exception as e:
-            print(f"AI Error: {e}")
+            logger.error(f"AI Error: {e}")
             response_text = "Fehler im KI-Modell."
 
-        return HandlerResult(text=response_text)
+        return response_text, cacheable
+
+    def build_prompt(self, smart_home_context: Dict[str, Any], parameters: List[Any]) -> str:
+        """Nur der dynamische Teil (Live-Werte, Historie, Input); Regeln und Beispiele stehen in `SYSTEM_INSTRUCTION`."""
+        return f"""
+            [KONTEXT]
+            Energie-Werte: {prompt_json(smart_home_context["energy_context"])}
+            
+            [KONTEXT - Verlauf (Letzte 7 Tage)]
+            Historie: {prompt_json(smart_home_context.get("energy_history", {}))}
+            
+            Input: "{parameters}"
+            """
+
+    async def stream(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> AsyncIterator[str]:
+        device = resolve_device(parameters)
+        cached_text = advice_cache.get_fresh(device)
+        if cached_text:
+            yield cached_text
+            return
+
+        smart_home_context = await ha_service.get_smart_home_context()
+        chunks = []
+        try:
+            # Reine Textantwort -> ohne Tools, Token für Token
+            async for text in stream_text(
+                AI_HANDLER_MODEL_NAME, self.build_prompt(smart_home_context, parameters), {"system_instruction": SYSTEM_INSTRUCTION}
+            ):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            logger.error(f"AI Error: {e}")
+            yield "Fehler im KI-Modell."
+            return
+
+        if chunks and device:
+            advice_cache.put(device, "".join(chunks), energy_fingerprint(smart_home_context["energy_context"]))
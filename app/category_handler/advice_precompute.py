@@ -0,0 +1,84 @@
+"""
+Hintergrund-Job: Berechnet die Energie-Beratung für alle Geräte aus `ADVICE_DEVICES` vor,
+sobald sich die relevanten Energie-Sensoren wesentlich ändern.
+Gestartet und gestoppt wird der Job über den Lifespan der App (`main.py`).
+"""
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
+
+from category_handler.advice_cache import AdviceCache, advice_cache, energy_fingerprint
+from category_handler.advice_handler import AdviceHandler
+from const import ADVICE_DEVICES, ADVICE_PRECOMPUTE_INTERVAL_SECONDS, Category
+from genai_client.scheduler import Priority, set_llm_priority
+from genai_client.usage import set_usage_labels
+
+logger = logging.getLogger(__name__)
+
+
+class AdvicePrecomputer:
+    def __init__(
+        self,
+        ha_service_factory: Callable[[], Any],
+        interval_seconds: int = ADVICE_PRECOMPUTE_INTERVAL_SECONDS,
+        devices: List[str] = ADVICE_DEVICES,
+        cache: AdviceCache = advice_cache,
+    ):
+        self.ha_service_factory = ha_service_factory
+        self.interval_seconds = interval_seconds
+        self.devices = devices
+        self.cache = cache
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0 and self.cache.enabled
+
+    async def refresh_once(self) -> List[str]:
+        """Holt den Context einmal und berechnet alle Geräte mit geändertem Abdruck neu."""
+        smart_home_context = await self.ha_service_factory().get_smart_home_context()
+        energy_context = smart_home_context.get("energy_context")
+        if not energy_context:
+            return []
+
+        fingerprint = energy_fingerprint(energy_context)
+        stale = [d for d in self.devices if self.cache.needs_recompute(d, fingerprint)]
+        for device in self.devices:
+            if device not in stale:
+                self.cache.confirm(device)
+
+        set_usage_labels(Category.ADVICE.name, "precompute")
+        # Hinter Sprach- und Chat-Anfragen anstellen, damit die Vorberechnung die Quote nicht aufbraucht
+        set_llm_priority(Priority.BACKGROUND)
+        handler = AdviceHandler()
+        results = await asyncio.gather(
+            *(handler.generate_advice(smart_home_context, [device]) for device in stale)
+        )
+        for device, (text, cacheable) in zip(stale, results):
+            if cacheable:
+                self.cache.put(device, text, fingerprint)
+
+        if stale:
+            logger.info(f"Energie-Beratung neu berechnet für: {', '.join(stale)}")
+        return stale
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh_once()
+            except Exception as e:
+                logger.error(f"Vorberechnung der Energie-Beratung fehlgeschlagen: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Any, Dict
+from typing import List, Any, AsyncIterator, Dict
 
 class HandlerResult:
     def __init__(self, text: str, should_end_session: bool = True, session_attributes: Dict[str, Any] = None):
@@ -11,3 +11,12 @@ class BaseHandler(ABC):
     @abstractmethod
     async def execute(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> HandlerResult:
         pass
+
+    async def stream(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> AsyncIterator[str]:
+        """
+        Liefert die Antwort in Text-Stücken (transportunabhängig, z.B. für SSE).
+        Standard: die komplette Antwort von `execute` als ein Stück. Handler mit reiner LLM-Textantwort
+        überschreiben das und streamen Token für Token.
+        """
+        result = await self.execute(parameters, ha_service, session_attributes, intent_name)
+        yield result.text
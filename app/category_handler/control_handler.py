@@ -1,60 +1,63 @@
-import json
+import logging
 from typing import List, Any, Dict
 from category_handler.base import BaseHandler, HandlerResult
-from const import tools_schema
+from category_handler.tool_dispatch import ToolDispatcher
+from const import tools_schema, AI_HANDLER_MODEL_NAME
 from genai_client.client import get_client
+from genai_client.hedging import hedging_policy
+from serialization.fragment_cache import prompt_json
+
+logger = logging.getLogger(__name__)
+
+# Statischer Prompt-Teil: bei jedem Request gleich -> system_instruction (als Cached Content, siehe PromptCache)
+SYSTEM_INSTRUCTION = """
+Du bist ein Smart Home Assistent.
+
+Anweisung:
+ Wenn der User etwas schalten will (Licht an/aus), NUTZE das Tool 'control_device'.
+ Betrifft es mehrere Geräte (z.B. alle Lichter im Erdgeschoss), rufe das Tool für JEDES Gerät einzeln auf.
+"""
+LLM_CONFIG = {"system_instruction": SYSTEM_INSTRUCTION, "tools": [{"function_declarations": tools_schema}]}
 
-AI_MODEL_NAME = "gemini-flash-lite-latest"
 
 class ControlHandler(BaseHandler):
     async def execute(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> HandlerResult:
-        print("ControlHandler aufgerufen.")
+        logger.info("ControlHandler aufgerufen.")
         response_text = "Fehler."
         
         smart_home_context = await ha_service.get_smart_home_context()
         
-        system_prompt = f"""
-                Du bist ein Smart Home Assistent.
-                
-                [KONTEXT]
-                Geräte: {json.dumps(smart_home_context.get("controllable_devices", []))}
-                
-                Anweisung:
-                 Wenn der User etwas schalten will (Licht an/aus), NUTZE das Tool 'control_device'.                
-                
-                Input: "{parameters}"
-                """
         # --- PROMPT BAUEN ---
+        prompt = self.build_prompt(smart_home_context, parameters)
 
         try:
-            response = get_client().models.generate_content(
-                model=AI_MODEL_NAME,
-                contents=system_prompt,
-                config={"tools": [{"function_declarations": tools_schema}]},
+            # Mit Timeout und Hedging, über den gemeinsamen Scheduler (Quote, Priorität, Retry bei 429)
+            response = await hedging_policy.generate_content(
+                get_client(),
+                model=AI_HANDLER_MODEL_NAME,
+                contents=prompt,
+                config=LLM_CONFIG,
             )
 
-            # Tool Call Check (v2 SDK Style)
-            tool_called = False
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if part.function_call:
-                        tool_called = True
-                        fc = part.function_call
-                        if fc.name == "control_device":
-                            eid = fc.args.get("entity_id")
-                            act = fc.args.get("action")
-                            dom = eid.split(".")[0] if "." in eid else ""
-                            if await ha_service.execute_ha_service(dom, act, eid):
-                                response_text = f"Okay, {act} für {eid} ausgeführt."
-                            else:
-                                response_text = f"Fehler beim Schalten von {eid}."
-                        break
-
-            if not tool_called:
+            # Tool Calls (alle, parallel) über den gemeinsamen Dispatcher
+            dispatcher = ToolDispatcher(ha_service, smart_home_context.get("controllable_devices", []))
+            tool_text = await dispatcher.dispatch(response)
+            if tool_text is not None:
+                response_text = tool_text
+            else:
                 response_text = response.text if response.text else "Keine Antwort."
 
         except Exception as e:
-            print(f"AI Error: {e}")
+            logger.error(f"AI Error: {e}")
             response_text = "Fehler im KI-Modell."
 
         return HandlerResult(text=response_text)
+
+    def build_prompt(self, smart_home_context: Dict[str, Any], parameters: List[Any]) -> str:
+        """Nur der dynamische Teil (Geräte + Input); die Anweisung steht in `SYSTEM_INSTRUCTION`."""
+        return f"""
+                [KONTEXT]
+                Geräte: {prompt_json(smart_home_context.get("controllable_devices", []))}
+                
+                Input: "{parameters}"
+                """
@@ -0,0 +1,79 @@
+"""
+Lokale Auswertungen des Smart Home Contexts, die mehrere Handler brauchen
+(LeaveHome-Zusammenfassung, Status-Fragen nach Fenstern usw.).
+
+Die Zugehörigkeit einer einzelnen Entität (`is_active_light`, `is_open_opening`, `is_high_consumer`)
+nutzt auch die materialisierte Sicht im HaService (`ha_service.leave_home_view`), die die drei
+Mengen bei Zustandsänderungen nachführt. Die Funktionen hier scannen den ganzen Context und
+dienen als Fallback, wenn der Context die fertige Zusammenfassung (`"leave_home"`) nicht enthält.
+
+Die Prädikate arbeiten auf `Entity`-Datensätzen (`ha_service.entities`); die Einträge der
+Zusammenfassung sind kleine Dicts für Prompt und Antwort-Templates.
+"""
+from typing import Any, Dict, List
+
+from const import LEAVE_HOME_EXCLUDED_AREAS, LEAVE_HOME_POWER_THRESHOLD_WATT
+from ha_service.entities import Entity, as_entities
+
+
+def _entry(e: Entity) -> Dict[str, Any]:
+    # `name` für Ansagen ohne Bereich (Lichter werden nicht nach Bereich gefiltert)
+    return {"eid": e.eid, "name": e.name, "area": e.area, "state": e.state}
+
+
+def is_active_light(e: Entity) -> bool:
+    return e.device_class.startswith("light") and e.state != "off"
+
+
+def is_open_opening(e: Entity) -> bool:
+    return bool(e.area) and e.device_class in ["window", "door"] and e.state not in ["off", "closed"]
+
+
+def is_high_consumer(
+    e: Entity,
+    threshold_watt: float = LEAVE_HOME_POWER_THRESHOLD_WATT,
+    excluded_areas: List[str] = LEAVE_HOME_EXCLUDED_AREAS,
+) -> bool:
+    return (
+        bool(e.area)
+        and e.area not in excluded_areas
+        and e.device_class == "power"
+        and e.value is not None
+        and e.value > threshold_watt
+    )
+
+
+def light_entry(e: Entity) -> Dict[str, Any]:
+    return _entry(e)
+
+
+def opening_entry(e: Entity) -> Dict[str, Any]:
+    return {**_entry(e), "device_class": e.device_class}
+
+
+def consumer_entry(e: Entity) -> Dict[str, Any]:
+    return _entry(e)
+
+
+def active_lights(smart_home_context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [light_entry(e) for e in as_entities(smart_home_context.get("controllable_devices", [])) if is_active_light(e)]
+
+
+def open_windows_doors(smart_home_context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [opening_entry(e) for e in as_entities(smart_home_context.get("sensors", [])) if is_open_opening(e)]
+
+
+def high_consumers(smart_home_context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [consumer_entry(e) for e in as_entities(smart_home_context.get("sensors", [])) if is_high_consumer(e)]
+
+
+def leave_home_summary(smart_home_context: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Fertige Zusammenfassung aus dem HaService, sonst einmal über alle Entitäten scannen."""
+    summary = smart_home_context.get("leave_home")
+    if summary is not None:
+        return summary
+    return {
+        "lights": active_lights(smart_home_context),
+        "openings": open_windows_doors(smart_home_context),
+        "consumers": high_consumers(smart_home_context),
+    }
@@ -1,76 +1,112 @@
-import json
-from typing import List, Any, Dict
+import logging
+from typing import List, Any, AsyncIterator, Dict
 from category_handler.base import BaseHandler, HandlerResult
-from const import tools_schema
-from genai_client.client import get_client
+from category_handler.tool_dispatch import ToolDispatcher
+from const import tools_schema, Category, LLM_PHRASING, AI_HANDLER_MODEL_NAME
+from genai_client.client import get_client, stream_text
+from genai_client.hedging import hedging_policy
+from genai_client.usage import usage_tracker
+from response_templates.german import render_status_info
+from serialization.fragment_cache import prompt_json
+
+logger = logging.getLogger(__name__)
+
+# Statischer Prompt-Teil: bei jedem Request gleich -> system_instruction (als Cached Content, siehe PromptCache)
+SYSTEM_INSTRUCTION = """
+Du bist ein Smart Home Assistent.
+
+[ENTSCHEIDUNGS-LOGIK]
+Analysiere den User Input genau:
+
+FRAGE:
+-> NUTZE KEIN TOOL! Antworte nur mit Text basierend auf diesen Regeln:
+        - Annahmen / Rahmenbedingungen:
+            - Es können Fragen über mehrere Geräte hinweg gestellt werden.
+            - Bündle Antwort in einer logischen Art
+
+[BEISPIELE - LERNE DARAUS!]
+Input: "Wir wollen das Haus verlassen."
+Antwort: "Okay, Du hast Fenster Schlafzimmer offen, und es Brennt Licht in der Waschküche."
+
+Input: "Gibt es heute noch PV Strom?"
+Antwort: "Ja, heute kannst Du noch mit 5kWh rechnen, der PV Akku ist bei 100%"
+"""
+LLM_CONFIG = {"system_instruction": SYSTEM_INSTRUCTION, "tools": [{"function_declarations": tools_schema}]}
 
-AI_MODEL_NAME = "gemini-flash-lite-latest"
 
 class InfoHandler(BaseHandler):
+    def __init__(self, use_llm_phrasing: bool = LLM_PHRASING):
+        # Standard: einfache Subjects per lokalem Template. Opt-in: immer Gemini.
+        self.use_llm_phrasing = use_llm_phrasing
+
+    def _use_templates(self) -> bool:
+        # Tages-Token-Budget aufgebraucht -> auch bei LLM_PHRASING lokal antworten
+        return not self.use_llm_phrasing or usage_tracker.budget_exceeded(Category.INFO.name)
+
     async def execute(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> HandlerResult:
-        print("InfoHandler aufgerufen.")
+        logger.info("InfoHandler aufgerufen.")
         response_text = "Fehler."
         
         smart_home_context = await ha_service.get_smart_home_context()
 
-        system_prompt = f"""
-                Du bist ein Smart Home Assistent.
-                
-                [KONTEXT]
-                Energie-Werte: {json.dumps(smart_home_context.get("energy_context", {}))}
-                Geräte: {json.dumps(smart_home_context.get("controllable_devices", []))}
-                Sensoren: {json.dumps(smart_home_context.get("sensors", []))}
-                
-                [ENTSCHEIDUNGS-LOGIK]
-                Analysiere den User Input genau:
-                
-                
-                FRAGE:
-                -> NUTZE KEIN TOOL! Antworte nur mit Text basierend auf diesen Regeln:
-                        - Annahmen / Rahmenbedingungen:    
-                            - Es können Fragen über mehrere Geräte hinweg gestellt werden.
-                            - Bündle Antwort in einer logischen Art
-                
-                [BEISPIELE - LERNE DARAUS!]
-                Input: "Wir wollen das Haus verlassen."
-                Antwort: "Okay, Du hast Fenster Schlafzimmer offen, und es Brennt Licht in der Waschküche."
-                
-                Input: "Gibt es heute noch PV Strom?"
-                Antwort: "Ja, heute kannst Du noch mit 5kWh rechnen, der PV Akku ist bei 100%"
-                
-                Input: "{parameters}"
-                """
+        # Einfache Subjects (Akku, Prognose, Strom, Fenster) lokal beantworten
+        if self._use_templates() and parameters:
+            template_text = render_status_info(str(parameters[0]), smart_home_context)
+            if template_text:
+                return HandlerResult(text=template_text)
+
         # --- PROMPT BAUEN ---
+        prompt = self.build_prompt(smart_home_context, parameters)
 
         try:
-            response = get_client().models.generate_content(
-                model=AI_MODEL_NAME,
-                contents=system_prompt,
-                config={"tools": [{"function_declarations": tools_schema}]},
+            # Mit Timeout und Hedging, über den gemeinsamen Scheduler (Quote, Priorität, Retry bei 429)
+            response = await hedging_policy.generate_content(
+                get_client(),
+                model=AI_HANDLER_MODEL_NAME,
+                contents=prompt,
+                config=LLM_CONFIG,
             )
 
-            # Tool Call Check (v2 SDK Style)
-            tool_called = False
-            if response.candidates and response.candidates[0].content.parts:
-                for part in response.candidates[0].content.parts:
-                    if part.function_call:
-                        tool_called = True
-                        fc = part.function_call
-                        if fc.name == "control_device":
-                            eid = fc.args.get("entity_id")
-                            act = fc.args.get("action")
-                            dom = eid.split(".")[0] if "." in eid else ""
-                            if await ha_service.execute_ha_service(dom, act, eid):
-                                response_text = f"Okay, {act} für {eid} ausgeführt."
-                            else:
-                                response_text = f"Fehler beim Schalten von {eid}."
-                        break
-
-            if not tool_called:
+            # Tool Calls (alle, parallel) über den gemeinsamen Dispatcher
+            dispatcher = ToolDispatcher(ha_service, smart_home_context.get("controllable_devices", []))
+            tool_text = await dispatcher.dispatch(response)
+            if tool_text is not None:
+                response_text = tool_text
+            else:
                 response_text = response.text if response.text else "Keine Antwort."
 
         except Exception as e:
-            print(f"AI Error: {e}")
+            logger.error(f"AI Error: {e}")
             response_text = "Fehler im KI-Modell."
 
         return HandlerResult(text=response_text)
+
+    def build_prompt(self, smart_home_context: Dict[str, Any], parameters: List[Any]) -> str:
+        """Nur der dynamische Teil (Live-Werte + Input); Regeln und Beispiele stehen in `SYSTEM_INSTRUCTION`."""
+        return f"""
+                [KONTEXT]
+                Energie-Werte: {prompt_json(smart_home_context.get("energy_context", {}))}
+                Geräte: {prompt_json(smart_home_context.get("controllable_devices", []))}
+                Sensoren: {prompt_json(smart_home_context.get("sensors", []))}
+                
+                Input: "{parameters}"
+                """
+
+    async def stream(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> AsyncIterator[str]:
+        smart_home_context = await ha_service.get_smart_home_context()
+
+        if self._use_templates() and parameters:
+            template_text = render_status_info(str(parameters[0]), smart_home_context)
+            if template_text:
+                yield template_text
+                return
+
+        try:
+            # Reine Textantwort -> ohne Tools, Token für Token
+            async for text in stream_text(
+                AI_HANDLER_MODEL_NAME, self.build_prompt(smart_home_context, parameters), {"system_instruction": SYSTEM_INSTRUCTION}
+            ):
+                yield text
+        except Exception as e:
+            logger.error(f"AI Error: {e}")
+            yield "Fehler im KI-Modell."
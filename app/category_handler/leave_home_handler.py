@@ -1,14 +1,34 @@
-import json
 import logging
 from typing import List, Any, Dict
 from category_handler.base import BaseHandler, HandlerResult
 from genai_client.client import get_client
-from const import tools_schema, Category
+from genai_client.hedging import hedging_policy
+from genai_client.usage import usage_tracker
+from category_handler.home_status import leave_home_summary
+from const import tools_schema, Category, LLM_PHRASING, AI_HANDLER_MODEL_NAME, LEAVE_HOME_POWER_THRESHOLD_WATT
+from response_templates.german import format_number, render_leave_home
+from serialization.fragment_cache import prompt_json
 
-AI_MODEL_NAME = "gemini-flash-lite-latest"
 logger = logging.getLogger(__name__)
 
+# Statischer Prompt-Teil: bei jedem Request gleich -> system_instruction (als Cached Content, siehe PromptCache)
+SYSTEM_INSTRUCTION = """
+Du bist ein Smart Home Assistent. Der Nutzer verlässt das Haus.
+Fasse den folgenden Status kurz zusammen (max 30 Wörter).
+
+[REGELN]
+- Wenn alles "Keine/Kein" ist, sag nur: "Alles sicher, schönen Tag!"
+- Erwähne NUR die Dinge, die NICHT "Keine" sind.
+- Halte Dich am Ende an die Anweisung unter [ABSCHLUSS].
+"""
+LLM_CONFIG = {"system_instruction": SYSTEM_INSTRUCTION, "tools": [{"function_declarations": tools_schema}]}
+
+
 class LeaveHomeHandler(BaseHandler):
+    def __init__(self, use_llm_phrasing: bool = LLM_PHRASING):
+        # Standard: lokales Template. Opt-in: Gemini formuliert die Zusammenfassung.
+        self.use_llm_phrasing = use_llm_phrasing
+
     async def execute(self, parameters: List[Any], ha_service: Any, session_attributes: Dict[str, Any] = None, intent_name: str = None) -> HandlerResult:
         logger.info(f"LeaveHomeHandler aufgerufen. Intent: {intent_name}")
         
@@ -40,69 +60,21 @@ class LeaveHomeHandler(BaseHandler):
             logger.error(f"Fehler beim Abrufen des Smart Home Context: {e}")
             return HandlerResult("Fehler beim Abrufen der Smart Home Daten.")
 
-        def safe_float(value):
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return 0.0
-
-        # 1. Aktive Lichter
-        aktive_lichter = [
-            {"eid": d["eid"], "area": d["area"], "state": d["state"]}
-            for d in smart_home_context.get("controllable_devices", [])
-            if d.get("device_class", "").startswith("light") and d.get("state") != "off"
-        ]
-
-        # 2. Offene Fenster/Türen
-        fenster_tueren = [
-            {"eid": d["eid"], "area": d["area"], "state": d["state"]}
-            for d in smart_home_context.get("sensors", [])
-            if d.get("area")
-            and d.get("device_class") in ["window", "door"]
-            and d.get("state") not in ["off", "closed"]
-        ]
-
-        # 3. Hoher Verbrauch
-        hoher_verbrauch = [
-            {"eid": d["eid"], "area": d["area"], "state": d["state"]}
-            for d in smart_home_context.get("sensors", [])
-            if d.get("area")
-            and d.get("area") not in ["Wärmepumpe"]
-            and d.get("device_class") == "power"
-            and safe_float(d.get("state")) > 500
-        ]
+        # Lichter, offene Fenster/Türen und hoher Verbrauch: fertig aus der Sicht im HaService
+        summary = leave_home_summary(smart_home_context)
+        aktive_lichter = summary["lights"]
+        fenster_tueren = summary["openings"]
+        hoher_verbrauch = summary["consumers"]
 
         # Logik für Lichter-Frage
         ask_about_lights = len(aktive_lichter) > 0
-        
-        system_prompt = f"""
-            Du bist ein Smart Home Assistent. Der Nutzer verlässt das Haus.
-            Fasse den folgenden Status kurz zusammen (max 30 Wörter).
-        
-            [AKTUELLER STATUS]
-            - Offene Fenster/Türen: {json.dumps(fenster_tueren) if fenster_tueren else "Keine"}
-            - Brennende Lichter: {json.dumps(aktive_lichter) if aktive_lichter else "Keine"}
-            - Hoher Verbrauch (>500W): {json.dumps(hoher_verbrauch) if hoher_verbrauch else "Kein"}
-        
-            [REGELN]
-            - Wenn alles "Keine/Kein" ist, sag nur: "Alles sicher, schönen Tag!"
-            - Erwähne NUR die Dinge, die NICHT "Keine" sind.
-            - { "FRAGE AM ENDE: 'Soll ich die Lichter ausschalten?'" if ask_about_lights else "Verabschiede Dich." }
-        """
 
-        try:
-            client = get_client()
-            response = client.models.generate_content(
-                model=AI_MODEL_NAME,
-                contents=system_prompt,
-                config={"tools": [{"function_declarations": tools_schema}]},
-            )
-            response_text = response.text if response.text else "Keine Antwort."
+        # Tages-Token-Budget aufgebraucht -> auch bei LLM_PHRASING das lokale Template
+        if self.use_llm_phrasing and not usage_tracker.budget_exceeded(Category.LEAVE_HOME.name):
+            response_text = await self._phrase_with_llm(fenster_tueren, aktive_lichter, hoher_verbrauch, ask_about_lights)
+        else:
+            response_text = render_leave_home(fenster_tueren, aktive_lichter, hoher_verbrauch)
 
-        except Exception as e:
-            logger.error(f"AI Error: {e}")
-            response_text = "Fehler im KI-Modell."
-            
         # Ergebnis bauen
         if ask_about_lights:
             return HandlerResult(
@@ -116,3 +88,32 @@ class LeaveHomeHandler(BaseHandler):
             )
         else:
             return HandlerResult(text=response_text, should_end_session=True)
+
+    async def _phrase_with_llm(self, fenster_tueren: List[Dict[str, Any]], aktive_lichter: List[Dict[str, Any]], hoher_verbrauch: List[Dict[str, Any]], ask_about_lights: bool) -> str:
+        # Nur Status und Abschluss sind dynamisch; Rolle und Regeln stehen in `SYSTEM_INSTRUCTION`
+        prompt = f"""
+            [AKTUELLER STATUS]
+            - Offene Fenster/Türen: {prompt_json(fenster_tueren) if fenster_tueren else "Keine"}
+            - Brennende Lichter: {prompt_json(aktive_lichter) if aktive_lichter else "Keine"}
+            - Hoher Verbrauch (>{format_number(LEAVE_HOME_POWER_THRESHOLD_WATT)}W): {prompt_json(hoher_verbrauch) if hoher_verbrauch else "Kein"}
+        
+            [ABSCHLUSS]
+            - { "FRAGE AM ENDE: 'Soll ich die Lichter ausschalten?'" if ask_about_lights else "Verabschiede Dich." }
+        """
+
+        try:
+            client = get_client()
+            # Mit Timeout und Hedging, über den gemeinsamen Scheduler (Quote, Priorität, Retry bei 429)
+            response = await hedging_policy.generate_content(
+                client,
+                model=AI_HANDLER_MODEL_NAME,
+                contents=prompt,
+                config=LLM_CONFIG,
+            )
+            response_text = response.text if response.text else "Keine Antwort."
+
+        except Exception as e:
+            logger.error(f"AI Error: {e}")
+            response_text = "Fehler im KI-Modell."
+
+        return response_text
@@ -0,0 +1,86 @@
+"""
+Gemeinsame Ausführung der Tool Calls ("control_device") einer LLM-Antwort.
+
+Sammelt ALLE Function Calls einer Antwort (nicht nur den ersten), prüft sie gegen die bekannten
+steuerbaren Geräte, führt sie begrenzt parallel über den HaService aus und liefert eine
+zusammengefasste Antwort ("mach alle Lichter im Erdgeschoss aus").
+"""
+import asyncio
+import logging
+from typing import Any, List, Optional, Tuple
+
+from const import TOOL_CALL_CONCURRENCY
+from ha_service.entities import Entity, as_entities
+from response_templates.german import join_natural
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_ACTIONS = {"turn_on": "eingeschaltet", "turn_off": "ausgeschaltet"}
+
+
+def extract_function_calls(response: Any) -> List[Any]:
+    """Alle Function Calls aus dem ersten Candidate einer `generate_content` Antwort."""
+    if not response.candidates or not response.candidates[0].content or not response.candidates[0].content.parts:
+        return []
+    return [part.function_call for part in response.candidates[0].content.parts if part.function_call]
+
+
+class ToolDispatcher:
+    def __init__(self, ha_service: Any, controllable_devices: List[Entity], max_concurrency: int = TOOL_CALL_CONCURRENCY):
+        self.ha_service = ha_service
+        self.devices = {d.eid: d for d in as_entities(controllable_devices)}
+        self.max_concurrency = max(1, max_concurrency)
+
+    def _label(self, eid: str) -> str:
+        device = self.devices.get(eid)
+        return (device.name or eid) if device else eid
+
+    async def dispatch(self, response: Any) -> Optional[str]:
+        """
+        Führt alle Tool Calls der Antwort aus.
+        Gibt `None` zurück, wenn die Antwort keine Tool Calls enthält (dann zählt der Antworttext).
+        """
+        function_calls = extract_function_calls(response)
+        if not function_calls:
+            return None
+
+        valid = []
+        rejected = []
+        for fc in function_calls:
+            args = fc.args or {}
+            eid = args.get("entity_id")
+            action = args.get("action")
+            if fc.name != "control_device" or eid not in self.devices or action not in ALLOWED_ACTIONS:
+                rejected.append(str(eid or fc.name))
+                continue
+            if (eid, action) not in valid:
+                valid.append((eid, action))
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(eid: str, action: str) -> bool:
+            async with semaphore:
+                try:
+                    return bool(await self.ha_service.execute_ha_service(eid.split(".")[0], action, eid))
+                except Exception as e:
+                    logger.error(f"HA Error: {e}")
+                    return False
+
+        results = await asyncio.gather(*(run(eid, action) for eid, action in valid))
+        return self._summarize(valid, results, rejected)
+
+    def _summarize(self, calls: List[Tuple[str, str]], results: List[bool], rejected: List[str]) -> str:
+        sentences = []
+        for action, verb in ALLOWED_ACTIONS.items():
+            done = [self._label(eid) for (eid, act), ok in zip(calls, results) if ok and act == action]
+            if done:
+                sentences.append(f"{verb.capitalize()}: {join_natural(done)}.")
+        failed = [self._label(eid) for (eid, _), ok in zip(calls, results) if not ok]
+        if failed:
+            sentences.append(f"Fehler beim Schalten von {join_natural(failed)}.")
+        if rejected:
+            sentences.append(f"Unbekannt: {join_natural(rejected)}.")
+
+        if sentences and not failed and not rejected:
+            sentences.insert(0, "Okay.")
+        return " ".join(sentences)
@@ -39,5 +39,137 @@ tools_schema = [
 HA_URL = os.getenv("HA_URL")
 HA_TOKEN = os.getenv("HA_TOKEN")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Optional: abweichender Endpoint der Gemini API (z.B. Fake-Server für Lasttests)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
 AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", "gemini-2.5-flash-lite")
 ALEXA_ACCESS_TOKEN = os.getenv("ALEXA_ACCESS_TOKEN", "testAccessToken")
+
+# Opt-in: Pfad einer JSONL-Datei, in die Webhook-Requests samt HA-/LLM-Antworten aufgenommen werden
+RECORD_TRAFFIC_PATH = os.getenv("RECORD_TRAFFIC_PATH")
+
+# Geräte aus dem Alexa Slot-Typ "EnergyDeviceType", für die Energie-Beratung vorberechnet wird
+ADVICE_DEVICES = ["Waschmaschine", "Trockner", "Spülmaschine", "Auto"]
+
+# Opt-in: Context/Historie und Energie-Beratung kurz vor den (aus RECORD_TRAFFIC_PATH gelernten)
+# üblichen Nutzungszeiten vorwärmen. Nur innerhalb dieser Zeitfenster wird HA zusätzlich abgefragt.
+PREDICTIVE_WARMING = os.getenv("PREDICTIVE_WARMING", "false").lower() == "true"
+WARMING_LEAD_MINUTES = int(os.getenv("WARMING_LEAD_MINUTES", "5"))
+WARMING_INTERVAL_SECONDS = int(os.getenv("WARMING_INTERVAL_SECONDS", "60"))
+# Mindestanzahl aufgenommener Requests, ab der eine Stunde (pro Wochentag) als Nutzungszeit gilt
+WARMING_MIN_REQUESTS = int(os.getenv("WARMING_MIN_REQUESTS", "3"))
+# Obergrenze an vorgewärmten Stunden pro Wochentag (die häufigsten gewinnen)
+WARMING_MAX_HOURS_PER_DAY = int(os.getenv("WARMING_MAX_HOURS_PER_DAY", "6"))
+
+# Opt-in (Container mit Scale-to-Zero): Gemini Client, HA-Verbindung, Raum-Zuordnung und Intent-Modell
+# direkt nach dem Start im Hintergrund aufbauen; `/ready` meldet erst danach bereit
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() == "true"
+STARTUP_WARMUP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "20"))
+
+# Caches im HaService (0 = aus). Mit PREDICTIVE_WARMING standardmäßig an, sonst bringt das Vorwärmen nichts.
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "60" if PREDICTIVE_WARMING else "0"))
+HISTORY_CACHE_TTL_SECONDS = int(os.getenv("HISTORY_CACHE_TTL_SECONDS", "3600" if PREDICTIVE_WARMING else "0"))
+AREA_CACHE_TTL_SECONDS = int(os.getenv("AREA_CACHE_TTL_SECONDS", "3600" if PREDICTIVE_WARMING or STARTUP_WARMUP else "0"))
+
+# Hintergrund-Vorberechnung der Energie-Beratung (0 = deaktiviert)
+ADVICE_PRECOMPUTE_INTERVAL_SECONDS = int(os.getenv("ADVICE_PRECOMPUTE_INTERVAL_SECONDS", "0"))
+# Wie lange eine vorberechnete Antwort nach der letzten Prüfung gültig bleibt
+ADVICE_CACHE_MAX_AGE_SECONDS = int(
+    os.getenv(
+        "ADVICE_CACHE_MAX_AGE_SECONDS",
+        str(2 * (ADVICE_PRECOMPUTE_INTERVAL_SECONDS or (WARMING_INTERVAL_SECONDS if PREDICTIVE_WARMING else 0))),
+    )
+)
+# Spätestens nach dieser Zeit wird neu berechnet, auch wenn sich die Sensoren kaum ändern (Uhrzeit, Historie)
+ADVICE_RECOMPUTE_AFTER_SECONDS = int(os.getenv("ADVICE_RECOMPUTE_AFTER_SECONDS", "3600"))
+
+# LeaveHome-Zusammenfassung: Verbraucher über dieser Leistung gelten als "hoher Verbrauch",
+# Bereiche aus LEAVE_HOME_EXCLUDED_AREAS (kommagetrennt) werden dabei ignoriert (Dauerverbraucher)
+LEAVE_HOME_POWER_THRESHOLD_WATT = float(os.getenv("LEAVE_HOME_POWER_THRESHOLD_WATT", "500"))
+LEAVE_HOME_EXCLUDED_AREAS = [
+    area.strip() for area in os.getenv("LEAVE_HOME_EXCLUDED_AREAS", "Wärmepumpe").split(",") if area.strip()
+]
+
+# Opt-in: Einfache Antworten (LeaveHome, Status) von Gemini formulieren lassen statt lokaler Templates
+LLM_PHRASING = os.getenv("LLM_PHRASING", "false").lower() == "true"
+
+# Alexa Interaction Model (Trainingsdaten des lokalen Intent-Klassifikators).
+# Im Container liegt es neben main.py, im Repository eine Ebene höher.
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ALEXA_MODEL_PATH = os.getenv(
+    "ALEXA_MODEL_PATH",
+    next(
+        (p for p in [os.path.join(_APP_DIR, "alexa_model.json"), os.path.join(_APP_DIR, "..", "alexa_model.json")] if os.path.exists(p)),
+        os.path.join(_APP_DIR, "alexa_model.json"),
+    ),
+)
+# Unterhalb dieser Konfidenz fragt der Router das LLM
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+
+# Maximale Anzahl parallel ausgeführter Tool Calls (HA Service Calls) aus einer LLM-Antwort
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
+
+# Token-Budget pro Tag (Input + Output, 0 = unbegrenzt), global und optional pro Kategorie
+# (z.B. LLM_DAILY_TOKEN_BUDGET_ADVICE=50000). Ist es aufgebraucht, antworten Info und LeaveHome mit
+# lokalen Templates; die übrigen LLM Calls wechseln auf AI_BUDGET_MODEL_NAME, sofern gesetzt und
+# günstiger als das Handler-Modell (leer = kein Modellwechsel, nur Templates)
+LLM_DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", "0"))
+LLM_CATEGORY_TOKEN_BUDGETS = {
+    category.name: int(os.getenv(f"LLM_DAILY_TOKEN_BUDGET_{category.name}", "0"))
+    for category in Category
+    if os.getenv(f"LLM_DAILY_TOKEN_BUDGET_{category.name}")
+}
+AI_BUDGET_MODEL_NAME = os.getenv("AI_BUDGET_MODEL_NAME", "")
+
+# Zentraler LLM Scheduler (`genai_client.scheduler`): Gemini-Quoten pro Minute (0 = unbegrenzt),
+# maximal parallele Calls und Retries mit Jitter bei 429 (RESOURCE_EXHAUSTED)
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "0"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "0"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1.0"))
+
+# Modell der Category-Handler (Info, Control, Advice, LeaveHome)
+AI_HANDLER_MODEL_NAME = os.getenv("AI_HANDLER_MODEL_NAME", "gemini-flash-lite-latest")
+
+# Hedging (`genai_client.hedging`): Antwortet das Handler-Modell nicht innerhalb seines
+# LLM_HEDGE_PERCENTILE (gemessen, bis genug Werte da sind LLM_HEDGE_DEFAULT_MS), geht derselbe
+# Prompt zusätzlich an AI_HEDGE_MODEL_NAME; die erste Antwort gewinnt (leer = kein Hedging)
+AI_HEDGE_MODEL_NAME = os.getenv("AI_HEDGE_MODEL_NAME", "")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_DEFAULT_MS = float(os.getenv("LLM_HEDGE_DEFAULT_MS", "2500"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "15"))
+# Circuit Breaker pro Modell: nach so vielen Fehlern/Timeouts in Folge wird das Modell für die
+# Cooldown-Zeit umgangen (sofern ein anderes verfügbar ist)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Statischer Prompt-Teil (system_instruction + Tools) als Gemini Cached Content (`genai_client.prompt_cache`):
+# Lebensdauer (0 = aus, dann wird er bei jedem Call mitgeschickt) und Mindestgröße in geschätzten
+# Tokens (~4 Zeichen). Gemini verlangt je nach Modell mind. 1024 echte Tokens; die Schätzung liegt für
+# deutschen Text eher darunter, ein abgelehnter Cache wird erst nach der TTL erneut versucht.
+LLM_PROMPT_CACHE_TTL_SECONDS = int(os.getenv("LLM_PROMPT_CACHE_TTL_SECONDS", "3600"))
+LLM_PROMPT_CACHE_MIN_TOKENS = int(os.getenv("LLM_PROMPT_CACHE_MIN_TOKENS", "768"))
+
+# Opt-in (Entwicklung/Staging): Blockiert synchroner Code den Event Loop länger als diese Schwelle,
+# wird der Stack geloggt und pro Route gezählt (0 = aus)
+LOOP_WATCHDOG_THRESHOLD_MS = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "0"))
+
+# Logging (`diagnostics.structured_logging`): JSON-Zeilen über eine Queue, geschrieben im Hintergrund-Thread.
+# LOG_LEVELS setzt Level pro Logger ("ha_service=DEBUG,httpx=WARNING"). Große Payload-Logs (Alexa Request,
+# Energie-Werte) nur für diesen Anteil der Requests (0..1). Bei voller Queue werden Zeilen verworfen.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Opt-in (Produktion): Einzelne /alexa-webhook oder /query Requests profilieren, wenn sie PROFILE_TOKEN
+# im Header X-Profile-Token oder als Query-Parameter `profile` mitschicken. Profile landen in PROFILE_DIR.
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+
+# Opt-in: Alexa Request-Signatur (Zertifikatskette + Signature-256) und Zeitstempel prüfen
+ALEXA_VERIFY_SIGNATURE = os.getenv("ALEXA_VERIFY_SIGNATURE", "false").lower() == "true"
+ALEXA_TIMESTAMP_TOLERANCE_SECONDS = int(os.getenv("ALEXA_TIMESTAMP_TOLERANCE_SECONDS", "150"))
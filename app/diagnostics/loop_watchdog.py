@@ -0,0 +1,158 @@
+"""
+Watchdog für blockierende Event-Loop-Arbeit (Entwicklung, Staging und Test-Suite).
+
+Ein Heartbeat-Task im Event Loop meldet sich alle `interval_ms`. Ein Thread prüft den Heartbeat;
+bleibt er länger als `threshold_ms` aus, blockiert synchroner Code den Loop. Dann wird der Stack
+des Loop-Threads mitgeschnitten (also genau die blockierende Stelle), geloggt und pro Route gezählt.
+Die Route kommt aus `current_route`, das `RouteTagMiddleware` je Request setzt.
+
+Aktivierung: `LOOP_WATCHDOG_THRESHOLD_MS` > 0, in Tests per `async with LoopWatchdog(...)`.
+"""
+import asyncio
+import contextvars
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from const import LOOP_WATCHDOG_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+current_route: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_route", default=None)
+
+
+class RouteTagMiddleware:
+    """Reine ASGI Middleware: merkt sich die Route des Requests für die Stall-Zuordnung."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            current_route.set(f"{scope['method']} {scope['path']}")
+        await self.app(scope, receive, send)
+
+
+class Stall:
+    def __init__(self, route: str, blocked_ms: float, stack: List[str]):
+        self.route = route
+        self.blocked_ms = blocked_ms
+        self.stack = stack
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"route": self.route, "blocked_ms": round(self.blocked_ms, 1), "stack": self.stack}
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float = LOOP_WATCHDOG_THRESHOLD_MS, interval_ms: Optional[float] = None, max_stalls: int = 50):
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms or max(1.0, threshold_ms / 4)
+        self.stalls: Deque[Stall] = deque(maxlen=max_stalls)
+        self.stalls_per_route: Dict[str, int] = {}
+        self.max_lag_ms = 0.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._beat_count = 0
+        self._reported_beat = -1
+        self._open_stall: Optional[Stall] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def start(self) -> None:
+        """Muss im laufenden Event Loop aufgerufen werden."""
+        if not self.enabled or self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"Event-Loop Watchdog aktiv (Schwelle {self.threshold_ms:.0f} ms)")
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._thread.join(timeout=1)
+        self._task = None
+        self._thread = None
+
+    async def __aenter__(self) -> "LoopWatchdog":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def _heartbeat(self) -> None:
+        interval = self.interval_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            # Bezug ist der letzte Beat (bzw. `start()`), nicht der Beginn des Sleeps:
+            # so zählt auch eine Blockade, bevor der Heartbeat das erste Mal lief
+            lag_ms = max(0.0, (now - self._last_beat - interval) * 1000)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if self._open_stall:
+                # Erst jetzt ist bekannt, wie lange der Loop insgesamt blockiert war
+                self._open_stall.blocked_ms = max(self._open_stall.blocked_ms, lag_ms)
+                self._open_stall = None
+            self._last_beat = now
+            self._beat_count += 1
+
+    def _watch(self) -> None:
+        poll = self.interval_ms / 2000
+        while not self._stop.wait(poll):
+            blocked_ms = (time.monotonic() - self._last_beat) * 1000 - self.interval_ms
+            if blocked_ms > self.threshold_ms and self._reported_beat != self._beat_count:
+                self._reported_beat = self._beat_count
+                self._record_stall(blocked_ms)
+
+    def _blocking_route(self) -> str:
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return "-"
+        return task.get_context().get(current_route) or "-"
+
+    def _record_stall(self, blocked_ms: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame else []
+        route = self._blocking_route()
+
+        stall = Stall(route, blocked_ms, stack)
+        self._open_stall = stall
+        self.stalls.append(stall)
+        self.stalls_per_route[route] = self.stalls_per_route.get(route, 0) + 1
+        logger.warning(
+            f"Event Loop blockiert seit {blocked_ms:.0f} ms (Route: {route}):\n{''.join(stack[-8:])}"
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "stalls_per_route": dict(self.stalls_per_route),
+            "recent_stalls": [stall.to_dict() for stall in self.stalls],
+        }
+
+
+loop_watchdog = LoopWatchdog()
@@ -0,0 +1,259 @@
+"""
+Profiling einzelner Requests auf Abruf (Produktion, wenn ein bestimmter Webhook langsam ist).
+
+Aktivierung: `PROFILE_DIR` und `PROFILE_TOKEN` gesetzt -> `ProfilingMiddleware` wird installiert.
+Ein `/alexa-webhook` oder `/query` Request wird nur profiliert, wenn er das Token im Header
+`X-Profile-Token` oder als Query-Parameter `profile=<token>` mitschickt. Ohne diese Variablen gibt es
+keine Middleware, ohne Flag prüft sie nur den Header; Stage-Hooks lesen nur eine Context-Variable.
+
+Pro profiliertem Request entstehen in `PROFILE_DIR` (Name im Response-Header `X-Profile-Id`):
+- `<id>.pstats` : deterministisches Profil (cProfile), z.B. `python -m pstats` oder snakeviz
+- `<id>.folded` : gesampelte Stacks (`PROFILE_SAMPLE_INTERVAL_MS`) im Folded-Format für flamegraph.pl/speedscope
+- `<id>.json`   : Route, Status, Gesamtdauer und die Stages (HA-Aufrufe, LLM Queue/Call) mit Offset und Dauer
+
+cProfile und Sampler sehen den ganzen Prozess: Parallel laufende Requests tauchen mit auf. Es wird
+immer nur ein Request gleichzeitig profiliert, weitere laufen ohne Profil.
+"""
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from const import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_TOKEN
+
+logger = logging.getLogger(__name__)
+
+PROFILED_PATHS = ("/alexa-webhook", "/query")
+PROFILE_HEADER = b"x-profile-token"
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def current_profile() -> Optional["RequestProfile"]:
+    return _current_profile.get()
+
+
+def _frame_label(frame: Any) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle_worker(frame: Any) -> bool:
+    """Wartende Threads (Pool-Worker ohne Arbeit) verrauschen den Flame Graph."""
+    return os.path.basename(frame.f_code.co_filename) in ("threading.py", "queue.py")
+
+
+class StackSampler:
+    """Thread, der alle `interval_ms` die Stacks aller Threads im Folded-Format zählt."""
+
+    def __init__(self, interval_ms: float, loop_thread_id: int):
+        self.interval_s = interval_ms / 1000
+        self.loop_thread_id = loop_thread_id
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (thread_id != self.loop_thread_id and _is_idle_worker(frame)):
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                root = "event-loop" if thread_id == self.loop_thread_id else names.get(thread_id, str(thread_id))
+                root = re.sub(r"[\s;]+", "_", root)
+                self.samples[";".join([root, *reversed(stack)])] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class RequestProfile:
+    """Stages (HA, LLM) eines profilierten Requests, Offsets relativ zum Request-Start."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.stages: List[Dict[str, Any]] = []
+        self.total_ms: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def add_stage(self, kind: str, name: str, started: float, **extra: Any) -> None:
+        now = time.perf_counter()
+        self.stages.append(
+            {
+                "kind": kind,
+                "name": name,
+                "offset_ms": round((started - self._start) * 1000, 2),
+                "duration_ms": round((now - started) * 1000, 2),
+                **extra,
+            }
+        )
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+
+class StageTimingHaService:
+    """Proxy um den HaService: misst jeden awaitbaren Aufruf als Stage `ha`."""
+
+    def __init__(self, inner: Any, profile: RequestProfile):
+        self._inner = inner
+        self._profile = profile
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._inner, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def timed_call(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await attr(*args, **kwargs)
+            finally:
+                self._profile.add_stage("ha", name, started)
+
+        return timed_call
+
+
+def profile_ha_service(ha_service: Any) -> Any:
+    """Gibt den HaService zurück – bei aktivem Profil eingepackt in den StageTimingHaService."""
+    profile = current_profile()
+    return StageTimingHaService(ha_service, profile) if profile else ha_service
+
+
+class RequestProfiler:
+    def __init__(self, profile_dir: Optional[str] = PROFILE_DIR, token: Optional[str] = PROFILE_TOKEN, sample_interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS):
+        self.profile_dir = profile_dir
+        self.token = token
+        self.sample_interval_ms = sample_interval_ms
+        self.profiled = 0
+        self.skipped_busy = 0
+        self.busy = False
+        self._ids = itertools.count(1)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.profile_dir and self.token)
+
+    def requested(self, scope: Dict[str, Any]) -> bool:
+        """Flag gesetzt und Token korrekt (Header oder Query-Parameter `profile`)."""
+        value = None
+        for key, header_value in scope.get("headers", []):
+            if key == PROFILE_HEADER:
+                value = header_value.decode("latin-1")
+                break
+        if value is None:
+            query = scope.get("query_string", b"")
+            if b"profile=" not in query:
+                return False
+            value = parse_qs(query.decode("latin-1")).get("profile", [""])[0]
+        if not hmac.compare_digest(value.encode(), self.token.encode()):
+            logger.warning(f"Profiling für {scope['path']} angefragt, aber Token ungültig")
+            return False
+        return True
+
+    def next_id(self, path: str) -> str:
+        slug = re.sub(r"[^a-z0-9]+", "-", path.lower()).strip("-")
+        return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{slug}-{next(self._ids)}"
+
+    async def run(self, profile_id: str, profile: RequestProfile, call: Any) -> None:
+        sampler = StackSampler(self.sample_interval_ms, threading.get_ident())
+        profiler = cProfile.Profile()
+        self.busy = True
+        token = _current_profile.set(profile)
+        sampler.start()
+        profiler.enable()
+        try:
+            await call()
+        finally:
+            profiler.disable()
+            profile.total_ms = profile.elapsed_ms()
+            sampler.stop()
+            _current_profile.reset(token)
+            self.busy = False
+            self.profiled += 1
+            await asyncio.to_thread(self._write, profile_id, profile, profiler, sampler)
+
+    def _write(self, profile_id: str, profile: RequestProfile, profiler: cProfile.Profile, sampler: StackSampler) -> None:
+        base = os.path.join(self.profile_dir, profile_id)
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(f"{base}.pstats")
+            with open(f"{base}.folded", "w", encoding="utf-8") as f:
+                f.write(sampler.folded())
+            summary = {
+                "id": profile_id,
+                "method": profile.method,
+                "path": profile.path,
+                "status": profile.status,
+                "total_ms": profile.total_ms,
+                "sample_interval_ms": self.sample_interval_ms,
+                "samples": sum(sampler.samples.values()),
+                "stages": profile.stages,
+            }
+            with open(f"{base}.json", "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            logger.info(f"Profil {profile_id} geschrieben ({summary['total_ms']} ms, {len(profile.stages)} Stages)")
+        except OSError as e:
+            logger.error(f"Profil {profile_id} konnte nicht geschrieben werden: {e}")
+
+
+class ProfilingMiddleware:
+    """Reine ASGI Middleware: profiliert einzelne Requests mit gültigem Profiling-Token."""
+
+    def __init__(self, app: Any, profiler: "RequestProfiler"):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in PROFILED_PATHS or not self.profiler.requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if self.profiler.busy:
+            self.profiler.skipped_busy += 1
+            logger.warning(f"Profiling für {scope['path']} übersprungen, es läuft bereits ein Profil")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.profiler.next_id(scope["path"])
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        await self.profiler.run(profile_id, profile, lambda: self.app(scope, receive, send_with_id))
+
+
+request_profiler = RequestProfiler()
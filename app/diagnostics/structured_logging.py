@@ -0,0 +1,266 @@
+"""
+Strukturiertes Logging abseits des Request-Pfads.
+
+- Alle Logger schreiben über einen `QueueHandler` in eine begrenzte Queue; Formatierung (JSON),
+  Redaction und das Schreiben nach stdout erledigt ein `QueueListener` im Hintergrund-Thread.
+  Ist die Queue voll (Log-Collector hängt), werden Zeilen verworfen statt den Event Loop zu blockieren.
+- Korrelations-ID pro HTTP Request (`CorrelationIdMiddleware`, Header `X-Request-Id`): Sie steht in
+  jeder Zeile der Handler, des HaService und der LLM Calls (auch aus `asyncio.to_thread`).
+- Strukturierte Felder per `logger.info("...", extra={"data": {...}})`. Große Payloads (Alexa Request,
+  Energie-Werte) per `extra={"payload": ...}`; sie werden pro Request gesampelt (`LOG_PAYLOAD_SAMPLE_RATE`).
+- Tokens und Secrets werden vor der Ausgabe entfernt (Schlüssel wie `accessToken`, `Bearer ...`,
+  `token=...` in URLs und die konfigurierten Secrets selbst).
+
+Konfiguration: `LOG_LEVEL`, `LOG_LEVELS` (z.B. "ha_service=DEBUG,httpx=WARNING"), `LOG_FORMAT` (json|text).
+"""
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from const import (
+    ALEXA_ACCESS_TOKEN,
+    GOOGLE_API_KEY,
+    HA_TOKEN,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_LEVELS,
+    LOG_PAYLOAD_SAMPLE_RATE,
+    LOG_QUEUE_SIZE,
+    PROFILE_TOKEN,
+)
+from serialization.fast_json import dumps
+
+REDACTED = "***"
+SECRET_KEY_PATTERN = re.compile(r"token|authorization|api[_-]?key|password|secret", re.IGNORECASE)
+SECRET_TEXT_PATTERNS = [
+    (re.compile(r"(Bearer\s+)\S+", re.IGNORECASE), r"\1" + REDACTED),
+    (re.compile(r"([?&](?:token|profile|key)=)[^&\s'\"]+", re.IGNORECASE), r"\1" + REDACTED),
+]
+# Loggen selbst synchron nach stderr, wenn sie nicht umgehängt werden
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def set_request_id(request_id: Optional[str] = None) -> str:
+    request_id = request_id or uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+
+class CorrelationIdMiddleware:
+    """Reine ASGI Middleware: Korrelations-ID je Request (übernimmt `X-Request-Id`, gibt sie zurück)."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        incoming = next((v.decode("latin-1") for k, v in scope.get("headers", []) if k == b"x-request-id"), None)
+        request_id = set_request_id(incoming[:64] if incoming else None)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_id)
+
+
+class Redactor:
+    def __init__(self, secrets: Iterable[Optional[str]]):
+        # Längste zuerst, falls ein Secret Teil eines anderen ist
+        self.secrets = sorted({s for s in secrets if s and len(s) >= 4}, key=len, reverse=True)
+
+    def text(self, value: str) -> str:
+        for secret in self.secrets:
+            if secret in value:
+                value = value.replace(secret, REDACTED)
+        for pattern, replacement in SECRET_TEXT_PATTERNS:
+            value = pattern.sub(replacement, value)
+        return value
+
+    def value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.text(value)
+        if isinstance(value, dict):
+            return {k: REDACTED if isinstance(k, str) and SECRET_KEY_PATTERN.search(k) else self.value(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.value(v) for v in value]
+        return value
+
+
+class ContextFilter(logging.Filter):
+    """
+    Läuft im aufrufenden Thread (am QueueHandler): hängt die Korrelations-ID an und sampelt
+    Payload-Logs – pro Request einheitlich, damit ein gesampelter Request vollständig bleibt.
+    """
+
+    def __init__(self, payload_sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE):
+        super().__init__()
+        self.payload_sample_rate = payload_sample_rate
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        if getattr(record, "payload", None) is not None and not self._sampled(record.request_id):
+            self.sampled_out += 1
+            return False
+        return True
+
+    def _sampled(self, request_id: Optional[str]) -> bool:
+        if self.payload_sample_rate >= 1:
+            return True
+        if self.payload_sample_rate <= 0 or request_id is None:
+            return False
+        return zlib.crc32(request_id.encode()) % 10_000 < self.payload_sample_rate * 10_000
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Reicht den Record fast unverändert an den Listener weiter: Nur Nachricht und Traceback werden hier
+    zu Text (die Argumente bzw. Frames gehören dem aufrufenden Thread), JSON und Redaction erst dort.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redactor: Redactor):
+        super().__init__()
+        self.redactor = redactor
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "msg": self.redactor.text(record.getMessage()),
+        }
+        data = getattr(record, "data", None)
+        if data:
+            entry.update(self.redactor.value(data))
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            entry["payload"] = self.redactor.value(payload)
+        if record.exc_text:
+            entry["exc"] = self.redactor.text(record.exc_text)
+        return dumps(entry)
+
+
+class TextFormatter(logging.Formatter):
+    """Lesbare Zeilen für die lokale Entwicklung (`LOG_FORMAT=text`), ebenfalls ohne Secrets."""
+
+    def __init__(self, redactor: Redactor):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+        self.redactor = redactor
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        for key in ("data", "payload"):
+            value = getattr(record, key, None)
+            if value is not None:
+                line += f" {key}={dumps(self.redactor.value(value))}"
+        return self.redactor.text(line)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """"ha_service=DEBUG, httpx=WARNING" -> {"ha_service": "DEBUG", "httpx": "WARNING"}"""
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class LoggingSetup:
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.queue_handler: Optional[DroppingQueueHandler] = None
+        self.context_filter: Optional[ContextFilter] = None
+
+    @property
+    def active(self) -> bool:
+        return self.listener is not None
+
+    def configure(
+        self,
+        level: str = LOG_LEVEL,
+        levels: Optional[Dict[str, str]] = None,
+        log_format: str = LOG_FORMAT,
+        payload_sample_rate: float = LOG_PAYLOAD_SAMPLE_RATE,
+        queue_size: int = LOG_QUEUE_SIZE,
+        stream: Any = None,
+    ) -> None:
+        """Einmal beim Start (main.py); erneuter Aufruf ersetzt die bisherige Konfiguration."""
+        self.shutdown()
+        redactor = Redactor([HA_TOKEN, GOOGLE_API_KEY, ALEXA_ACCESS_TOKEN, PROFILE_TOKEN])
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(TextFormatter(redactor) if log_format == "text" else JsonFormatter(redactor))
+
+        self.context_filter = ContextFilter(payload_sample_rate)
+        self.queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        self.queue_handler.addFilter(self.context_filter)
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, output, respect_handler_level=False)
+        self.listener.start()
+
+        root = logging.getLogger()
+        root.handlers = [self.queue_handler]
+        root.setLevel(level.upper())
+        for name in UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers = []
+            uvicorn_logger.propagate = True
+        for name, logger_level in (parse_levels(LOG_LEVELS) if levels is None else levels).items():
+            logging.getLogger(name).setLevel(logger_level)
+
+    def shutdown(self) -> None:
+        """Queue leeren und Listener stoppen (atexit und Tests)."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            logging.getLogger().removeHandler(self.queue_handler)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queue_handler.queue.qsize() if self.queue_handler else 0,
+            "dropped": self.queue_handler.dropped if self.queue_handler else 0,
+            "payloads_sampled_out": self.context_filter.sampled_out if self.context_filter else 0,
+        }
+
+
+logging_setup = LoggingSetup()
+atexit.register(logging_setup.shutdown)
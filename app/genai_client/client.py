@@ -1,9 +1,18 @@
 # Dateiname: ai_client.py
+import logging
 import os
-from google import genai
+import time
+from typing import Any, AsyncIterator
+
 from dotenv import load_dotenv
 
-from const import GOOGLE_API_KEY
+from const import GEMINI_BASE_URL, GOOGLE_API_KEY
+from diagnostics.request_profiler import current_profile
+from genai_client.scheduler import llm_scheduler
+from genai_client.usage import UsageTrackingClient, resolve_model
+from recording.recorder import instrument_genai_client
+
+logger = logging.getLogger(__name__)
 
 # 1. Umgebungsvariablen laden (.env Datei lesen)
 # Das sucht automatisch nach einer .env Datei im Projektordner
@@ -16,6 +25,18 @@ api_key = os.getenv("GOOGLE_API_KEY")
 _client_instance = None
 
 
+def create_client(key: str, base_url: str = None) -> Any:
+    """
+    Neuer Gemini Client, optional gegen einen anderen Endpoint (`GEMINI_BASE_URL`).
+    Das SDK wird erst hier importiert (etwa so teuer wie der Rest der App): Mit STARTUP_WARMUP passiert
+    das direkt nach dem Start im Hintergrund, sonst beim ersten LLM-Call statt schon beim Import der App.
+    """
+    from google import genai
+
+    http_options = {"base_url": base_url} if base_url else None
+    return genai.Client(api_key=key, http_options=http_options)
+
+
 def get_client():
     """
     Gibt die Client-Instanz zurück (Lazy Singleton).
@@ -25,20 +46,52 @@ def get_client():
 
     # Wenn wir den Client schon haben, sofort zurückgeben (Caching)
     if _client_instance is not None:
-        return _client_instance
+        return instrument_genai_client(UsageTrackingClient(_client_instance))
 
     # Prüfen, ob der Key da ist
     if not api_key:
-        print("❌ FEHLER: GOOGLE_API_KEY wurde in der .env Datei nicht gefunden!")
+        logger.error("GOOGLE_API_KEY wurde in der .env Datei nicht gefunden!")
         return None
 
     try:
         # Client konfigurieren und erstellen
-        print("🔌 Initialisiere Google AI Client...")
-        _client_instance = genai.Client(api_key=GOOGLE_API_KEY)
+        logger.info("Initialisiere Google AI Client...")
+        _client_instance = create_client(GOOGLE_API_KEY, GEMINI_BASE_URL)
 
-        return _client_instance
+        return instrument_genai_client(UsageTrackingClient(_client_instance))
 
     except Exception as e:
-        print(f"❌ Fehler beim Erstellen des Clients: {e}")
+        logger.error(f"Fehler beim Erstellen des Clients: {e}")
         return None
+
+
+def warm_up_connection(model: str) -> None:
+    """Client bauen und die Verbindung zur Gemini API aufbauen (Modell-Metadaten, kein Token-Verbrauch)."""
+    if get_client() is None:
+        raise RuntimeError("Kein Google AI Client verfügbar.")
+    _client_instance.models.get(model=model)
+
+
+async def stream_text(model: str, contents: str, config: dict = None) -> AsyncIterator[str]:
+    """
+    Streamt die Antwort Token für Token (Text-Chunks) über den async Client.
+    Wirft eine Exception, wenn kein Client verfügbar ist – der Handler entscheidet über die Fehlermeldung.
+    Der Scheduler-Slot wird bis zum letzten Chunk gehalten.
+    """
+    client = get_client()
+    if client is None:
+        raise RuntimeError("Kein Google AI Client verfügbar.")
+
+    profile = current_profile()
+    model = resolve_model(client, model)
+    config = await llm_scheduler.prompt_cache.apply(client, model, config)
+    async with llm_scheduler.slot(contents):
+        started = time.perf_counter() if profile else 0.0
+        try:
+            stream = await client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            if profile:
+                profile.add_stage("llm_stream", model, started)
@@ -0,0 +1,273 @@
+"""
+Hedging gegen die Tail-Latenz von Gemini.
+
+Antwortet das Handler-Modell nicht innerhalb seines gemessenen Perzentils (`LLM_HEDGE_PERCENTILE`),
+geht derselbe Prompt zusätzlich an `AI_HEDGE_MODEL_NAME`. Die erste erfolgreiche Antwort gewinnt,
+der andere Call wird abgebrochen. Ein Circuit Breaker pro Modell leitet nach mehreren Fehlern oder
+Timeouts in Folge direkt auf das andere Modell um, bis die Cooldown-Zeit abgelaufen ist.
+
+Beide Calls laufen über den `LlmScheduler` (Quote, Priorität, Retry bei 429). Schwelle, Timeout und
+Latenzen zählen erst ab dem Scheduler-Slot: Wartezeit in der Queue löst weder Hedge noch Breaker aus,
+429 zählt nicht als Fehler des Modells. Nach Ablauf der Cooldown-Zeit lässt der Breaker genau einen
+Probe-Call durch. Der synchrone SDK Call im Thread lässt sich nicht unterbrechen: Beim Abbruch wird
+sein Slot freigegeben und die Antwort verworfen.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from const import (
+    AI_HEDGE_MODEL_NAME,
+    LLM_BREAKER_COOLDOWN_SECONDS,
+    LLM_BREAKER_FAILURES,
+    LLM_HEDGE_DEFAULT_MS,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_TIMEOUT_SECONDS,
+)
+from genai_client.scheduler import CallTiming, LlmScheduler, is_rate_limited, llm_scheduler
+from genai_client.usage import resolve_model
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyWindow:
+    """Die letzten `size` Latenzen eines Modells (ms)."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, latency_ms: float) -> None:
+        self._samples.append(latency_ms)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.cooldown_seconds:
+            return self.HALF_OPEN  # ein Probe-Call darf durch
+        return self.OPEN
+
+    @property
+    def available(self) -> bool:
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probing)
+
+    def start_probe(self) -> bool:
+        """Reserviert im Zustand HALF_OPEN den einzigen Probe-Call (True, wenn dieser Call die Probe ist)."""
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Probe-Call ohne Ergebnis (abgebrochen, 429) -> der nächste Call darf proben."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+        self._probing = False
+
+
+class HedgingPolicy:
+    def __init__(
+        self,
+        secondary_model: str = AI_HEDGE_MODEL_NAME,
+        percentile: float = LLM_HEDGE_PERCENTILE,
+        default_threshold_ms: float = LLM_HEDGE_DEFAULT_MS,
+        min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        timeout_seconds: float = LLM_TIMEOUT_SECONDS,
+        breaker_failures: int = LLM_BREAKER_FAILURES,
+        breaker_cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS,
+        scheduler: LlmScheduler = llm_scheduler,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.secondary_model = secondary_model or None
+        self.percentile = percentile
+        self.default_threshold_ms = default_threshold_ms
+        self.min_samples = min_samples
+        self.timeout_seconds = timeout_seconds
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown_seconds = breaker_cooldown_seconds
+        self.scheduler = scheduler
+        self._clock = clock
+        self.latencies: Dict[str, LatencyWindow] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.rerouted = 0
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(self.breaker_failures, self.breaker_cooldown_seconds, self._clock)
+        return self.breakers[model]
+
+    def hedge_threshold_ms(self, model: str) -> float:
+        window = self.latencies.get(model)
+        if window is None or len(window) < self.min_samples:
+            return self.default_threshold_ms
+        return window.percentile(self.percentile)
+
+    def _route(self, model: str, secondary: Optional[str]) -> Tuple[str, Optional[str]]:
+        """
+        (erstes Modell, Hedge-Modell oder None) für die bereits aufgelösten Modelle (ggf. Budget-Modell).
+        Gleiche Modelle werden nicht gehedgt. Ein offener Breaker wird nur umgangen, wenn es eine Alternative gibt.
+        """
+        if secondary == model or (secondary and not self.breaker(secondary).available):
+            secondary = None
+        if secondary and not self.breaker(model).available:
+            self.rerouted += 1
+            logger.warning(f"Circuit Breaker offen für {model}, nutze {secondary}")
+            return secondary, None
+        return model, secondary
+
+    def _start(self, client: Any, model: str, contents: Any, config: Any, timing: Optional[CallTiming] = None) -> asyncio.Task:
+        # Probe vor dem Task reservieren, sonst könnten parallele Requests gleichzeitig proben
+        probe = self.breaker(model).start_probe()
+        return asyncio.create_task(self._call(client, model, contents, config, timing or CallTiming(), probe))
+
+    async def _call(self, client: Any, model: str, contents: Any, config: Any, timing: CallTiming, probe: bool) -> Any:
+        breaker = self.breaker(model)
+        try:
+            # Timeout und Latenz zählen erst ab dem Scheduler-Slot (Queue und 429-Backoff sind kein langsames Modell)
+            response = await self.scheduler.generate_content(
+                client, model=model, contents=contents, config=config, timeout=self.timeout_seconds, timing=timing
+            )
+        except asyncio.CancelledError:
+            # Abgebrochener Verlierer beim Modell: seine Latenz ist mindestens so hoch (sonst driftet das Perzentil nach unten)
+            if timing.model_ms is not None:
+                self.latencies.setdefault(model, LatencyWindow()).add(timing.model_ms)
+            if probe:
+                breaker.release_probe()
+            raise
+        except Exception as e:
+            if is_rate_limited(e):
+                # Quote erschöpft, das Modell selbst ist nicht gestört
+                if probe:
+                    breaker.release_probe()
+            else:
+                breaker.record_failure()
+            logger.warning(f"LLM {model} fehlgeschlagen ({type(e).__name__}), Breaker: {breaker.state}")
+            raise
+        self.latencies.setdefault(model, LatencyWindow()).add(timing.model_ms)
+        breaker.record_success()
+        return response
+
+    async def _exceeds_threshold(self, task: asyncio.Task, timing: CallTiming, threshold_ms: float) -> bool:
+        """Wartet, bis der Call fertig ist (False) oder länger als `threshold_ms` beim Modell läuft (True)."""
+        while not task.done():
+            if not timing.running.is_set():
+                # Noch in der Queue oder im 429-Backoff -> nicht hedgen, das würde nur mehr Last anstellen
+                running = asyncio.create_task(timing.running.wait())
+                try:
+                    await asyncio.wait({task, running}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    running.cancel()
+                continue
+            await asyncio.wait({task}, timeout=max(0.0, threshold_ms - timing.elapsed_ms()) / 1000)
+            if not task.done() and timing.running.is_set() and timing.elapsed_ms() >= threshold_ms:
+                return True
+        return False
+
+    async def generate_content(self, client: Any, *, model: str, contents: Any, config: Any = None) -> Any:
+        """Wie `client.models.generate_content`, mit Timeout, Hedging und Umleitung bei offenem Breaker."""
+        self.calls += 1
+        # Wie im Scheduler auflösen: Latenzen und Breaker gehören zum tatsächlich genutzten Modell
+        model = resolve_model(client, model)
+        secondary = resolve_model(client, self.secondary_model) if self.secondary_model else None
+        primary, secondary = self._route(model, secondary)
+        timing = CallTiming()
+        first = self._start(client, primary, contents, config, timing)
+        if secondary is None:
+            return await first
+
+        tasks = {first}
+        try:
+            slow = await self._exceeds_threshold(first, timing, self.hedge_threshold_ms(primary))
+            if not self.breaker(secondary).available:
+                return await first
+            if not slow:
+                if first.exception() is None:
+                    return first.result()
+                # Schneller Fehler des ersten Modells -> direkt das andere versuchen
+                self.fallbacks += 1
+                second = self._start(client, secondary, contents, config)
+                tasks.add(second)
+                return await second
+
+            self.hedged += 1
+            second = self._start(client, secondary, contents, config)
+            tasks.add(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result()
+            return first.result()  # beide fehlgeschlagen -> Fehler des ersten Modells
+        finally:
+            losers = [task for task in tasks if not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                # Kurz auf den Abbruch warten, damit der Scheduler-Slot vor der Antwort frei ist
+                await asyncio.wait(losers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        models = set(self.latencies) | set(self.breakers)
+        return {
+            "secondary_model": self.secondary_model,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "rerouted": self.rerouted,
+            "models": {
+                model: {
+                    "samples": len(self.latencies.get(model, ())),
+                    "p50_ms": self.latencies[model].percentile(50) if model in self.latencies else None,
+                    "hedge_threshold_ms": self.hedge_threshold_ms(model),
+                    "breaker": self.breaker(model).state,
+                }
+                for model in sorted(models)
+            },
+        }
+
+
+hedging_policy = HedgingPolicy()
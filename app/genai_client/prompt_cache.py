@@ -0,0 +1,168 @@
+"""
+Statischer Prompt-Teil als Gemini Cached Content.
+
+Die Handler schicken Regeln, Beispiele und Tool-Schema als `system_instruction`/`tools` in der Config
+und nur die Live-Werte als `contents`. `PromptCache.apply` legt den statischen Teil einmal pro Modell
+als Cached Content an (TTL `LLM_PROMPT_CACHE_TTL_SECONDS`), verlängert ihn kurz vor Ablauf und ersetzt
+ihn in der Config durch den Verweis `cached_content`. Gemini rechnet die gecachten Tokens dann als
+`cached_content_token_count` ab (siehe `/usage`).
+
+Ist der statische Teil kleiner als das Minimum des Modells (`LLM_PROMPT_CACHE_MIN_TOKENS`) oder schlägt
+das Anlegen fehl, wird er wie bisher mitgeschickt; ein Fehlschlag wird erst nach der TTL erneut versucht.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from const import LLM_PROMPT_CACHE_MIN_TOKENS, LLM_PROMPT_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Config-Felder, die zum statischen Teil gehören (dürfen neben `cached_content` nicht gesetzt sein)
+STATIC_FIELDS = ("system_instruction", "tools", "tool_config")
+
+
+def static_part(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {field: config[field] for field in STATIC_FIELDS if config and field in config}
+
+
+def static_key(static: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(static, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def is_stale_cache_error(error: Exception) -> bool:
+    """Cached Content serverseitig abgelaufen oder gelöscht."""
+    return getattr(error, "code", None) in (400, 403, 404) and "cache" in str(error).lower()
+
+
+class _CachedPrompt:
+    def __init__(self, name: str, expires_at: float, tokens: int):
+        self.name = name
+        self.expires_at = expires_at
+        self.tokens = tokens
+
+
+class PromptCache:
+    def __init__(
+        self,
+        ttl_seconds: int = LLM_PROMPT_CACHE_TTL_SECONDS,
+        min_tokens: int = LLM_PROMPT_CACHE_MIN_TOKENS,
+        refresh_margin_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        # Verlängern, solange der Eintrag noch sicher gültig ist (Standard: letztes Zehntel der TTL)
+        self.refresh_margin_seconds = ttl_seconds / 10 if refresh_margin_seconds is None else refresh_margin_seconds
+        self._clock = clock
+        self._entries: Dict[Tuple[str, str], _CachedPrompt] = {}
+        self._failed_until: Dict[Tuple[str, str], float] = {}
+        self._pending: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.hits = 0
+        self.creates = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.inline = 0
+        self.cached_tokens_sent = 0  # geschätzte Tokens, die nicht erneut mitgeschickt wurden
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    async def apply(self, client: Any, model: str, config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Config für den Call: statischer Teil durch `cached_content` ersetzt, sonst unverändert."""
+        static = static_part(config)
+        if not self.enabled or "system_instruction" not in static or getattr(client, "caches", None) is None:
+            return config
+
+        key = (model, static_key(static))
+        entry = await self._entry(client, key, static)
+        if entry is None:
+            self.inline += 1
+            return config
+
+        self.hits += 1
+        self.cached_tokens_sent += entry.tokens
+        dynamic = {k: v for k, v in config.items() if k not in STATIC_FIELDS}
+        return {**dynamic, "cached_content": entry.name}
+
+    def invalidate(self, name: str) -> None:
+        """Nach einem Fehler mit Verweis auf abgelaufenen Cached Content: beim nächsten Call neu anlegen."""
+        for key, entry in list(self._entries.items()):
+            if entry.name == name:
+                del self._entries[key]
+
+    async def _entry(self, client: Any, key: Tuple[str, str], static: Dict[str, Any]) -> Optional[_CachedPrompt]:
+        now = self._clock()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry.expires_at - self.refresh_margin_seconds:
+            return entry
+        if entry is None and now < self._failed_until.get(key, 0.0):
+            return None
+
+        # Gleichzeitige Calls teilen sich das Anlegen bzw. Verlängern
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._create_or_refresh(client, key, static, entry))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _create_or_refresh(
+        self, client: Any, key: Tuple[str, str], static: Dict[str, Any], entry: Optional[_CachedPrompt]
+    ) -> Optional[_CachedPrompt]:
+        model, digest = key
+        ttl = f"{self.ttl_seconds}s"
+        if entry is not None and self._clock() < entry.expires_at:
+            try:
+                await asyncio.to_thread(client.caches.update, name=entry.name, config={"ttl": ttl})
+                entry.expires_at = self._clock() + self.ttl_seconds
+                self.refreshes += 1
+                return entry
+            except Exception as e:
+                logger.warning(f"Prompt-Cache {entry.name} nicht verlängert ({e}), lege neu an")
+
+        tokens = len(json.dumps(static, ensure_ascii=False, default=str)) // 4
+        if tokens < self.min_tokens:
+            # Unter dem Minimum lehnt Gemini das Anlegen ab -> gar nicht erst versuchen
+            self._failed_until[key] = self._clock() + self.ttl_seconds
+            self._entries.pop(key, None)
+            return None
+
+        try:
+            cached = await asyncio.to_thread(
+                client.caches.create,
+                model=model,
+                config={**static, "display_name": f"has-alexa-llm-bridge-{digest}", "ttl": ttl},
+            )
+        except Exception as e:
+            self.failures += 1
+            self._failed_until[key] = self._clock() + self.ttl_seconds
+            self._entries.pop(key, None)
+            logger.warning(f"Prompt-Cache für {model} nicht angelegt, schicke den Prompt mit: {e}")
+            return None
+
+        self.creates += 1
+        entry = _CachedPrompt(cached.name, self._clock() + self.ttl_seconds, tokens)
+        self._entries[key] = entry
+        logger.info(f"Prompt-Cache {cached.name} für {model} angelegt (~{tokens} Tokens, TTL {ttl})")
+        return entry
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "inline": self.inline,
+            "creates": self.creates,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "estimated_cached_tokens_sent": self.cached_tokens_sent,
+        }
+
+
+prompt_cache = PromptCache()
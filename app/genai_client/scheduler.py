@@ -0,0 +1,337 @@
+"""
+Zentraler Scheduler für alle Gemini Calls: Die Quoten (Requests und Tokens pro Minute) teilen
+sich alle Handler, Router und Hintergrund-Jobs.
+
+- Token Buckets für RPM (`LLM_RPM_LIMIT`) und TPM (`LLM_TPM_LIMIT`, Input-Tokens grob geschätzt
+  und nach der Antwort mit `usage_metadata` korrigiert)
+- Prioritäts-Queue: Sprachanfragen vor Chat, Dashboard-Batches und Vorberechnung
+- Maximal `LLM_MAX_IN_FLIGHT` gleichzeitige Calls
+- Retry mit exponentiellem Backoff und Jitter bei 429 (RESOURCE_EXHAUSTED)
+
+Die Priorität kommt wie die Usage-Labels aus einem ContextVar, den die Einstiegspunkte setzen
+(Webhook, `/query`, `/query/batch`, Vorberechnung). Die Wartezeit in der Queue wird pro Priorität
+gemessen und über `/usage` ausgegeben.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from const import LLM_MAX_IN_FLIGHT, LLM_MAX_RETRIES, LLM_RETRY_BASE_SECONDS, LLM_RPM_LIMIT, LLM_TPM_LIMIT
+from diagnostics.request_profiler import current_profile
+from genai_client.prompt_cache import PromptCache, is_stale_cache_error, prompt_cache
+from genai_client.usage import resolve_model
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Kleiner Wert = wird zuerst bedient."""
+
+    VOICE = 0  # Alexa (SmartControl, LeaveHome, ...) – der Nutzer wartet auf die Sprachausgabe
+    INTERACTIVE = 1  # /query (HA Assist, Chat UI)
+    BATCH = 2  # /query/batch (Dashboard, Automationen)
+    BACKGROUND = 3  # Vorberechnung und Vorwärmen
+
+
+_llm_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+def set_llm_priority(priority: Priority) -> None:
+    """Alle folgenden LLM Calls des aktuellen Requests (Task) laufen mit dieser Priorität."""
+    _llm_priority.set(priority)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Wie `set_llm_priority`, aber nur für den Block."""
+    token = _llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        _llm_priority.reset(token)
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Grobe Schätzung der Input-Tokens (~4 Zeichen pro Token) für den TPM-Bucket."""
+    return len(str(contents)) // 4 + 1
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """429 vom Gemini API (`google.genai.errors.ClientError`) oder einem Proxy davor."""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    return "RESOURCE_EXHAUSTED" in str(error)
+
+
+def retry_delay_hint(error: Exception) -> Optional[float]:
+    """Vom Server vorgeschlagene Wartezeit (RetryInfo.retryDelay, z.B. "12s"), falls vorhanden."""
+    response_json = getattr(error, "details", None)
+    if not isinstance(response_json, dict):
+        return None
+    details = response_json.get("error", {}).get("details", [])
+    for detail in details if isinstance(details, list) else []:
+        match = re.fullmatch(r"([\d.]+)s", str(detail.get("retryDelay", ""))) if isinstance(detail, dict) else None
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """Bucket mit Kapazität `per_minute`, der kontinuierlich nachläuft (0 = unbegrenzt)."""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Sekunden, bis `amount` verfügbar ist (Anfragen über der Kapazität warten auf einen vollen Bucket)."""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self._tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float) -> None:
+        if self.enabled:
+            self._refill()
+            self._tokens -= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Korrigiert eine Schätzung nachträglich (positiv = mehr verbraucht als geschätzt)."""
+        if self.enabled:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+
+class QueueWaitStats:
+    def __init__(self):
+        self.count = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def add(self, wait_ms: float) -> None:
+        self.count += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "wait_ms_avg": round(self.wait_ms_total / self.count, 1) if self.count else 0.0,
+            "wait_ms_max": round(self.wait_ms_max, 1),
+        }
+
+
+class CallTiming:
+    """
+    Laufzeit eines Calls beim Modell, ohne Wartezeit in der Queue und 429-Backoff
+    (für Hedging-Schwelle, Latenz-Fenster und Timeout in `genai_client.hedging`).
+    """
+
+    def __init__(self):
+        self.running = asyncio.Event()  # gesetzt, solange ein Versuch beim Modell läuft
+        self.started_at: Optional[float] = None
+        self.model_ms: Optional[float] = None  # Dauer des letzten Versuchs
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self.running.set()
+
+    def stop(self) -> None:
+        self.model_ms = self.elapsed_ms()
+        self.running.clear()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started_at) * 1000 if self.started_at is not None else 0.0
+
+
+class LlmScheduler:
+    def __init__(
+        self,
+        rpm_limit: int = LLM_RPM_LIMIT,
+        tpm_limit: int = LLM_TPM_LIMIT,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base_seconds: float = LLM_RETRY_BASE_SECONDS,
+        prompt_cache: PromptCache = prompt_cache,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.prompt_cache = prompt_cache
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._requests = TokenBucket(rpm_limit, clock)
+        self._tokens = TokenBucket(tpm_limit, clock)
+        self._waiting: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.in_flight = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.queue_wait: Dict[Priority, QueueWaitStats] = {p: QueueWaitStats() for p in Priority}
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self._waiting if not future.done())
+
+    def _dispatch(self) -> None:
+        """Gibt Slots strikt nach Priorität (und Reihenfolge) frei, solange Quote und Limit es erlauben."""
+        while self._waiting:
+            _, _, tokens, future = self._waiting[0]
+            if future.done():  # abgebrochen, während er wartete
+                heapq.heappop(self._waiting)
+                continue
+            if self.in_flight >= self.max_in_flight:
+                return
+            wait = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+            if wait > 0:
+                # Niedrigere Prioritäten überholen nicht: der Kopf der Queue wartet auf die Quote
+                if self._timer is not None:
+                    self._timer.cancel()
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiting)
+            self._requests.take(1)
+            self._tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    async def acquire(self, tokens: int, priority: Optional[Priority] = None) -> float:
+        """Wartet auf einen Slot und gibt die Wartezeit in ms zurück."""
+        priority = _llm_priority.get() if priority is None else priority
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (int(priority), next(self._seq), tokens, future))
+        start = time.perf_counter()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # Slot war schon vergeben
+            raise
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.queue_wait[Priority(priority)].add(wait_ms)
+        if wait_ms >= 100:
+            logger.info(f"LLM Queue {Priority(priority).name}: {wait_ms:.0f} ms gewartet")
+        return wait_ms
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, contents: Any, priority: Optional[Priority] = None):
+        """Ein Slot für einen Call (z.B. einen Stream, der bis zum letzten Chunk gehalten wird)."""
+        await self.acquire(estimate_tokens(contents), priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _backoff_seconds(self, attempt: int, error: Exception) -> float:
+        hint = retry_delay_hint(error)
+        backoff = self.retry_base_seconds * 2 ** (attempt - 1)
+        # Jitter verteilt gleichzeitig abgelehnte Calls, statt sie gemeinsam erneut anlaufen zu lassen
+        return max(hint or 0.0, backoff * random.uniform(0.5, 1.5))
+
+    async def generate_content(
+        self,
+        client: Any,
+        *,
+        model: str,
+        contents: Any,
+        config: Any = None,
+        priority: Optional[Priority] = None,
+        timeout: Optional[float] = None,
+        timing: Optional[CallTiming] = None,
+    ) -> Any:
+        """
+        `client.models.generate_content` über die Queue. Der synchrone SDK Call läuft im Thread,
+        damit der Event Loop frei bleibt. Bei 429 wird der Slot freigegeben und nach Backoff neu angestellt.
+        Der statische Prompt-Teil in `config` geht, wenn möglich, als Cached Content mit (`PromptCache`),
+        angelegt für das tatsächlich genutzte Modell (ggf. Budget-Modell).
+        `timeout` gilt pro Versuch ab dem vergebenen Slot, `timing` misst nur die Zeit beim Modell.
+        """
+        model = resolve_model(client, model)
+        priority = _llm_priority.get() if priority is None else priority
+        profile = current_profile()
+        estimated = estimate_tokens(contents)
+        request_config = await self.prompt_cache.apply(client, model, config)
+        attempt = 0
+        while True:
+            queued_at = time.perf_counter() if profile else 0.0
+            await self.acquire(estimated, priority)
+            if profile:
+                profile.add_stage("llm_queue", model, queued_at, priority=Priority(priority).name)
+                started, cached = time.perf_counter(), request_config is not config
+            if timing:
+                timing.start()
+            try:
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(client.models.generate_content, model=model, contents=contents, config=request_config),
+                    timeout,
+                )
+            except Exception as e:
+                if request_config is not config and is_stale_cache_error(e):
+                    # Cached Content serverseitig weg -> sofort mit vollem Prompt wiederholen
+                    self.prompt_cache.invalidate(request_config["cached_content"])
+                    request_config = config
+                    continue
+                if not is_rate_limited(e):
+                    raise
+                self.rate_limited += 1
+                if attempt >= self.max_retries:
+                    raise
+                error = e
+            else:
+                used = getattr(getattr(response, "usage_metadata", None), "prompt_token_count", None)
+                if isinstance(used, int):
+                    self._tokens.adjust(used - estimated)
+                return response
+            finally:
+                if timing:
+                    timing.stop()
+                self.release()
+                if profile:
+                    profile.add_stage("llm", model, started, attempt=attempt, cached=cached)
+
+            attempt += 1
+            self.retries += 1
+            delay = self._backoff_seconds(attempt, error)
+            logger.warning(f"Gemini 429 ({Priority(priority).name}), Versuch {attempt}/{self.max_retries} in {delay:.1f} s")
+            await asyncio.sleep(delay)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "rpm_limit": int(self._requests.capacity),
+            "tpm_limit": int(self._tokens.capacity),
+            "rate_limited": self.rate_limited,
+            "retries": self.retries,
+            "queue_wait": {p.name: stats.to_dict() for p, stats in self.queue_wait.items()},
+        }
+
+
+llm_scheduler = LlmScheduler()
@@ -0,0 +1,233 @@
+"""
+Token-Verbrauch und Latenz aller Gemini Calls, aggregiert pro Kategorie, Intent und Modell.
+
+`UsageTrackingClient` umhüllt den Gemini Client (siehe `get_client`) und liest nach jedem
+`generate_content` (sync, async und Stream) die `usage_metadata` aus. Die Zuordnung zu
+Kategorie/Intent kommt aus einem ContextVar, den Router und Handler-Aufruf setzen.
+
+Tagesbudgets (`LLM_DAILY_TOKEN_BUDGET`, optional pro Kategorie) schalten bei Überschreitung
+auf das günstigere `AI_BUDGET_MODEL_NAME` bzw. lassen die Handler auf Templates ausweichen.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from const import AI_BUDGET_MODEL_NAME, LLM_CATEGORY_TOKEN_BUDGETS, LLM_DAILY_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# (Kategorie, Intent) des aktuell laufenden Requests
+_usage_labels: contextvars.ContextVar[Tuple[str, Optional[str]]] = contextvars.ContextVar(
+    "usage_labels", default=("UNKNOWN", None)
+)
+
+
+def set_usage_labels(category: str, intent_name: Optional[str] = None) -> None:
+    """Ordnet alle folgenden LLM Calls des aktuellen Requests (Task) dieser Kategorie zu."""
+    _usage_labels.set((category, intent_name))
+
+
+@contextmanager
+def usage_labels(category: str, intent_name: Optional[str] = None):
+    """Wie `set_usage_labels`, aber nur für den Block (z.B. den Router-Call vor dem Handler)."""
+    token = _usage_labels.set((category, intent_name))
+    try:
+        yield
+    finally:
+        _usage_labels.reset(token)
+
+
+def _token_count(usage_metadata: Any, field: str) -> int:
+    val = getattr(usage_metadata, field, None)
+    return val if isinstance(val, int) else 0
+
+
+class UsageStats:
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+
+    def add(self, input_tokens: int, output_tokens: int, cached_tokens: int, latency_ms: float) -> None:
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.cached_tokens += cached_tokens
+        self.latency_ms_total += latency_ms
+        self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "total_tokens": self.total_tokens,
+            "latency_ms_avg": round(self.latency_ms_total / self.calls, 1) if self.calls else 0.0,
+            "latency_ms_max": round(self.latency_ms_max, 1),
+        }
+
+
+class UsageTracker:
+    def __init__(self, daily_token_budget: int = 0, category_budgets: Dict[str, int] = None, budget_model: Optional[str] = None):
+        self.daily_token_budget = daily_token_budget
+        self.category_budgets = category_budgets or {}
+        self.budget_model = budget_model
+        self.totals: Dict[Tuple[str, str, str], UsageStats] = {}
+        self._day = date.today()
+        self._today: Dict[str, int] = {}  # Kategorie -> Tokens heute
+
+    def _roll_day(self) -> None:
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._today = {}
+
+    def record(self, model: str, usage_metadata: Any, latency_ms: float) -> None:
+        category, intent_name = _usage_labels.get()
+        input_tokens = _token_count(usage_metadata, "prompt_token_count")
+        output_tokens = _token_count(usage_metadata, "candidates_token_count")
+        cached_tokens = _token_count(usage_metadata, "cached_content_token_count")
+
+        key = (category, intent_name or "-", model)
+        self.totals.setdefault(key, UsageStats()).add(input_tokens, output_tokens, cached_tokens, latency_ms)
+
+        self._roll_day()
+        self._today[category] = self._today.get(category, 0) + input_tokens + output_tokens
+
+        logger.info(
+            f"LLM {category}/{intent_name or '-'} {model}: in={input_tokens} out={output_tokens} "
+            f"cached={cached_tokens} {latency_ms:.0f} ms"
+        )
+
+    def tokens_today(self, category: Optional[str] = None) -> int:
+        self._roll_day()
+        if category is None:
+            return sum(self._today.values())
+        return self._today.get(category, 0)
+
+    def budget_exceeded(self, category: Optional[str] = None) -> bool:
+        """Globales Tagesbudget oder das Budget der (aktuellen) Kategorie ist aufgebraucht."""
+        if category is None:
+            category = _usage_labels.get()[0]
+        if self.daily_token_budget and self.tokens_today() >= self.daily_token_budget:
+            return True
+        category_budget = self.category_budgets.get(category)
+        return bool(category_budget) and self.tokens_today(category) >= category_budget
+
+    def effective_model(self, model: str) -> str:
+        if self.budget_model and self.budget_model != model and self.budget_exceeded():
+            logger.warning(f"Token-Budget überschritten, nutze {self.budget_model} statt {model}")
+            return self.budget_model
+        return model
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "day": self._day.isoformat(),
+            "tokens_today": self.tokens_today(),
+            "tokens_today_per_category": dict(self._today),
+            "daily_token_budget": self.daily_token_budget,
+            "category_budgets": self.category_budgets,
+            "budget_exceeded": self.daily_token_budget > 0 and self.tokens_today() >= self.daily_token_budget,
+            "usage": [
+                {"category": category, "intent": intent_name, "model": model, **stats.to_dict()}
+                for (category, intent_name, model), stats in sorted(self.totals.items())
+            ],
+        }
+
+
+usage_tracker = UsageTracker(LLM_DAILY_TOKEN_BUDGET, LLM_CATEGORY_TOKEN_BUDGETS, AI_BUDGET_MODEL_NAME)
+
+
+def _elapsed_ms(start: float) -> float:
+    return (time.perf_counter() - start) * 1000
+
+
+class _TrackingModels:
+    def __init__(self, inner: Any, tracker: UsageTracker):
+        self._inner = inner
+        self._tracker = tracker
+
+    def generate_content(self, *, model: str, **kwargs) -> Any:
+        model = self._tracker.effective_model(model)
+        start = time.perf_counter()
+        response = self._inner.generate_content(model=model, **kwargs)
+        self._tracker.record(model, getattr(response, "usage_metadata", None), _elapsed_ms(start))
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class _TrackingAsyncModels:
+    def __init__(self, inner: Any, tracker: UsageTracker):
+        self._inner = inner
+        self._tracker = tracker
+
+    async def generate_content(self, *, model: str, **kwargs) -> Any:
+        model = self._tracker.effective_model(model)
+        start = time.perf_counter()
+        response = await self._inner.generate_content(model=model, **kwargs)
+        self._tracker.record(model, getattr(response, "usage_metadata", None), _elapsed_ms(start))
+        return response
+
+    async def generate_content_stream(self, *, model: str, **kwargs) -> AsyncIterator[Any]:
+        model = self._tracker.effective_model(model)
+        start = time.perf_counter()
+        stream = await self._inner.generate_content_stream(model=model, **kwargs)
+
+        async def tracked():
+            usage_metadata = None
+            async for chunk in stream:
+                # Der letzte Chunk mit usage_metadata enthält die Summe des ganzen Streams
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                yield chunk
+            self._tracker.record(model, usage_metadata, _elapsed_ms(start))
+
+        return tracked()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class _TrackingAio:
+    def __init__(self, inner: Any, tracker: UsageTracker):
+        self._inner = inner
+        self.models = _TrackingAsyncModels(inner.models, tracker)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class UsageTrackingClient:
+    """Proxy um den Gemini Client, der Token-Verbrauch und Latenz jedes Calls erfasst."""
+
+    def __init__(self, inner: Any, tracker: UsageTracker = usage_tracker):
+        self._inner = inner
+        self.tracker = tracker
+        # Fakes in Tests haben oft nur `models` oder nur `aio`
+        self.models = _TrackingModels(inner.models, tracker) if hasattr(inner, "models") else None
+        self.aio = _TrackingAio(inner.aio, tracker) if hasattr(inner, "aio") else None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+def resolve_model(client: Any, model: str) -> str:
+    """
+    Modell, mit dem der Call über diesen Client tatsächlich läuft (Budget-Modell bei überschrittenem
+    Token-Budget). Vor dem Prompt-Cache auflösen: Cached Content gilt nur für das Modell, für das er angelegt wurde.
+    """
+    if isinstance(client, UsageTrackingClient):
+        return client.tracker.effective_model(model)
+    return model
@@ -0,0 +1,86 @@
+"""
+Kompakte Entitäten für den Smart Home Context.
+
+Der HaService baut pro HA-State genau ein `Entity` (mit `__slots__`, ohne `attributes`): Domain,
+Bereich und Geräteklasse sind internierte Strings (bei ~5.000 Entitäten nur wenige Dutzend
+verschiedene Werte), der Zustand ist zusätzlich als Zahl vorgeparst (`value`, sonst `None`).
+`controllable_devices` und `sensors` im Context sind Listen dieser Objekte.
+
+Zu Dicts werden sie erst an den Rändern: im Prompt und in JSON-Antworten/Aufnahmen über
+`to_dict` (siehe `serialization.fast_json.json_default`). Umgekehrt machen `as_entities`
+Dicts aus Mocks und aufgenommenen Contexts wieder zu Entitäten.
+"""
+from sys import intern
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Nicht verfügbare Entitäten kommen nicht in Geräte- und Sensorlisten (hält den Kontext klein)
+UNAVAILABLE_STATES = ("unavailable", "unknown")
+
+# Schneller Vorab-Check: "on", "off", "closed" usw. ohne teure Exception in `float()`
+_NUMBER_START = frozenset("0123456789-+. ")
+
+
+class Entity:
+    __slots__ = ("eid", "name", "domain", "area", "device_class", "state", "value")
+
+    def __init__(self, eid: str, name: str, area: Optional[str], state: str, device_class: str):
+        self.eid = eid
+        self.name = name
+        self.domain = intern(eid.partition(".")[0])
+        self.area = intern(area) if area else area
+        # Fehlt die Geräteklasse, steht wie bisher die Entity-ID drin (z.B. "light.flur")
+        self.device_class = device_class if device_class is eid else intern(device_class)
+        # Zahlen sind fast immer verschieden, Zustände wie "on"/"off" wiederholen sich
+        if state and state[0] in _NUMBER_START:
+            try:
+                self.value = float(state)
+                self.state = state
+                return
+            except ValueError:
+                pass
+        self.value = None
+        self.state = intern(state)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Entity":
+        """Aus dem Dict-Format (`to_dict`), z.B. aus Aufnahmen oder Tests."""
+        eid = d["eid"]
+        return cls(eid, d.get("name", eid), d.get("area"), f"{d.get('state')}", d.get("device_class", eid))
+
+    def row(self) -> Tuple[str, str, Optional[str], str, str]:
+        return self.eid, self.name, self.area, self.state, self.device_class
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict-Format für Prompt und JSON (Schlüssel und Reihenfolge wie früher im HaService)."""
+        return {"eid": self.eid, "name": self.name, "area": self.area, "state": self.state, "device_class": self.device_class}
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, Entity) and self.row() == other.row()
+
+    def __hash__(self) -> int:
+        return hash(self.row())
+
+    def __repr__(self) -> str:
+        return f"Entity({self.eid!r}, state={self.state!r}, area={self.area!r}, device_class={self.device_class!r})"
+
+
+def as_entities(items: Iterable[Any]) -> List[Entity]:
+    """Entitäten unverändert, Dicts (Mocks, Replays) umgewandelt."""
+    return [item if type(item) is Entity else Entity.from_dict(item) for item in items]
+
+
+def state_value(entity: Optional[Entity], default: Any = None) -> Any:
+    """Zahl, wenn der Zustand numerisch ist, sonst der Zustand als Text (Energie-Werte im Context)."""
+    if entity is None:
+        return default
+    return entity.value if entity.value is not None else entity.state
+
+
+def build_entities(all_states: List[Dict[str, Any]], areas: Dict[str, str]) -> List[Entity]:
+    """Ein `Entity` pro HA-State; die rohen State-Dicts (mit `attributes`) werden danach nicht mehr gebraucht."""
+    entities = []
+    for state in all_states:
+        eid = state["entity_id"]
+        attributes = state["attributes"]
+        entities.append(Entity(eid, attributes.get("friendly_name", eid), areas.get(eid), f"{state['state']}", f"{attributes.get('device_class', eid)}"))
+    return entities
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from category_handler.home_status import (
+    consumer_entry,
+    is_active_light,
+    is_high_consumer,
+    is_open_opening,
+    light_entry,
+    opening_entry,
+)
+from ha_service.entities import Entity
+
+# Mengen der LeaveHome-Zusammenfassung: Name -> (Liste im Context, Prädikat, Eintrag)
+VIEW_SETS = {
+    "lights": ("controllable_devices", is_active_light, light_entry),
+    "openings": ("sensors", is_open_opening, opening_entry),
+    "consumers": ("sensors", is_high_consumer, consumer_entry),
+}
+
+
+def _signature(e: Entity) -> Tuple[Any, Any, Any]:
+    return e.state, e.area, e.device_class
+
+
+class LeaveHomeView:
+    """
+    Materialisierte Sicht für den LeaveHome-Handler: brennende Lichter, offene Fenster/Türen und
+    Verbraucher über `LEAVE_HOME_POWER_THRESHOLD_WATT`.
+
+    Pro Entität merkt sich die Sicht Zustand/Bereich/Geräteklasse und die Zugehörigkeit zu den drei
+    Mengen. `refresh` vergleicht bei jedem HA-Abruf nur die Signaturen und prüft die Prädikate allein
+    für geänderte, neue und verschwundene Entitäten. Die Zusammenfassung wird nur nach einer Änderung
+    neu gebaut (als neue Listen, ältere Contexts im Cache bleiben unverändert).
+    """
+
+    def __init__(self):
+        # (Liste im Context, eid) -> Signatur
+        self._signatures: Dict[Tuple[str, str], Tuple[Any, Any, Any]] = {}
+        # Menge -> eid -> Eintrag, Einfügereihenfolge wie in HA
+        self._members: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in VIEW_SETS}
+        self._summary: Optional[Dict[str, List[Dict[str, Any]]]] = None
+        self.refreshes = 0
+        self.changed_entities = 0
+
+    def refresh(self, controllable_devices: List[Entity], sensors: List[Entity]) -> Dict[str, List[Dict[str, Any]]]:
+        self.refreshes += 1
+        lists = {"controllable_devices": controllable_devices, "sensors": sensors}
+        seen = set()
+        for list_name, entities in lists.items():
+            for e in entities:
+                key = (list_name, e.eid)
+                seen.add(key)
+                signature = _signature(e)
+                if self._signatures.get(key) == signature:
+                    continue
+                self._signatures[key] = signature
+                self._update(list_name, e)
+
+        for key in [k for k in self._signatures if k not in seen]:
+            del self._signatures[key]
+            self._remove(*key)
+        return self.summary()
+
+    def summary(self) -> Dict[str, List[Dict[str, Any]]]:
+        if self._summary is None:
+            self._summary = {name: list(members.values()) for name, members in self._members.items()}
+        return self._summary
+
+    def clear(self) -> None:
+        self._signatures.clear()
+        for members in self._members.values():
+            members.clear()
+        self._summary = None
+
+    def _update(self, list_name: str, e: Entity) -> None:
+        self.changed_entities += 1
+        for name, (source, predicate, entry) in VIEW_SETS.items():
+            if source != list_name:
+                continue
+            members = self._members[name]
+            if predicate(e):
+                members[e.eid] = entry(e)
+                self._summary = None
+            elif members.pop(e.eid, None) is not None:
+                self._summary = None
+
+    def _remove(self, list_name: str, eid: str) -> None:
+        self.changed_entities += 1
+        for name, (source, _, _) in VIEW_SETS.items():
+            if source == list_name and self._members[name].pop(eid, None) is not None:
+                self._summary = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "entities": len(self._signatures),
+            "refreshes": self.refreshes,
+            "changed_entities": self.changed_entities,
+            **{name: len(members) for name, members in self._members.items()},
+        }
+
+
+# Gemeinsam für alle HaService-Instanzen, wie die Caches
+leave_home_view = LeaveHomeView()
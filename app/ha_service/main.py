@@ -1,9 +1,15 @@
 import asyncio
-import traceback
+import logging
+import time
 from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Tuple
 import httpx
 
-from const import HA_URL, HA_TOKEN
+from const import HA_URL, HA_TOKEN, AREA_CACHE_TTL_SECONDS, CONTEXT_CACHE_TTL_SECONDS, HISTORY_CACHE_TTL_SECONDS
+from ha_service.entities import UNAVAILABLE_STATES, Entity, build_entities, state_value
+from ha_service.leave_home_view import leave_home_view
+
+logger = logging.getLogger(__name__)
 
 # Mappings moved from main.py
 ENERGY_MAPPING = {
@@ -19,6 +25,9 @@ ENERGY_MAPPING = {
     "haus_power": "sensor.senec_house_power"
 }
 
+CONTROLLABLE_DOMAINS = ("light", "cover", "climate", "switch", "vacuum")
+SENSOR_DOMAINS = ("sensor", "binary_sensor")
+
 HISTORY_MAPPING = {
     "Wallbox": "sensor.senec_webapi_v3_wallbox_consumption_total",
     "Akku_Geladen": "sensor.senec_webapi_v3_accuexport_total",
@@ -29,6 +38,77 @@ HISTORY_MAPPING = {
     "Hausverbrauch_Gesamt": "sensor.senec_webapi_v3_consumption_total",
 }
 
+def history_base(now: datetime) -> datetime:
+    """
+    Bezugszeitpunkt der History-Abfragen ("jetzt minus n Tage"). Mit History-Cache auf die volle
+    Stunde abgerundet, damit die Abfragen einer Stunde dieselben festen Zeitpunkte treffen; der
+    Wert für "Gestern" enthält dann bis zu einer Stunde mehr Verbrauch. Ohne Cache exakt `now`.
+    """
+    if not history_cache.enabled:
+        return now
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+class TtlCache:
+    """Einfacher In-Memory Cache mit fester Lebensdauer pro Eintrag (0 = aus)."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.enabled:
+            now = time.monotonic()
+            # Abgelaufene Einträge entfernen (Schlüssel mit Zeitstempel werden nie wieder gelesen)
+            for expired in [k for k, (stored, _) in self._entries.items() if now - stored > self.ttl_seconds]:
+                del self._entries[expired]
+            self._entries[key] = (now, value)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Gemeinsam für alle HaService-Instanzen (pro Request wird eine neue erzeugt)
+# Context: kurz (Zustände ändern sich), Historie: lang (Tageswerte der Vergangenheit)
+context_cache = TtlCache(CONTEXT_CACHE_TTL_SECONDS)
+history_cache = TtlCache(HISTORY_CACHE_TTL_SECONDS)
+# Raum-Zuordnung (Template-Abfrage über alle States) ändert sich selten
+area_cache = TtlCache(AREA_CACHE_TTL_SECONDS)
+
+# Gemeinsamer HTTP Client (Keep-Alive zu HA), je Event Loop einer (Tests/Skripte starten mehrere Loops)
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is None or _http_client.is_closed or _http_client_loop is not loop:
+        _http_client = httpx.AsyncClient()
+        _http_client_loop = loop
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None and _http_client_loop is asyncio.get_running_loop():
+        await _http_client.aclose()
+    _http_client = None
+
+
 class HaService:
     def __init__(self):
         self.base_url = HA_URL
@@ -45,69 +125,64 @@ class HaService:
         url = f"{self.base_url}/api/services/{domain}/{service}"
         
         payload = {"entity_id": entity_id}
-        print(f"HA ACTION: {domain}.{service} -> {entity_id}")
-        async with httpx.AsyncClient() as http_client:
-            try:
-                resp = await http_client.post(
-                    url, json=payload, headers=self.headers, timeout=5.0
-                )
-                return resp.status_code == 200
-            except Exception:
-                return False
+        logger.info(f"HA ACTION: {domain}.{service} -> {entity_id}", extra={"data": {"domain": domain, "service": service, "entity_id": entity_id}})
+        try:
+            resp = await get_http_client().post(
+                url, json=payload, headers=self.headers, timeout=5.0
+            )
+            if resp.status_code == 200:
+                # Geschaltet -> gecachter Context ist veraltet
+                context_cache.clear()
+                return True
+            return False
+        except Exception:
+            return False
 
-    def filter_entities(self, all_states, allowed_domains, blocklist):
+    def filter_entities(self, entities: List[Entity], allowed_domains, blocklist) -> List[Entity]:
         """
         Filtert aus allen ~500 Entitäten die relevanten steuerbaren Geräte heraus.
         """
         targets = []
 
-        for entity in all_states:
-            eid = entity["entity_id"]
-            name = entity["attributes"].get("friendly_name", eid)
-            device_class = entity["attributes"].get("device_class", eid)
-            domain = eid.split(".")[0]
-            area = entity["area"]
-            state = entity["state"]
-
+        for entity in entities:
             # 1. Domain Check
-            if domain not in allowed_domains:
+            if entity.domain not in allowed_domains:
                 continue
 
             # 2. Blocklist Check
-            if any(blocked in name for blocked in blocklist):
+            if any(blocked in entity.name for blocked in blocklist):
                 continue
 
             # 3. Unavailable Check (optional, um Kontext klein zu halten)
-            if state in ["unavailable", "unknown"]:
+            if entity.state in UNAVAILABLE_STATES:
                 continue
 
-            targets.append(
-                {
-                    "eid": eid,
-                    "name": name,
-                    "area": area,
-                    "state": f"{state}",
-                    "device_class": f"{device_class}",
-                }
-            )
+            targets.append(entity)
 
         return targets
 
     async def get_areas(self):
-        async with httpx.AsyncClient() as http_client_areas:
-            body = {
-                "template": "{% set ns = namespace(items=[]) %}{% for s in states %}{% set area = area_name(s.entity_id) %}{% if area %}{% set ns.items = ns.items + [(s.entity_id, area)] %}{% endif %}{% endfor %}{{ dict(ns.items) | to_json }}"
-            }
-            try:
-                response = await http_client_areas.post(
-                    f"{self.base_url}/api/template", headers=self.headers, json=body, timeout=5.0
-                )
-                if response.status_code != 200:
-                    return {}
-                return response.json()
-            except Exception as e:
-                print(f"HA Error: {e}")
+        """Raum-Zuordnung aller Entitäten; bis `AREA_CACHE_TTL_SECONDS` aus dem Cache (auch vom Startup-Warmup)."""
+        cached = area_cache.get(self.base_url)
+        if cached is not None:
+            return cached
+        body = {
+            "template": "{% set ns = namespace(items=[]) %}{% for s in states %}{% set area = area_name(s.entity_id) %}{% if area %}{% set ns.items = ns.items + [(s.entity_id, area)] %}{% endif %}{% endfor %}{{ dict(ns.items) | to_json }}"
+        }
+        try:
+            response = await get_http_client().post(
+                f"{self.base_url}/api/template", headers=self.headers, json=body, timeout=5.0
+            )
+            if response.status_code != 200:
                 return {}
+            areas = response.json()
+        except Exception as e:
+            logger.error(f"HA Error: {e}")
+            return {}
+        # Leere Antwort (HA startet noch) nicht cachen
+        if areas:
+            area_cache.put(self.base_url, areas)
+        return areas
 
     async def fetch_history_point(self, client, entity_id, timestamp):
         """
@@ -140,119 +215,133 @@ class HaService:
         except Exception:
             return None
 
+    async def _cached_history_point(self, client, entity_id, timestamp):
+        """
+        Der Zählerstand zu einem festen Zeitpunkt ändert sich nicht mehr -> bis `HISTORY_CACHE_TTL_SECONDS`
+        wiederverwenden. Schlüssel ist der abgefragte Zeitpunkt selbst (siehe `history_base`).
+        """
+        key = (self.base_url, entity_id, timestamp)
+        cached = history_cache.get(key)
+        if cached is not None:
+            return cached
+        val = await self.fetch_history_point(client, entity_id, timestamp)
+        if val is not None:
+            history_cache.put(key, val)
+        return val
+
     async def get_smart_home_context(self):
         """
         Holt ALLE Daten von HA und bereitet sie auf.
+        Mit `CONTEXT_CACHE_TTL_SECONDS` kommt ein frischer Context aus dem Cache (z.B. vorgewärmt).
         """
         if not self.base_url or not self.token:
             return {"energy_context": {}, "energy_history": {}, "controllable_devices": [], "sensors": []}
 
+        cached = context_cache.get(self.base_url)
+        if cached is not None:
+            return cached
+        context = await self._fetch_smart_home_context()
+        if context["energy_context"]:  # Fehler-Antworten nicht cachen
+            context_cache.put(self.base_url, context)
+        return context
+
+    async def _fetch_smart_home_context(self):
         area_task = asyncio.create_task(self.get_areas())
 
-        async with httpx.AsyncClient() as http_client:
-            try:
-                # 1. Aktuelle States holen (für Live Context & aktuelle Zählerstände)
-                response = await http_client.get(
-                    f"{self.base_url}/api/states", headers=self.headers, timeout=5.0
+        http_client = get_http_client()
+        try:
+            # 1. Aktuelle States holen (für Live Context & aktuelle Zählerstände)
+            response = await http_client.get(
+                f"{self.base_url}/api/states", headers=self.headers, timeout=5.0
+            )
+
+            controllable_devices = []
+            sensors = []
+            energy_context = {}
+            energy_history = {}
+
+            if response.status_code == 200:
+
+                # Ein kompakter Datensatz pro Entität, die rohen States werden danach verworfen
+                entities = build_entities(response.json(), await area_task)
+                by_id = {entity.eid: entity for entity in entities}
+
+                controllable_devices = self.filter_entities(
+                    entities, CONTROLLABLE_DOMAINS,
+                    ["Internet Access", "Update", "Firmware", "Status", "sensor", "ChildLock", "Reboot", "Identifizieren", "Scene", "Schedule", "quality", "rssi", "overheat", "overpower"]
+                )
+                sensors = self.filter_entities(
+                    entities, SENSOR_DOMAINS,
+                    ["Internet Access", "Update", "Firmware", "Status", "ChildLock", "Reboot", "Identifizieren", "Scene", "Schedule", "quality", "rssi", "overheat", "overpower"]
                 )
 
-                controllable_devices = []
-                sensors = []
-                energy_context = {}
-                energy_history = {}
-                state_map = {} # Cache für schnellen Zugriff
-
-                if response.status_code == 200:
-                    all_states = response.json()
-                    area_data = await area_task
-
-                    # State Map aufbauen
-                    for state in all_states:
-                        entity_id = state["entity_id"]
-                        state["area"] = area_data.get(entity_id)
-
-                        try:
-                            val = float(state["state"])
-                        except Exception:
-                            val = state["state"]
-                        state_map[entity_id] = val
-
-                    controllable_devices = self.filter_entities(
-                        all_states, ["light", "cover", "climate", "switch", "vacuum"],
-                        ["Internet Access", "Update", "Firmware", "Status", "sensor", "ChildLock", "Reboot", "Identifizieren", "Scene", "Schedule", "quality", "rssi", "overheat", "overpower"]
-                    )
-                    sensors = self.filter_entities(
-                        all_states, ["sensor", "binary_sensor"],
-                        ["Internet Access", "Update", "Firmware", "Status", "ChildLock", "Reboot", "Identifizieren", "Scene", "Schedule", "quality", "rssi", "overheat", "overpower"]
-                    )
-
-                    # --- 2. ENERGY CONTEXT (LIVE) ---
-                    for key, entity_id in ENERGY_MAPPING.items():
-                        val = state_map.get(entity_id, "N/A")
-                        energy_context[key] = val
-
-                    # --- 3. ENERGY HISTORY (Vergangenheit) ---
-                    now = datetime.now()
-                    history_tasks = []
-                    task_map = []
-
-                    # Wir iterieren über das HISTORY MAPPING
-                    for key, entity_id in HISTORY_MAPPING.items():
-                        # 7 Tage zurück
-                        for day in range(1, 8):
-                            ts = now - timedelta(days=day)
-                            history_tasks.append(self.fetch_history_point(http_client, entity_id, ts))
-                            task_map.append((key, day))
-
-                    # Alle History-Calls parallel abfeuern
-                    if history_tasks:
-                        history_results = await asyncio.gather(*history_tasks)
-
-                        # Temporäre Struktur für Rohdaten
-                        raw_history = {k: [] for k in HISTORY_MAPPING.keys()}
-
-                        # Ergebnisse einsortieren
-                        for i, res in enumerate(history_results):
-                            key, day = task_map[i]
-                            raw_history[key].append(res)
-
-                        # Differenzen berechnen
-                        for key, past_vals in raw_history.items():
-                            entity_id = HISTORY_MAPPING[key]
-
-                            # Aktueller Zählerstand als Startpunkt
-                            current_total = state_map.get(entity_id)
-
-                            # Fallback, falls aktueller Wert fehlt
-                            if not isinstance(current_total, (int, float)):
-                                energy_history[key] = []
-                                continue
-
-                            diffs = []
-                            last_val = current_total
-
-                            # past_vals ist [Wert_Gestern, Wert_Vorgestern...]
-                            for val_past in past_vals:
-                                if last_val is not None and val_past is not None:
-                                    # Verbrauch = Wert(Neu) - Wert(Alt)
-                                    diff = last_val - val_past
-                                    # Negative Diffs abfangen (z.B. Zählertausch), sonst runden
-                                    diffs.append(round(max(0.0, diff), 2))
-                                else:
-                                    diffs.append(None)
-
-                                # Referenz für nächsten Tag verschieben
-                                last_val = val_past
-
-                            energy_history[key] = diffs
-
-                return {
-                    "energy_context": energy_context,
-                    "energy_history": energy_history,
-                    "controllable_devices": controllable_devices,
-                    "sensors": sensors,
-                }
-            except Exception as e:
-                print(f"HA Error: {e}")
-                traceback.print_exc()
-                return {"energy_context": {}, "energy_history": {}, "controllable_devices": [], "sensors": []}
+                # --- 2. ENERGY CONTEXT (LIVE) ---
+                for key, entity_id in ENERGY_MAPPING.items():
+                    energy_context[key] = state_value(by_id.get(entity_id), "N/A")
+
+                # --- 3. ENERGY HISTORY (Vergangenheit) ---
+                now = history_base(datetime.now())
+                history_tasks = []
+                task_map = []
+
+                # Wir iterieren über das HISTORY MAPPING
+                for key, entity_id in HISTORY_MAPPING.items():
+                    # 7 Tage zurück
+                    for day in range(1, 8):
+                        ts = now - timedelta(days=day)
+                        history_tasks.append(self._cached_history_point(http_client, entity_id, ts))
+                        task_map.append((key, day))
+
+                # Alle History-Calls parallel abfeuern
+                if history_tasks:
+                    history_results = await asyncio.gather(*history_tasks)
+
+                    # Temporäre Struktur für Rohdaten
+                    raw_history = {k: [] for k in HISTORY_MAPPING.keys()}
+
+                    # Ergebnisse einsortieren
+                    for i, res in enumerate(history_results):
+                        key, day = task_map[i]
+                        raw_history[key].append(res)
+
+                    # Differenzen berechnen
+                    for key, past_vals in raw_history.items():
+                        entity_id = HISTORY_MAPPING[key]
+
+                        # Aktueller Zählerstand als Startpunkt
+                        current_total = state_value(by_id.get(entity_id))
+
+                        # Fallback, falls aktueller Wert fehlt
+                        if not isinstance(current_total, (int, float)):
+                            energy_history[key] = []
+                            continue
+
+                        diffs = []
+                        last_val = current_total
+
+                        # past_vals ist [Wert_Gestern, Wert_Vorgestern...]
+                        for val_past in past_vals:
+                            if last_val is not None and val_past is not None:
+                                # Verbrauch = Wert(Neu) - Wert(Alt)
+                                diff = last_val - val_past
+                                # Negative Diffs abfangen (z.B. Zählertausch), sonst runden
+                                diffs.append(round(max(0.0, diff), 2))
+                            else:
+                                diffs.append(None)
+
+                            # Referenz für nächsten Tag verschieben
+                            last_val = val_past
+
+                        energy_history[key] = diffs
+
+            return {
+                "energy_context": energy_context,
+                "energy_history": energy_history,
+                "controllable_devices": controllable_devices,
+                "sensors": sensors,
+                # LeaveHome-Zusammenfassung, inkrementell nachgeführt (nur geänderte Entitäten)
+                "leave_home": leave_home_view.refresh(controllable_devices, sensors),
+            }
+        except Exception as e:
+            logger.exception(f"HA Error: {e}")
+            return {"energy_context": {}, "energy_history": {}, "controllable_devices": [], "sensors": []}
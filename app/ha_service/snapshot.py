@@ -0,0 +1,32 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+
+class ContextSnapshotHaService:
+    """
+    Hülle um den HaService für Batch-Anfragen: Der Smart Home Context wird genau einmal geholt
+    und allen parallel laufenden Handlern als gemeinsamer Snapshot geliefert.
+    Alle anderen Methoden (z.B. `execute_ha_service`) gehen unverändert an den HaService.
+    """
+
+    def __init__(self, inner: Any):
+        self._inner = inner
+        self._context_task: Optional[asyncio.Task] = None
+        self.fetch_ms: Optional[float] = None
+
+    async def _fetch(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            return await self._inner.get_smart_home_context()
+        finally:
+            self.fetch_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    async def get_smart_home_context(self) -> Dict[str, Any]:
+        if self._context_task is None:
+            self._context_task = asyncio.create_task(self._fetch())
+        # shield: Bricht ein einzelner Handler ab, bleibt der Snapshot für die anderen erhalten
+        return await asyncio.shield(self._context_task)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
@@ -0,0 +1,148 @@
+# benchmark_entities.py
+"""
+Microbenchmark: Aufbau des Smart Home Contexts aus `/api/states` – rohe Dicts vs. `Entity`-Datensätze.
+
+Verglichen werden:
+- dicts    : bisheriger Weg (States um `area` ergänzen, `state_map`, neue Dicts in `filter_entities`)
+- entities : `build_entities` + `filter_entities` auf kompakten Datensätzen (`ha_service.entities`)
+
+Gemessen pro Variante (Eingabe ist die JSON-Antwort von HA, wie sie `response.json()` parst):
+- build ms     : Aufbau von Geräte-/Sensorlisten und Energie-Werten (Median, ohne JSON-Parsen)
+- peak B/Ent.  : Spitzenspeicher während Parsen + Aufbau, pro Entität (tracemalloc)
+- kept B/Ent.  : Speicher, den der fertige Context hält (rohe States verworfen), pro Entität
+
+Die Fake-States bekommen typische HA-Attribute (Einheit, state_class, Farbmodi), sonst wären die
+rohen Dicts unrealistisch klein.
+
+Aufruf (im Ordner app/):
+    python -m helper_scripts.benchmark_entities --entities 5000 --runs 20
+"""
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from ha_service.entities import build_entities, state_value
+from ha_service.main import CONTROLLABLE_DOMAINS, ENERGY_MAPPING, SENSOR_DOMAINS, HaService
+from helper_scripts.fake_backends import fake_states
+
+# Auszug aus den Blocklisten im HaService (trifft keine der Fake-Entitäten)
+BLOCKLIST = ["Internet Access", "Update", "Firmware", "Status", "ChildLock", "Reboot"]
+
+
+def with_typical_attributes(states: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    for state in states:
+        attributes = state["attributes"]
+        if state["entity_id"].startswith("light."):
+            attributes.update({"supported_color_modes": ["brightness"], "color_mode": "brightness", "brightness": 180, "supported_features": 40})
+        elif state["entity_id"].startswith("sensor."):
+            attributes.update({"state_class": "measurement", "unit_of_measurement": "W", "icon": "mdi:flash"})
+    return states
+
+
+def legacy_context(all_states: List[Dict[str, Any]], area_data: Dict[str, str]) -> Dict[str, Any]:
+    """Der frühere Aufbau in `HaService._fetch_smart_home_context` (rohe Dicts)."""
+    state_map = {}
+    for state in all_states:
+        entity_id = state["entity_id"]
+        state["area"] = area_data.get(entity_id)
+        try:
+            val = float(state["state"])
+        except Exception:
+            val = state["state"]
+        state_map[entity_id] = val
+
+    def filter_entities(allowed_domains, blocklist):
+        targets = []
+        for entity in all_states:
+            eid = entity["entity_id"]
+            name = entity["attributes"].get("friendly_name", eid)
+            device_class = entity["attributes"].get("device_class", eid)
+            if eid.split(".")[0] not in allowed_domains:
+                continue
+            if any(blocked in name for blocked in blocklist):
+                continue
+            if entity["state"] in ["unavailable", "unknown"]:
+                continue
+            targets.append({"eid": eid, "name": name, "area": entity["area"], "state": f"{entity['state']}", "device_class": f"{device_class}"})
+        return targets
+
+    return {
+        "energy_context": {key: state_map.get(eid, "N/A") for key, eid in ENERGY_MAPPING.items()},
+        "controllable_devices": filter_entities(CONTROLLABLE_DOMAINS, BLOCKLIST),
+        "sensors": filter_entities(SENSOR_DOMAINS, BLOCKLIST),
+    }
+
+
+def entity_context(all_states: List[Dict[str, Any]], area_data: Dict[str, str]) -> Dict[str, Any]:
+    """Der Aufbau im HaService mit `Entity`-Datensätzen."""
+    service = HaService()
+    entities = build_entities(all_states, area_data)
+    by_id = {entity.eid: entity for entity in entities}
+    return {
+        "energy_context": {key: state_value(by_id.get(eid), "N/A") for key, eid in ENERGY_MAPPING.items()},
+        "controllable_devices": service.filter_entities(entities, CONTROLLABLE_DOMAINS, BLOCKLIST),
+        "sensors": service.filter_entities(entities, SENSOR_DOMAINS, BLOCKLIST),
+    }
+
+
+def measure_time(build: Callable, payload: bytes, areas: Dict[str, str], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        states = json.loads(payload)
+        start = time.perf_counter()
+        build(states, areas)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def measure_memory(build: Callable, payload: bytes, areas: Dict[str, str]) -> Dict[str, int]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        states = json.loads(payload)
+        ctx = build(states, areas)
+        del states
+        gc.collect()
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del ctx
+    return {"kept": kept, "peak": peak}
+
+
+def run_benchmark(entity_count: int, runs: int) -> List[Dict[str, Any]]:
+    states = with_typical_attributes(fake_states(entity_count))
+    payload = json.dumps(states).encode("utf-8")
+    areas = {state["entity_id"]: f"Raum {i % 10}" for i, state in enumerate(states)}
+    rows = []
+    for name, build in {"dicts": legacy_context, "entities": entity_context}.items():
+        memory = measure_memory(build, payload, areas)
+        rows.append(
+            {
+                "variant": name,
+                "entities": len(states),
+                "build_ms": measure_time(build, payload, areas, runs),
+                "peak_per_entity": memory["peak"] / len(states),
+                "kept_per_entity": memory["kept"] / len(states),
+            }
+        )
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'Variante':<9} {'Entitäten':>9} {'build ms':>9} {'peak B/Ent.':>12} {'kept B/Ent.':>12}")
+    for r in rows:
+        print(f"{r['variant']:<9} {r['entities']:>9} {r['build_ms']:>9.2f} {r['peak_per_entity']:>12.0f} {r['kept_per_entity']:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Context-Aufbau mit rohen Dicts und mit Entity-Datensätzen messen.")
+    parser.add_argument("--entities", type=int, default=5000, help="Anzahl generischer Entitäten")
+    parser.add_argument("--runs", type=int, default=20, help="Zeitmessungen je Variante")
+    args = parser.parse_args()
+
+    print_report(run_benchmark(args.entities, args.runs))
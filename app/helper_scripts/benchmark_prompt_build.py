@@ -0,0 +1,114 @@
+# benchmark_prompt_build.py
+"""
+Microbenchmark: Prompt-Aufbau (Info-, Control- und Advice-Prompt) bei 500 und 5.000 Entitäten.
+
+Verglichen werden:
+- stdlib   : `json.dumps` bei jedem Aufbau (bisheriges Verhalten)
+- encoder  : schneller Encoder (`serialization.fast_json`), ohne Cache
+- cache    : Fragment-Cache, neuer HA-Abruf mit unverändertem Inhalt (Treffer über den Inhalt)
+- snapshot : Fragment-Cache, dasselbe Context-Objekt (Batch/Vorberechnung, Treffer über die Identität)
+
+Aufruf (im Ordner app/):
+    python -m helper_scripts.benchmark_prompt_build --runs 50
+"""
+import argparse
+import copy
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+from unittest.mock import patch
+
+from category_handler.advice_handler import AdviceHandler
+from category_handler.control_handler import ControlHandler
+from category_handler.info_handler import InfoHandler
+from ha_service.entities import build_entities
+from ha_service.main import CONTROLLABLE_DOMAINS, SENSOR_DOMAINS, HaService
+from helper_scripts.fake_backends import fake_states
+from serialization import fast_json
+from serialization.fragment_cache import FragmentCache
+
+HANDLER_MODULES = ["category_handler.info_handler", "category_handler.control_handler", "category_handler.advice_handler"]
+
+
+def build_context(entity_count: int) -> Dict[str, Any]:
+    """Context wie `HaService.get_smart_home_context` ihn aus den Fake-States baut."""
+    states = fake_states(entity_count)
+    entities = build_entities(states, {state["entity_id"]: f"Raum {i % 10}" for i, state in enumerate(states)})
+    service = HaService()
+    return {
+        "energy_context": {"netz_saldo_watt": -2500.0, "pv_aktuell_watt": 4200.0, "haus_power": 450.0},
+        "energy_history": {"Wallbox": [12.5, 0.0, 8.1, 3.3, 0.0, 0.0, 9.9], "Hausverbrauch_Gesamt": [11.2] * 7},
+        "controllable_devices": service.filter_entities(entities, CONTROLLABLE_DOMAINS, []),
+        "sensors": service.filter_entities(entities, SENSOR_DOMAINS, []),
+    }
+
+
+def build_all_prompts(ctx: Dict[str, Any]) -> None:
+    InfoHandler().build_prompt(ctx, ["Temperatur"])
+    ControlHandler().build_prompt(ctx, ["Licht 3", "aus"])
+    AdviceHandler().build_prompt(ctx, ["Waschmaschine"])
+
+
+def measure(runs: int, next_context: Callable[[], Dict[str, Any]], prompt_json: Callable[[Any], str]) -> List[float]:
+    patchers = [patch(f"{module}.prompt_json", prompt_json) for module in HANDLER_MODULES]
+    for p in patchers:
+        p.start()
+    try:
+        build_all_prompts(next_context())  # Aufwärmen (füllt ggf. den Cache)
+        timings = []
+        for _ in range(runs):
+            ctx = next_context()
+            start = time.perf_counter()
+            build_all_prompts(ctx)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+    finally:
+        for p in patchers:
+            p.stop()
+
+
+def run_benchmark(entity_counts: List[int], runs: int) -> List[Dict[str, Any]]:
+    rows = []
+    for entity_count in entity_counts:
+        ctx = build_context(entity_count)
+        # Vorab erzeugte Kopien: simuliert neue HA-Abrufe mit unverändertem Inhalt, ohne die Kopierzeit zu messen
+        copies = iter([copy.deepcopy(ctx) for _ in range(runs + 1)])
+        variants = {
+            "stdlib": (lambda: ctx, lambda obj: json.dumps(obj, default=fast_json.json_default)),
+            "encoder": (lambda: ctx, fast_json.dumps),
+            "cache": (lambda: next(copies), FragmentCache().fragment),
+            "snapshot": (lambda: ctx, FragmentCache().fragment),
+        }
+        for name, (next_context, prompt_json) in variants.items():
+            timings = measure(runs, next_context, prompt_json)
+            rows.append(
+                {
+                    "entities": entity_count,
+                    "variant": name,
+                    "mean_ms": statistics.mean(timings),
+                    "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))],
+                }
+            )
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    encoder = "orjson" if fast_json.orjson is not None else "stdlib (kompakt)"
+    print(f"Schneller Encoder: {encoder}")
+    print(f"{'Entitäten':>9} {'Variante':<9} {'mean ms':>9} {'p95 ms':>9} {'Faktor':>7}")
+    baseline = {}
+    for r in rows:
+        if r["variant"] == "stdlib":
+            baseline[r["entities"]] = r["mean_ms"]
+        factor = baseline[r["entities"]] / r["mean_ms"] if r["mean_ms"] else 0.0
+        print(f"{r['entities']:>9} {r['variant']:<9} {r['mean_ms']:>9.3f} {r['p95_ms']:>9.3f} {factor:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt-Aufbau mit und ohne Fragment-Cache messen.")
+    parser.add_argument("--entities", default="500,5000", help="Anzahl Entitäten, kommagetrennt")
+    parser.add_argument("--runs", type=int, default=50, help="Messungen je Variante")
+    args = parser.parse_args()
+
+    print_report(run_benchmark([int(n) for n in args.entities.split(",")], args.runs))
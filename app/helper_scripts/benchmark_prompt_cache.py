@@ -0,0 +1,96 @@
+# benchmark_prompt_cache.py
+"""
+Misst gegen die echte Gemini API, was der Cached Content für den statischen Prompt-Teil spart.
+
+Pro Handler-Prompt (Advice, Info, Control) und Variante je `--runs` Calls:
+- inline : Regeln/Beispiele und Live-Werte in einem Prompt (bisheriges Verhalten)
+- cached : statischer Teil als Cached Content (`PromptCache`), nur der dynamische Teil als contents
+
+Berichtet werden Input-Tokens, davon aus dem Cache (`cached_content_token_count`), die voll
+berechneten Input-Tokens und die Latenz. Braucht GOOGLE_API_KEY (oder GEMINI_BASE_URL).
+
+Aufruf (im Ordner app/):
+    python -m helper_scripts.benchmark_prompt_cache --runs 5 --entities 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Dict, List
+
+from category_handler import advice_handler, control_handler, info_handler
+from const import AI_HANDLER_MODEL_NAME
+from genai_client.client import get_client
+from genai_client.prompt_cache import PromptCache
+from genai_client.scheduler import LlmScheduler
+from helper_scripts.benchmark_prompt_build import build_context
+
+PROMPTS = {
+    "advice": (advice_handler, advice_handler.AdviceHandler(), ["Waschmaschine"]),
+    "info": (info_handler, info_handler.InfoHandler(), ["Wie warm ist es im Bad?"]),
+    "control": (control_handler, control_handler.ControlHandler(), ["Licht 3", "aus"]),
+}
+
+
+def _tokens(response: Any, field: str) -> int:
+    val = getattr(getattr(response, "usage_metadata", None), field, None)
+    return val if isinstance(val, int) else 0
+
+
+async def measure(client: Any, scheduler: LlmScheduler, contents: str, config: Dict[str, Any], runs: int) -> Dict[str, float]:
+    rows = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = await scheduler.generate_content(client, model=AI_HANDLER_MODEL_NAME, contents=contents, config=config)
+        latency_ms = (time.perf_counter() - start) * 1000
+        prompt_tokens = _tokens(response, "prompt_token_count")
+        cached_tokens = _tokens(response, "cached_content_token_count")
+        rows.append((prompt_tokens, cached_tokens, prompt_tokens - cached_tokens, latency_ms))
+    return {
+        "input_tokens": statistics.mean(r[0] for r in rows),
+        "cached_tokens": statistics.mean(r[1] for r in rows),
+        "billed_tokens": statistics.mean(r[2] for r in rows),
+        "latency_ms": statistics.median(r[3] for r in rows),
+    }
+
+
+async def run_benchmark(entity_count: int, runs: int, ttl_seconds: int) -> List[Dict[str, Any]]:
+    client = get_client()
+    if client is None:
+        raise SystemExit("Kein Gemini Client (GOOGLE_API_KEY fehlt).")
+    ctx = build_context(entity_count)
+    inline = LlmScheduler(prompt_cache=PromptCache(ttl_seconds=0))
+    cache = PromptCache(ttl_seconds=ttl_seconds, min_tokens=0)
+    cached = LlmScheduler(prompt_cache=cache)
+
+    rows = []
+    for name, (module, handler, parameters) in PROMPTS.items():
+        dynamic = handler.build_prompt(ctx, parameters)
+        tools_only = {k: v for k, v in module.LLM_CONFIG.items() if k != "system_instruction"}
+        variants = {
+            "inline": (inline, module.SYSTEM_INSTRUCTION + dynamic, tools_only),
+            "cached": (cached, dynamic, module.LLM_CONFIG),
+        }
+        for variant, (scheduler, contents, config) in variants.items():
+            rows.append({"prompt": name, "variant": variant, **await measure(client, scheduler, contents, config, runs)})
+    print(f"Prompt-Cache: {cache.snapshot()}")
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]]) -> None:
+    print(f"{'Prompt':<8} {'Variante':<8} {'Input':>8} {'Cache':>8} {'voll':>8} {'p50 ms':>8}")
+    for r in rows:
+        print(
+            f"{r['prompt']:<8} {r['variant']:<8} {r['input_tokens']:>8.0f} {r['cached_tokens']:>8.0f} "
+            f"{r['billed_tokens']:>8.0f} {r['latency_ms']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ersparnis des Prompt-Caches gegen die Gemini API messen.")
+    parser.add_argument("--entities", type=int, default=500, help="Anzahl Fake-Entitäten im Context")
+    parser.add_argument("--runs", type=int, default=5, help="Calls je Prompt und Variante")
+    parser.add_argument("--ttl", type=int, default=300, help="TTL des Cached Content in Sekunden")
+    args = parser.parse_args()
+
+    print_report(asyncio.run(run_benchmark(args.entities, args.runs, args.ttl)))
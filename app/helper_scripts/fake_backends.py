@@ -0,0 +1,149 @@
+# fake_backends.py
+"""
+Lokale Fake-Server für Home Assistant und die Gemini API (Lasttests, siehe `load_test.py`).
+
+- Fake HA: `/api/states`, `/api/template` (Areas), `/api/history/period/...`, `/api/services/...`
+  mit `entity_count` Entitäten (Lichter, Fenster, Energie-Sensoren) und fester Latenz.
+- Fake Gemini: `...:generateContent` / `...:streamGenerateContent` im Format der REST API.
+  Requests mit Tools bekommen einen `control_device` Function Call, alle anderen Text.
+  GET auf ein Modell (`models.get`, Warmup) liefert dessen Metadaten.
+
+Beide laufen per uvicorn in einem eigenen Thread (eigener Event Loop), damit sie die
+Messung der App im Haupt-Loop nicht verfälschen.
+"""
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from ha_service.main import ENERGY_MAPPING, HISTORY_MAPPING
+
+ENERGY_VALUES = {
+    "netz_saldo_watt": "-2500",
+    "pv_aktuell_watt": "4200",
+    "pv_rest_prognose_kwh": "12.5",
+    "batterie_haus_prozent": "80",
+    "batterie_auto_prozent": "55",
+    "haus_power": "450",
+}
+
+
+def fake_states(entity_count: int) -> List[Dict[str, Any]]:
+    """Energie-Sensoren aus den Mappings plus `entity_count` generische Lichter/Fenster/Sensoren."""
+    states = []
+    for key, eid in ENERGY_MAPPING.items():
+        states.append({"entity_id": eid, "state": ENERGY_VALUES.get(key, "100"), "attributes": {"friendly_name": key}})
+    for eid in HISTORY_MAPPING.values():
+        states.append({"entity_id": eid, "state": "10000", "attributes": {"friendly_name": eid}})
+
+    for i in range(entity_count):
+        if i % 3 == 0:
+            eid, state, attrs = f"light.load_{i}", "on" if i % 2 else "off", {"friendly_name": f"Licht {i}"}
+        elif i % 3 == 1:
+            eid, state, attrs = f"binary_sensor.fenster_{i}", "off", {"friendly_name": f"Fenster {i}", "device_class": "window"}
+        else:
+            eid, state, attrs = f"sensor.power_{i}", str(i % 700), {"friendly_name": f"Leistung {i}", "device_class": "power"}
+        states.append({"entity_id": eid, "state": state, "attributes": attrs})
+    return states
+
+
+def create_fake_ha_app(entity_count: int = 500, latency_ms: float = 20) -> FastAPI:
+    app = FastAPI(title="Fake Home Assistant")
+    states = fake_states(entity_count)
+    areas = {s["entity_id"]: f"Raum {i % 10}" for i, s in enumerate(states)}
+
+    async def delay():
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    @app.get("/api/states")
+    async def get_states():
+        await delay()
+        return states
+
+    @app.post("/api/template")
+    async def render_template():
+        await delay()
+        return areas
+
+    @app.get("/api/history/period/{timestamp}")
+    async def history(timestamp: str):
+        await delay()
+        return [[{"state": "9000"}]]
+
+    @app.post("/api/services/{domain}/{service}")
+    async def call_service(domain: str, service: str):
+        await delay()
+        return []
+
+    return app
+
+
+def _gemini_response(body: Dict[str, Any]) -> Dict[str, Any]:
+    if body.get("tools"):
+        part = {"functionCall": {"name": "control_device", "args": {"entity_id": "light.load_3", "action": "turn_off"}}}
+    else:
+        part = {"text": "Ja, jetzt ist ein guter Zeitpunkt."}
+    prompt_chars = len(json.dumps(body.get("contents", "")))
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": prompt_chars // 4, "candidatesTokenCount": 12, "totalTokenCount": prompt_chars // 4 + 12},
+    }
+
+
+def create_fake_gemini_app(latency_ms: float = 800) -> FastAPI:
+    app = FastAPI(title="Fake Gemini")
+
+    @app.get("/{path:path}")
+    async def get_model(path: str):
+        name = path.split("/", 1)[-1]
+        return {"name": name, "displayName": name.rsplit("/", 1)[-1]}
+
+    @app.post("/{path:path}")
+    async def generate(path: str, request: Request):
+        body = await request.json()
+        await asyncio.sleep(latency_ms / 1000)
+        response = _gemini_response(body)
+        if path.endswith(":streamGenerateContent"):
+            async def events():
+                yield f"data: {json.dumps(response)}\n\n"
+            return StreamingResponse(events(), media_type="text/event-stream")
+        return JSONResponse(response)
+
+    return app
+
+
+class BackgroundServer:
+    """Startet eine ASGI-App per uvicorn in einem Daemon-Thread auf einem freien Port."""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.server = None
+        self.thread = None
+        self.url = None
+
+    def start(self) -> str:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        self.url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+        config = uvicorn.Config(self.app, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [sock]}, daemon=True)
+        self.thread.start()
+
+        deadline = time.monotonic() + 5
+        while not self.server.started and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.url
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.should_exit = True
+            self.thread.join(timeout=5)
@@ -0,0 +1,236 @@
+# load_test.py
+"""
+Lasttest für `/alexa-webhook` mit steigender Parallelität gegen lokale Fake-Server für HA und Gemini.
+
+Pro Stufe senden `concurrency` Worker für `--stage-seconds` Sekunden Alexa-Payloads (Mix aus
+LeaveHome/EnergyAdvice/StatusInfo/SmartControl wie in der Bruno Collection) direkt hintereinander.
+Berichtet werden Durchsatz, Latenz-Perzentile, Fehlerquote, Überschreitungen der Alexa-Deadline (8 s)
+und die Event-Loop-Verzögerung der App – so wird sichtbar, ab welcher Parallelität der Dienst sättigt.
+
+Aufruf (im Ordner app/):
+    python -m helper_scripts.load_test --concurrency 1,2,4,8,16,32 --stage-seconds 10 \\
+        --mix leave=1,advice=2,status=2,control=1 --llm-latency-ms 800 --ha-latency-ms 20
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+import httpx
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from genai_client import client as genai_client
+from ha_service.main import HaService
+from helper_scripts.fake_backends import BackgroundServer, create_fake_gemini_app, create_fake_ha_app
+
+ALEXA_DEADLINE_MS = 8000
+
+INTENT_SLOTS = {
+    "leave": ("LeaveHomeIntent", [{}]),
+    "advice": ("EnergyAdviceIntent", [{"device": "Waschmaschine"}, {"device": "Auto"}, {"device": "Trockner"}]),
+    # "Strom" beantwortet das lokale Template, "Temperatur" geht an Gemini
+    "status": ("StatusInfoIntent", [{"subject": "Strom"}, {"subject": "Temperatur"}]),
+    "control": ("SmartControlIntent", [{"device": "Licht 3", "action": "aus"}]),
+}
+
+
+def alexa_payload(kind: str, rng: random.Random) -> Dict[str, Any]:
+    intent_name, slot_variants = INTENT_SLOTS[kind]
+    slots = {name: {"name": name, "value": value} for name, value in rng.choice(slot_variants).items()}
+    return {
+        "version": "1.0",
+        "session": {"new": True, "sessionId": "load-test", "attributes": {}},
+        "request": {
+            "type": "IntentRequest",
+            "requestId": f"load-{rng.random()}",
+            "locale": "de-DE",
+            "intent": {"name": intent_name, "confirmationStatus": "NONE", "slots": slots},
+        },
+    }
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        kind, _, weight = item.partition("=")
+        if kind not in INTENT_SLOTS:
+            raise ValueError(f"Unbekannter Intent im Mix: {kind} (erlaubt: {', '.join(INTENT_SLOTS)})")
+        weights[kind] = float(weight or 1)
+    return weights
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Misst, wie viel später als geplant ein kurzer Sleep im Event Loop aufwacht."""
+
+    def __init__(self, interval_seconds: float = 0.05):
+        self.interval_seconds = interval_seconds
+        self.samples_ms: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            self.samples_ms.append(max(0.0, (loop.time() - expected) * 1000))
+
+    def start(self) -> None:
+        self.samples_ms = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def run_stage(
+    http_client: httpx.AsyncClient, concurrency: int, stage_seconds: float, mix: Dict[str, float], seed: int = 0
+) -> Dict[str, Any]:
+    """Eine Laststufe: `concurrency` Worker senden bis zum Stufenende Request auf Request."""
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    latencies: List[float] = []
+    errors = 0
+    lag_monitor = LoopLagMonitor()
+
+    async def worker(worker_id: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < stage_end:
+            payload = alexa_payload(rng.choices(kinds, weights)[0], rng)
+            start = time.perf_counter()
+            try:
+                resp = await http_client.post("/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, json=payload)
+                text = resp.json().get("response", {}).get("outputSpeech", {}).get("text", "")
+                failed = resp.status_code != 200 or "Fehler" in text
+            except Exception:
+                failed = True
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += failed
+
+    lag_monitor.start()
+    stage_start = time.perf_counter()
+    stage_end = stage_start + stage_seconds
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    duration = time.perf_counter() - stage_start
+    await lag_monitor.stop()
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / duration if duration else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": max(latencies, default=0.0),
+        "error_rate": errors / len(latencies) if latencies else 0.0,
+        "deadline_misses": sum(latency > ALEXA_DEADLINE_MS for latency in latencies),
+        "loop_lag_p95_ms": _percentile(lag_monitor.samples_ms, 95),
+        "loop_lag_max_ms": max(lag_monitor.samples_ms, default=0.0),
+    }
+
+
+def saturation_point(stages: List[Dict[str, Any]]) -> Optional[int]:
+    """Erste Stufe, bei der p95 die Deadline reißt, Fehler auftreten oder der Durchsatz kaum noch steigt."""
+    for previous, stage in zip([None] + stages, stages):
+        if stage["p95_ms"] > ALEXA_DEADLINE_MS or stage["error_rate"] > 0.01:
+            return stage["concurrency"]
+        if previous and stage["throughput_rps"] < previous["throughput_rps"] * 1.05:
+            return stage["concurrency"]
+    return None
+
+
+async def run_load_test(
+    concurrency_levels: List[int],
+    stage_seconds: float,
+    mix: Dict[str, float],
+    entity_count: int = 500,
+    ha_latency_ms: float = 20,
+    llm_latency_ms: float = 800,
+) -> List[Dict[str, Any]]:
+    ha_server = BackgroundServer(create_fake_ha_app(entity_count, ha_latency_ms))
+    llm_server = BackgroundServer(create_fake_gemini_app(llm_latency_ms))
+    ha_url = ha_server.start()
+    llm_url = llm_server.start()
+
+    def fake_ha_service() -> HaService:
+        service = HaService()
+        service.base_url = ha_url
+        service.token = "load-test"
+        return service
+
+    fake_llm_client = genai_client.create_client("load-test", llm_url)
+    stages = []
+    try:
+        with patch.object(main, "HaService", fake_ha_service), patch.object(genai_client, "_client_instance", fake_llm_client):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=60) as http_client:
+                for i, concurrency in enumerate(concurrency_levels):
+                    stages.append(await run_stage(http_client, concurrency, stage_seconds, mix, seed=i))
+    finally:
+        ha_server.stop()
+        llm_server.stop()
+    return stages
+
+
+def print_report(stages: List[Dict[str, Any]]) -> None:
+    print(
+        f"{'Parallel':>8} {'Requests':>9} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'max ms':>8} {'Fehler':>7} {'>8s':>5} {'Lag p95':>8} {'Lag max':>8}"
+    )
+    for s in stages:
+        print(
+            f"{s['concurrency']:>8} {s['requests']:>9} {s['throughput_rps']:>7.1f} {s['p50_ms']:>8.0f} "
+            f"{s['p95_ms']:>8.0f} {s['p99_ms']:>8.0f} {s['max_ms']:>8.0f} {s['error_rate']:>6.1%} "
+            f"{s['deadline_misses']:>5} {s['loop_lag_p95_ms']:>8.1f} {s['loop_lag_max_ms']:>8.1f}"
+        )
+
+    saturated = saturation_point(stages)
+    print()
+    if saturated:
+        print(f"Sättigung ab {saturated} parallelen Requests.")
+    else:
+        print("Keine Sättigung im gemessenen Bereich.")
+    if stages:
+        print(f"Mittlere Event-Loop-Verzögerung: {statistics.mean(s['loop_lag_p95_ms'] for s in stages):.1f} ms (p95 je Stufe)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lasttest für /alexa-webhook gegen Fake-HA und Fake-Gemini.")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Parallelität je Stufe, kommagetrennt")
+    parser.add_argument("--stage-seconds", type=float, default=10.0, help="Dauer einer Stufe")
+    parser.add_argument("--mix", default="leave=1,advice=2,status=2,control=1", help="Gewichtung der Intents")
+    parser.add_argument("--entities", type=int, default=500, help="Anzahl Entitäten im Fake-HA")
+    parser.add_argument("--ha-latency-ms", type=float, default=20, help="Antwortzeit des Fake-HA je Call")
+    parser.add_argument("--llm-latency-ms", type=float, default=800, help="Antwortzeit des Fake-Gemini je Call")
+    args = parser.parse_args()
+
+    print_report(
+        asyncio.run(
+            run_load_test(
+                [int(c) for c in args.concurrency.split(",")],
+                args.stage_seconds,
+                parse_mix(args.mix),
+                args.entities,
+                args.ha_latency_ms,
+                args.llm_latency_ms,
+            )
+        )
+    )
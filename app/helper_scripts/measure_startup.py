@@ -0,0 +1,142 @@
+# measure_startup.py
+"""
+Misst den Kaltstart der App als eigener Prozess (wie nach Scale-to-Zero), gegen lokale Fake-Server
+für HA und Gemini (siehe `fake_backends.py`).
+
+Pro Variante und Lauf wird `uvicorn main:app` neu gestartet und gemessen (ab Prozessstart):
+- health : bis `/health` antwortet (Import der App, Lifespan)
+- ready  : bis `/ready` 200 liefert (mit STARTUP_WARMUP nach dem Warmup)
+- first  : Dauer des ersten Alexa-Requests (EnergyAdviceIntent: HA Context + LLM Call) nach `ready`
+
+Varianten: `warmup` (STARTUP_WARMUP=true) und `lazy` (alles beim ersten Request). Mit `--no-bytecode`
+startet jeder Lauf ohne .pyc (leerer PYTHONPYCACHEPREFIX), wie ein Image ohne `compileall`.
+
+Aufruf (im Ordner app/):
+    python -m helper_scripts.measure_startup --runs 5 --no-bytecode
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from const import ALEXA_ACCESS_TOKEN
+from helper_scripts.fake_backends import BackgroundServer, create_fake_gemini_app, create_fake_ha_app
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_REQUEST = {
+    "version": "1.0",
+    "session": {"new": True, "sessionId": "startup-measurement"},
+    "request": {
+        "type": "IntentRequest",
+        "intent": {"name": "EnergyAdviceIntent", "slots": {"device": {"name": "device", "value": "Waschmaschine"}}},
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, start: float, timeout_seconds: float, status: int = 200) -> Optional[float]:
+    """Pollt `url`, bis `status` kommt; Millisekunden seit `start` oder None bei Timeout."""
+    deadline = start + timeout_seconds
+    while time.perf_counter() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == status:
+                return (time.perf_counter() - start) * 1000
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def measure_once(env: Dict[str, str], timeout_seconds: float) -> Dict[str, Optional[float]]:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        health_ms = wait_for(f"{base}/health", start, timeout_seconds)
+        ready_ms = wait_for(f"{base}/ready", start, timeout_seconds)
+        first_ms = None
+        if ready_ms is not None:
+            first_start = time.perf_counter()
+            resp = httpx.post(f"{base}/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, json=FIRST_REQUEST, timeout=30)
+            if resp.status_code == 200:
+                first_ms = (time.perf_counter() - first_start) * 1000
+        return {"health_ms": health_ms, "ready_ms": ready_ms, "first_ms": first_ms}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def _median(rows: List[Dict[str, Optional[float]]], key: str) -> Optional[float]:
+    values = [r[key] for r in rows if r[key] is not None]
+    return statistics.median(values) if values else None
+
+
+def run_measurement(runs: int, no_bytecode: bool, ha_latency_ms: float, llm_latency_ms: float, timeout_seconds: float) -> List[Dict[str, Any]]:
+    ha_server = BackgroundServer(create_fake_ha_app(500, ha_latency_ms))
+    llm_server = BackgroundServer(create_fake_gemini_app(llm_latency_ms))
+    base_env = {
+        **os.environ,
+        "HA_URL": ha_server.start(),
+        "HA_TOKEN": "startup-measurement",
+        "GOOGLE_API_KEY": "startup-measurement",
+        "GEMINI_BASE_URL": llm_server.start(),
+        "ALEXA_ACCESS_TOKEN": ALEXA_ACCESS_TOKEN,
+        "RECORD_TRAFFIC_PATH": "",
+        "LLM_PROMPT_CACHE_TTL_SECONDS": "0",
+    }
+    results = []
+    try:
+        for variant, warmup in [("warmup", "true"), ("lazy", "false")]:
+            rows = []
+            for _ in range(runs):
+                env = {**base_env, "STARTUP_WARMUP": warmup}
+                with tempfile.TemporaryDirectory() as pycache:
+                    if no_bytecode:
+                        env.update({"PYTHONPYCACHEPREFIX": pycache, "PYTHONDONTWRITEBYTECODE": "1"})
+                    rows.append(measure_once(env, timeout_seconds))
+            results.append({"variant": variant, **{key: _median(rows, key) for key in ["health_ms", "ready_ms", "first_ms"]}})
+    finally:
+        ha_server.stop()
+        llm_server.stop()
+    return results
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    def fmt(value: Optional[float]) -> str:
+        return f"{value:>9.0f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'Variante':<8} {'health ms':>9} {'ready ms':>9} {'first ms':>9}")
+    for r in results:
+        print(f"{r['variant']:<8} {fmt(r['health_ms'])} {fmt(r['ready_ms'])} {fmt(r['first_ms'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kaltstart der App messen (health/ready/erster Request).")
+    parser.add_argument("--runs", type=int, default=3, help="Starts je Variante (Median)")
+    parser.add_argument("--no-bytecode", action="store_true", help="Ohne .pyc starten (wie ohne compileall im Image)")
+    parser.add_argument("--ha-latency", type=float, default=20, help="Latenz des Fake HA in ms")
+    parser.add_argument("--llm-latency", type=float, default=200, help="Latenz des Fake Gemini in ms")
+    parser.add_argument("--timeout", type=float, default=60, help="Maximale Wartezeit je Start in Sekunden")
+    args = parser.parse_args()
+
+    print_report(run_measurement(args.runs, args.no_bytecode, args.ha_latency, args.llm_latency, args.timeout))
@@ -0,0 +1,94 @@
+# replay_traffic.py
+"""
+Spielt aufgenommene Webhook-Requests (RECORD_TRAFFIC_PATH) gegen die App ab.
+
+HA und Gemini werden durch Stubs ersetzt, die die aufgenommenen Antworten mit den
+aufgenommenen (oder skalierten) Laufzeiten zurückgeben. So lassen sich Änderungen an der
+Context-/Prompt-Pipeline deterministisch und realistisch vergleichen.
+
+Aufruf (im Ordner app/):
+    python -m helper_scripts.replay_traffic recordings.jsonl --time-scale 1.0
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+import httpx
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from genai_client import client as genai_client
+from recording.replay import ReplayGenAiClient, ReplayHaService, load_recordings
+
+
+def _output_text(response: dict) -> str:
+    return response.get("response", {}).get("outputSpeech", {}).get("text", "")
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+async def replay(path: str, time_scale: float) -> list:
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay") as http_client:
+        for i, record in enumerate(load_recordings(path)):
+            ha_stub = ReplayHaService(record["ha_calls"], time_scale)
+            llm_stub = ReplayGenAiClient(record["llm_calls"], time_scale)
+
+            with patch.object(main, "HaService", lambda: ha_stub), patch.object(genai_client, "_client_instance", llm_stub):
+                start = time.perf_counter()
+                resp = await http_client.post(
+                    "/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, json=record["payload"]
+                )
+                duration_ms = (time.perf_counter() - start) * 1000
+
+            recorded_text = _output_text(record["response"])
+            replayed_text = _output_text(resp.json())
+            results.append(
+                {
+                    "index": i,
+                    "intent": record["payload"].get("request", {}).get("intent", {}).get("name"),
+                    "recorded_ms": record["duration_ms"],
+                    "replayed_ms": round(duration_ms, 2),
+                    "matches": recorded_text == replayed_text,
+                }
+            )
+    return results
+
+
+def print_report(results: list) -> None:
+    print(f"{'#':>4} {'Intent':<25} {'Aufnahme ms':>12} {'Replay ms':>10}  Antwort")
+    for r in results:
+        status = "gleich" if r["matches"] else "ABWEICHEND"
+        print(f"{r['index']:>4} {str(r['intent']):<25} {r['recorded_ms']:>12.1f} {r['replayed_ms']:>10.1f}  {status}")
+
+    if not results:
+        print("Keine Aufnahmen gefunden.")
+        return
+
+    replayed = [r["replayed_ms"] for r in results]
+    print()
+    print(f"Requests: {len(results)}, abweichende Antworten: {sum(not r['matches'] for r in results)}")
+    print(
+        f"Replay Latenz ms: p50={_percentile(replayed, 50):.1f} p95={_percentile(replayed, 95):.1f} "
+        f"max={max(replayed):.1f} mean={statistics.mean(replayed):.1f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aufgenommenen Webhook-Traffic abspielen.")
+    parser.add_argument("path", help="JSONL-Datei mit Aufnahmen")
+    parser.add_argument(
+        "--time-scale", type=float, default=1.0,
+        help="Faktor für die aufgenommenen HA-/LLM-Laufzeiten (0 = ohne Wartezeit)",
+    )
+    args = parser.parse_args()
+
+    print_report(asyncio.run(replay(args.path, args.time_scale)))
@@ -0,0 +1,162 @@
+"""
+Lokaler Intent-Klassifikator für Freitext-Anfragen.
+
+Kombiniert Stichwort-Regeln mit einem kleinen Naive-Bayes-Modell über Wort-Uni-/Bigramme,
+trainiert aus den Samples in `alexa_model.json` (Slot-Platzhalter werden mit den Slot-Werten expandiert).
+Liefert eine `Category` plus Konfidenz; `router.py` fragt nur unterhalb einer Schwelle das LLM.
+"""
+import itertools
+import json
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from const import ALEXA_MODEL_PATH, Category
+
+logger = logging.getLogger(__name__)
+
+# Alexa Intent -> Handler-Kategorie
+INTENT_CATEGORIES = {
+    "LeaveHomeIntent": Category.LEAVE_HOME,
+    "SmartControlIntent": Category.CONTROL,
+    "EnergyAdviceIntent": Category.ADVICE,
+    "StatusInfoIntent": Category.INFO,
+}
+
+# Zusätzliche Trainingssätze (Beispiele aus dem bisherigen LLM-Router-Prompt)
+EXTRA_SAMPLES = {
+    Category.CONTROL: ["licht an", "rolladen hoch", "heizung aus", "schalte das licht im wohnzimmer aus"],
+    Category.ADVICE: ["waschmaschine jetzt", "auto laden", "soll ich jetzt die spülmaschine starten"],
+    Category.INFO: ["wie warm ist es", "wieviel strom verbrauchen wir", "ist licht im wohnzimmer an"],
+    Category.LEAVE_HOME: ["ich möchte das haus verlassen was muss ich beachten"],
+}
+
+# Stichwort-Regeln: Jeder Treffer zählt wie zusätzliche Evidenz für die Kategorie
+KEYWORD_RULES = {
+    Category.CONTROL: ["schalte", "einschalten", "ausschalten", "anmachen", "ausmachen", "aktivieren", "deaktivieren", "hoch", "runter"],
+    Category.ADVICE: ["lohnt", "soll ich", "sollte ich", "wann", "guter zeitpunkt"],
+    Category.INFO: ["wie warm", "wieviel", "wie viel", "status", "offen", "wie ist", "wie hoch", "batterie", "akku", "temperatur"],
+    Category.LEAVE_HOME: ["verlasse", "verlassen", "gehe jetzt", "gehen jetzt", "gehe raus", "gehen raus"],
+}
+KEYWORD_WEIGHT = math.log(20)
+
+_TOKEN_RE = re.compile(r"\w+")
+_SLOT_RE = re.compile(r"\{(\w+)\}")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def features(text: str) -> List[str]:
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _slot_values(model: dict) -> Dict[str, List[str]]:
+    """Slot-Typ -> alle Werte inkl. Synonyme."""
+    values = {}
+    for slot_type in model.get("types", []):
+        names = []
+        for val in slot_type.get("values", []):
+            names.append(val["name"]["value"])
+            names.extend(val["name"].get("synonyms", []))
+        values[slot_type["name"]] = names
+    return values
+
+
+def load_training_samples(path: str = ALEXA_MODEL_PATH) -> List[Tuple[str, Category, float]]:
+    """
+    Liefert (Text, Kategorie, Gewicht). Die Slot-Expansionen eines Samples teilen sich das Gewicht 1,
+    damit Intents mit vielen Slot-Werten (SmartControl) das Modell nicht dominieren.
+    """
+    samples = [(text, category, 1.0) for category, texts in EXTRA_SAMPLES.items() for text in texts]
+    try:
+        with open(path, encoding="utf-8") as f:
+            model = json.load(f)["interactionModel"]["languageModel"]
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Alexa Interaction Model nicht lesbar ({path}): {e} - nur eingebaute Samples")
+        return samples
+
+    type_values = _slot_values(model)
+    for intent in model.get("intents", []):
+        category = INTENT_CATEGORIES.get(intent["name"])
+        if category is None:
+            continue
+        slot_types = {slot["name"]: slot["type"] for slot in intent.get("slots", [])}
+        for sample in intent.get("samples", []):
+            slots = _SLOT_RE.findall(sample)
+            choices = [type_values.get(slot_types.get(slot), [slot]) for slot in slots]
+            combinations = list(itertools.product(*choices))
+            for combination in combinations:
+                text = sample
+                for slot, value in zip(slots, combination):
+                    text = text.replace(f"{{{slot}}}", value, 1)
+                samples.append((text, category, 1.0 / len(combinations)))
+    return samples
+
+
+class ClassificationResult:
+    def __init__(self, category: Category, confidence: float, scores: Dict[Category, float]):
+        self.category = category
+        self.confidence = confidence
+        self.scores = scores
+
+
+class LocalIntentClassifier:
+    """
+    Multinomial Naive Bayes mit Laplace-Glättung plus Stichwort-Regeln.
+    Gleichverteilter Prior: Die Anzahl der Samples pro Intent sagt nichts über die echte Nutzung aus.
+    """
+
+    def __init__(self, samples: List[Tuple[str, Category, float]]):
+        self.categories = sorted({c for _, c, _ in samples}, key=lambda c: c.value)
+        self.feature_counts: Dict[Category, Counter] = {c: Counter() for c in self.categories}
+        for text, category, weight in samples:
+            for feature in features(text):
+                self.feature_counts[category][feature] += weight
+
+        self.vocabulary = set().union(*self.feature_counts.values())
+        self.log_priors = {c: math.log(1 / len(self.categories)) for c in self.categories}
+        self.totals = {c: sum(self.feature_counts[c].values()) for c in self.categories}
+
+    def _log_likelihood(self, category: Category, feature: str) -> float:
+        count = self.feature_counts[category][feature]
+        return math.log((count + 1) / (self.totals[category] + len(self.vocabulary)))
+
+    def predict(self, text: str) -> ClassificationResult:
+        # Unbekannte Features tragen nichts zur Unterscheidung bei
+        known = [f for f in features(text) if f in self.vocabulary]
+        lowered = " ".join(tokenize(text))
+
+        log_scores = {}
+        for category in self.categories:
+            score = self.log_priors[category] + sum(self._log_likelihood(category, f) for f in known)
+            hits = sum(1 for keyword in KEYWORD_RULES.get(category, []) if keyword in lowered)
+            log_scores[category] = score + hits * KEYWORD_WEIGHT
+
+        # Softmax -> Konfidenz
+        top = max(log_scores.values())
+        exp_scores = {c: math.exp(s - top) for c, s in log_scores.items()}
+        total = sum(exp_scores.values())
+        scores = {c: s / total for c, s in exp_scores.items()}
+
+        best = max(scores, key=scores.get)
+        if not known and not any(k in lowered for keywords in KEYWORD_RULES.values() for k in keywords):
+            # Keine Evidenz -> nur der Prior, niemals sicher genug
+            return ClassificationResult(best, 0.0, scores)
+        return ClassificationResult(best, scores[best], scores)
+
+
+_classifier_instance: Optional[LocalIntentClassifier] = None
+
+
+def get_local_classifier() -> LocalIntentClassifier:
+    """Lazy Singleton: Das Modell wird beim ersten Aufruf trainiert (wenige Millisekunden)."""
+    global _classifier_instance
+    if _classifier_instance is None:
+        _classifier_instance = LocalIntentClassifier(load_training_samples())
+    return _classifier_instance
+
@@ -0,0 +1,100 @@
+"""
+Der Router (Klassifizierung): Freitext -> `Category`.
+
+Zuerst entscheidet der lokale Klassifikator. Nur unterhalb von `INTENT_CONFIDENCE_THRESHOLD`
+wird Gemini gefragt. Latenzen und die Übereinstimmung zwischen lokal und LLM werden geloggt.
+"""
+import json
+import logging
+import time
+
+from const import AI_MODEL_NAME, INTENT_CONFIDENCE_THRESHOLD, Category
+from genai_client.client import get_client
+from genai_client.scheduler import llm_scheduler
+from genai_client.usage import usage_labels
+from intent_classifier.classifier import ClassificationResult, get_local_classifier
+
+logger = logging.getLogger(__name__)
+
+
+class ClassificationStats:
+    """Zähler für lokale Treffer, LLM-Fallbacks und deren Übereinstimmung mit dem lokalen Ergebnis."""
+
+    def __init__(self):
+        self.local_decisions = 0
+        self.llm_decisions = 0
+        self.llm_agreements = 0
+
+    @property
+    def agreement_rate(self) -> float:
+        return self.llm_agreements / self.llm_decisions if self.llm_decisions else 1.0
+
+    def to_dict(self) -> dict:
+        return {
+            "local_decisions": self.local_decisions,
+            "llm_decisions": self.llm_decisions,
+            "llm_agreements": self.llm_agreements,
+            "agreement_rate": round(self.agreement_rate, 3),
+        }
+
+
+classification_stats = ClassificationStats()
+
+
+async def classify_with_llm(query: str) -> Category:
+    router_prompt = f"""
+    Klassifiziere den User Input in genau eine Kategorie.
+
+    Kategorien:
+    1. "CONTROL" -> Der User will aktiv etwas schalten (Licht an, Rolladen hoch, Heizung aus).
+    2. "ADVICE"  -> Der User fragt nach Energie-Entscheidungen (Waschmaschine jetzt? Auto laden?).
+    3. "INFO"    -> Der User will nur Statuswerte wissen (Wie warm ist es? Wieviel Strom verbrauchen wir? Ist Licht im Wohnzimmer an?).
+                 -> Beispiele:
+                     - Wie warm ist es?
+                     - Wieviel Strom verbrauchen wir?
+    4. "LEAVE_HOME" -> Der User verlässt das Haus (Ich möchte das Haus verlassen, was muss ich beachten?).
+
+    Antworte NUR mit dem JSON: {{"intent": "KATEGORIE"}}
+
+    Input: "{query}"
+    """
+    with usage_labels("ROUTER"):
+        resp = await llm_scheduler.generate_content(
+            get_client(),
+            model=AI_MODEL_NAME,
+            contents=router_prompt,
+            config={"response_mime_type": "application/json"},  # Erzwingt JSON
+        )
+    return Category[json.loads(resp.text).get("intent")]
+
+
+async def classify_intent(query: str) -> Category:
+    start = time.perf_counter()
+    local: ClassificationResult = get_local_classifier().predict(query)
+    local_ms = (time.perf_counter() - start) * 1000
+
+    if local.confidence >= INTENT_CONFIDENCE_THRESHOLD:
+        classification_stats.local_decisions += 1
+        logger.info(
+            f"Intent lokal: {local.category.name} (Konfidenz {local.confidence:.2f}, {local_ms:.2f} ms)"
+        )
+        return local.category
+
+    start = time.perf_counter()
+    try:
+        category = await classify_with_llm(query)
+    except Exception as e:
+        # Kein unbrauchbarer Fallback mehr: das beste lokale Ergebnis ist immer eine gültige Category
+        logger.error(f"LLM-Klassifizierung fehlgeschlagen ({e}), nutze lokales Ergebnis {local.category.name}")
+        return local.category
+    llm_ms = (time.perf_counter() - start) * 1000
+
+    classification_stats.llm_decisions += 1
+    if category == local.category:
+        classification_stats.llm_agreements += 1
+    logger.info(
+        f"Intent LLM: {category.name} ({llm_ms:.0f} ms), lokal: {local.category.name} "
+        f"(Konfidenz {local.confidence:.2f}, {local_ms:.2f} ms), "
+        f"Übereinstimmung bisher {classification_stats.agreement_rate:.0%} von {classification_stats.llm_decisions}"
+    )
+    return category
@@ -1,17 +1,37 @@
+import asyncio
 import json
-import traceback
+import logging
+import time
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 
+from alexa_auth.signature import SignatureVerificationError, alexa_signature_verifier
+from api_models.query import BatchQueryItem, BatchQueryRequest, BatchQueryResponse, QueryRequest
+
 from category_handler.leave_home_handler import LeaveHomeHandler
-from genai_client.client import get_client
-from const import Category, ALEXA_ACCESS_TOKEN, HA_URL
+from const import Category, ALEXA_ACCESS_TOKEN, ALEXA_VERIFY_SIGNATURE, HA_URL
 from category_handler.advice_handler import AdviceHandler
+from category_handler.advice_precompute import AdvicePrecomputer
 from category_handler.control_handler import ControlHandler
 from category_handler.info_handler import InfoHandler
 from category_handler.base import HandlerResult
-from ha_service.main import HaService
+from diagnostics.loop_watchdog import RouteTagMiddleware, loop_watchdog
+from diagnostics.request_profiler import ProfilingMiddleware, profile_ha_service, request_profiler
+from diagnostics.structured_logging import CorrelationIdMiddleware, logging_setup
+from genai_client.hedging import hedging_policy
+from genai_client.prompt_cache import prompt_cache
+from genai_client.scheduler import Priority, llm_scheduler, set_llm_priority
+from genai_client.usage import set_usage_labels, usage_tracker
+from ha_service.main import HaService, close_http_client
+from ha_service.snapshot import ContextSnapshotHaService
+from intent_classifier.router import classify_intent
+from recording.recorder import traffic_recorder, instrument_ha_service
+from serialization.fast_json import FastJSONResponse, dumps
+from warming.predictive_warmer import PredictiveWarmer
+from warming.startup_warmup import StartupWarmup
 
 # ---------------------------------------------------------
 # DAS STRATEGY MAPPING (Der "Router")
@@ -25,40 +45,40 @@ HANDLER_REGISTRY = {
 }
 # 1. Config & Setup
 load_dotenv()
-
-print(f"HA_URL: {HA_URL}")
-
-app = FastAPI(title="Smart Home AI")
-
-
-# --- A. DER ROUTER (KLASSIFIZIERUNG) ---
-async def classify_intent(query: str):
-    router_prompt = f"""
-    Klassifiziere den User Input in genau eine Kategorie.
-    
-    Kategorien:
-    1. "CONTROL" -> Der User will aktiv etwas schalten (Licht an, Rolladen hoch, Heizung aus).
-    2. "ADVICE"  -> Der User fragt nach Energie-Entscheidungen (Waschmaschine jetzt? Auto laden?).
-    3. "INFO"    -> Der User will nur Statuswerte wissen (Wie warm ist es? Wieviel Strom verbrauchen wir? Ist Licht im Wohnzimmer an?).
-                 -> Beispiele: 
-                     - Wie warm ist es?
-                     - Wieviel Strom verbrauchen wir?
-                     - Ich möchte das Haus verlassen, was muss ich beachten?
-    
-    Antworte NUR mit dem JSON: {{"intent": "KATEGORIE"}}
-    
-    Input: "{query}"
-    """
-    try:
-        resp = get_client().models.generate_content(
-            model="gemini-2.5-flash-lite",
-            contents=router_prompt,
-            config={"response_mime_type": "application/json"},  # Erzwingt JSON
-        )
-        return json.loads(resp.text).get("intent")
-    except Exception:
-        traceback.print_exc()
-        return "FOO"  # Fallback
+# JSON-Logs über Queue + Hintergrund-Thread (Level, Sampling, Redaction siehe LOG_* in const.py)
+logging_setup.configure()
+logger = logging.getLogger(__name__)
+
+logger.info(f"HA_URL: {HA_URL}")
+
+advice_precomputer = AdvicePrecomputer(ha_service_factory=HaService)
+predictive_warmer = PredictiveWarmer(ha_service_factory=HaService, advice_precomputer=advice_precomputer)
+startup_warmup = StartupWarmup(ha_service_factory=HaService)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hintergrund-Jobs laufen nur so lange wie die App
+    loop_watchdog.start()
+    startup_warmup.start()
+    advice_precomputer.start()
+    predictive_warmer.start()
+    yield
+    await predictive_warmer.stop()
+    await advice_precomputer.stop()
+    await startup_warmup.stop()
+    await loop_watchdog.stop()
+    await close_http_client()
+
+
+app = FastAPI(title="Smart Home AI", lifespan=lifespan, default_response_class=FastJSONResponse)
+# Route je Request für die Zuordnung von Event-Loop-Blockaden (LOOP_WATCHDOG_THRESHOLD_MS)
+app.add_middleware(RouteTagMiddleware)
+# Opt-in: Profil einzelner Requests mit PROFILE_TOKEN (ohne PROFILE_DIR/PROFILE_TOKEN gar nicht installiert)
+if request_profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+# Äußerste Middleware: Korrelations-ID für alle Log-Zeilen (HA, LLM, Handler) des Requests
+app.add_middleware(CorrelationIdMiddleware)
 
 
 async def process_category(category: Category, parameters, ha_service: HaService, session_attributes=None, intent_name=None):
@@ -69,6 +89,7 @@ async def process_category(category: Category, parameters, ha_service: HaService
         raise ValueError(f"Kein Handler für {category} definiert!")
 
     # 2. Instanz erstellen (oder Singleton nutzen) und ausführen
+    set_usage_labels(category.name, intent_name)
     handler = handler_class()
     return await handler.execute(parameters, ha_service, session_attributes, intent_name)
 
@@ -78,6 +99,118 @@ def health_check():
     return {"status": "alive", "sdk": "google-genai-v1"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness (im Gegensatz zu /health): 503, bis der Warmup nach dem Start durch ist (STARTUP_WARMUP)."""
+    status = startup_warmup.snapshot()
+    if not status["ready"]:
+        return FastJSONResponse(status, status_code=503)
+    return status
+
+
+@app.get("/usage")
+def usage_report(token: str = Query(None)):
+    """Token-Verbrauch und LLM-Latenz pro Kategorie, Intent und Modell seit dem Start, dazu LLM Queue, Hedging und Prompt-Cache."""
+    if token != ALEXA_ACCESS_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid Token")
+    return {
+        **usage_tracker.snapshot(),
+        "scheduler": llm_scheduler.snapshot(),
+        "hedging": hedging_policy.snapshot(),
+        "prompt_cache": prompt_cache.snapshot(),
+    }
+
+
+@app.get("/diagnostics/loop")
+def loop_diagnostics(token: str = Query(None)):
+    """Event-Loop-Verzögerung und blockierende Stellen pro Route (nur mit aktivem Watchdog)."""
+    if token != ALEXA_ACCESS_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid Token")
+    return loop_watchdog.snapshot()
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+@app.post("/query")
+async def handle_query(query: QueryRequest, token: str = Query(None)):
+    """
+    Generischer Einstieg für HA Assist, Chat UI und Skripte: Freitext rein,
+    Antwort als Server-Sent Events (event: category -> token... -> done).
+    """
+    if token != ALEXA_ACCESS_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid Token")
+
+    set_llm_priority(Priority.INTERACTIVE)
+    category = await classify_intent(query.text)
+    handler_class = HANDLER_REGISTRY.get(category)
+    if not handler_class:
+        raise HTTPException(status_code=422, detail=f"Kein Handler für {category} definiert!")
+
+    logger.info(f"QUERY: {category.name}", extra={"data": {"category": category.name, "query": query.text}})
+    handler = handler_class()
+    ha_service = profile_ha_service(HaService())
+
+    async def event_stream():
+        set_usage_labels(category.name, "query")
+        set_llm_priority(Priority.INTERACTIVE)
+        yield _sse_event("category", {"category": category.name})
+        try:
+            async for text in handler.stream([query.text], ha_service):
+                yield _sse_event("token", {"text": text})
+        except Exception as e:
+            logger.exception(f"CRITICAL: {e}")
+            yield _sse_event("error", {"text": "Systemfehler."})
+        yield _sse_event("done", {})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+async def _answer_batch_item(text: str, ha_service: ContextSnapshotHaService) -> BatchQueryItem:
+    start = time.perf_counter()
+    category = None
+    try:
+        category = await classify_intent(text)
+        result = await process_category(category, [text], ha_service)
+        return BatchQueryItem(
+            query=text,
+            category=category.name,
+            text=result.text,
+            duration_ms=round((time.perf_counter() - start) * 1000, 2),
+        )
+    except Exception as e:
+        logger.exception(f"Batch-Anfrage fehlgeschlagen: {e}")
+        return BatchQueryItem(
+            query=text,
+            category=category.name if category else None,
+            error=str(e) or type(e).__name__,
+            duration_ms=round((time.perf_counter() - start) * 1000, 2),
+        )
+
+
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def handle_query_batch(batch: BatchQueryRequest, token: str = Query(None)):
+    """
+    Mehrere Freitext-Anfragen auf einmal (Dashboard, Automationen): Der Smart Home Context wird
+    einmal geholt, die Handler laufen parallel auf diesem gemeinsamen Snapshot.
+    """
+    if token != ALEXA_ACCESS_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid Token")
+
+    start = time.perf_counter()
+    # Dashboard/Automationen: hinter Sprachanfragen, damit ein Batch die Quote nicht blockiert
+    set_llm_priority(Priority.BATCH)
+    ha_service = ContextSnapshotHaService(HaService())
+    items = await asyncio.gather(*(_answer_batch_item(text, ha_service) for text in batch.queries))
+
+    return BatchQueryResponse(
+        items=items,
+        context_ms=ha_service.fetch_ms,
+        total_ms=round((time.perf_counter() - start) * 1000, 2),
+    )
+
+
 @app.post("/alexa-webhook")
 async def handle_alexa(request: Request, token: str = Query(None)):
     # 1. Security
@@ -85,123 +218,158 @@ async def handle_alexa(request: Request, token: str = Query(None)):
     if token != current_token:
         raise HTTPException(status_code=403, detail="Invalid Token")
 
+    body = await request.body()
     try:
-        payload = await request.json()
-        req = payload.get("request", {})
-        session = payload.get("session", {})
-        session_attributes = session.get("attributes", {}) or {}
-        
-        print(f"REQUEST: {req}")
-        req_type = req.get("type")
-        intent_name = req.get("intent", {}).get("name")
-        
-        response_text = "Fehler."
-        should_end = True
-        new_session_attributes = {}
-
-        # 1. Die Konfiguration: Welcher Intent nutzt welchen Slot-Namen?
-        intent_slot_map = {
-            "LeaveHomeIntent": {"category": Category.LEAVE_HOME, "parameters": []},
-            "EnergyAdviceIntent": {
-                "category": Category.ADVICE,
-                "parameters": ["device"],
-            },
-            "StatusInfoIntent": {"category": Category.INFO, "parameters": ["subject"]},
-            "SmartControlIntent": {
-                "category": Category.CONTROL,
-                "parameters": ["device", "action"],
-            },
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+
+    # Opt-in: Echtheit des Requests prüfen (Zertifikat gecached, pro Request nur die Signatur)
+    if ALEXA_VERIFY_SIGNATURE:
+        try:
+            await alexa_signature_verifier.verify(
+                request.headers, body, payload.get("request", {}).get("timestamp")
+            )
+        except SignatureVerificationError as e:
+            logger.warning(f"SIGNATURE: {e}")
+            raise HTTPException(status_code=400, detail="Invalid Signature")
+
+    recording = None
+    try:
+        # Opt-in: Request samt HA-/LLM-Antworten für spätere Replays aufnehmen
+        if traffic_recorder.enabled:
+            recording = traffic_recorder.start(payload)
+        response = await process_alexa_payload(payload)
+
+    except Exception as e:
+        logger.exception(f"CRITICAL: {e}")
+        response = {
+            "version": "1.0",
+            "response": {"outputSpeech": {"type": "PlainText", "text": "Systemfehler."}},
         }
 
-        if req_type == "LaunchRequest":
-            response_text = "Hallo! Ich bin bereit."
-            should_end = False
+    if recording:
+        await traffic_recorder.finish(recording, response)
+    return response
 
-        elif intent_name in ["AMAZON.StopIntent", "AMAZON.CancelIntent"]:
-            response_text = "Tschüss!"
-            should_end = True
 
-        elif intent_name == "AMAZON.HelpIntent":
-            response_text = """
-                Um Tips beim Verlassen des Hauses zu bekommen kannst Du sagen: 
-                    Ich/wir verlasse das Haus
-                    Ich/wir gehen jetzt
-                    Ich/wir gehen raus
-                Um Tips zur Nutzung von Geräten zu bekommen kannst Du sagen:
-                    Lohnt sich Auto laden?
-                    Wann soll ich Waschmaschine anmachen?
-            """
-            should_end =  False
-
-        elif intent_name == "AMAZON.FallbackIntent":
-            response_text = "Das habe ich leider nicht verstanden."
-            should_end = False
+async def process_alexa_payload(payload: dict) -> dict:
+    """Wertet einen Alexa-Payload aus und baut die Alexa-Antwort."""
+    set_llm_priority(Priority.VOICE)
+    req = payload.get("request", {})
+    session = payload.get("session", {})
+    session_attributes = session.get("attributes", {}) or {}
+    
+    # Voller Request nur für einen Teil der Requests (LOG_PAYLOAD_SAMPLE_RATE)
+    logger.info(
+        f"REQUEST: {req.get('type')} {req.get('intent', {}).get('name') or ''}".rstrip(),
+        extra={"data": {"alexa_request_id": req.get("requestId")}, "payload": req},
+    )
+    req_type = req.get("type")
+    intent_name = req.get("intent", {}).get("name")
+    
+    response_text = "Fehler."
+    should_end = True
+    new_session_attributes = {}
+
+    # 1. Die Konfiguration: Welcher Intent nutzt welchen Slot-Namen?
+    intent_slot_map = {
+        "LeaveHomeIntent": {"category": Category.LEAVE_HOME, "parameters": []},
+        "EnergyAdviceIntent": {
+            "category": Category.ADVICE,
+            "parameters": ["device"],
+        },
+        "StatusInfoIntent": {"category": Category.INFO, "parameters": ["subject"]},
+        "SmartControlIntent": {
+            "category": Category.CONTROL,
+            "parameters": ["device", "action"],
+        },
+    }
+
+    if req_type == "LaunchRequest":
+        response_text = "Hallo! Ich bin bereit."
+        should_end = False
 
-        else:
-            category = None
-            parameters = []
-
-            # A. Check Context for Follow-Up (Yes/No)
-            if intent_name in ["AMAZON.YesIntent", "AMAZON.NoIntent"]:
-                cat_val = session_attributes.get("category")
-                if cat_val:
-                    try:
-                        category = Category(cat_val)
-                    except ValueError:
-                        print(f"Warning: Invalid category in session: {cat_val}")
-            
-            # B. Standard Intent Mapping
-            if not category and intent_name in intent_slot_map:
-                category = intent_slot_map[intent_name]["category"]
-                if req["intent"].get("slots", {}):
-                    for parameterName in intent_slot_map[intent_name]["parameters"]:
-                        if parameterName in req["intent"]["slots"]:
-                             val = req["intent"]["slots"][parameterName].get("value")
-                             if val:
-                                 parameters.append(val)
-
-            # C. Execute
-            if category:
-                print(f"USER INPUT: {category.name}: {parameters} | Intent: {intent_name}")
-
-                # --- SERVICE INSTANZIIEREN ---
-                ha_service = HaService()
-
-                result = await process_category(
-                    category, parameters, ha_service, session_attributes, intent_name
-                )
-                
-                # Unwrap HandlerResult
-                if isinstance(result, HandlerResult):
-                    response_text = result.text
-                    should_end = result.should_end_session
-                    new_session_attributes = result.session_attributes
-                else:
-                    # Fallback old style
-                    response_text = str(result)
-                    should_end = True
-
-                print(f"USER OUTPUT: {response_text}")
+    elif intent_name in ["AMAZON.StopIntent", "AMAZON.CancelIntent"]:
+        response_text = "Tschüss!"
+        should_end = True
 
+    elif intent_name == "AMAZON.HelpIntent":
+        response_text = """
+            Um Tips beim Verlassen des Hauses zu bekommen kannst Du sagen: 
+                Ich/wir verlasse das Haus
+                Ich/wir gehen jetzt
+                Ich/wir gehen raus
+            Um Tips zur Nutzung von Geräten zu bekommen kannst Du sagen:
+                Lohnt sich Auto laden?
+                Wann soll ich Waschmaschine anmachen?
+        """
+        should_end =  False
+
+    elif intent_name == "AMAZON.FallbackIntent":
+        response_text = "Das habe ich leider nicht verstanden."
+        should_end = False
+
+    else:
+        category = None
+        parameters = []
+
+        # A. Check Context for Follow-Up (Yes/No)
+        if intent_name in ["AMAZON.YesIntent", "AMAZON.NoIntent"]:
+            cat_val = session_attributes.get("category")
+            if cat_val:
+                try:
+                    category = Category(cat_val)
+                except ValueError:
+                    logger.warning(f"Ungültige Kategorie in der Session: {cat_val}")
+        
+        # B. Standard Intent Mapping
+        if not category and intent_name in intent_slot_map:
+            category = intent_slot_map[intent_name]["category"]
+            if req["intent"].get("slots", {}):
+                for parameterName in intent_slot_map[intent_name]["parameters"]:
+                    if parameterName in req["intent"]["slots"]:
+                         val = req["intent"]["slots"][parameterName].get("value")
+                         if val:
+                             parameters.append(val)
+
+        # C. Execute
+        if category:
+            logger.info(
+                f"USER INPUT: {category.name} | Intent: {intent_name}",
+                extra={"data": {"category": category.name, "intent": intent_name, "parameters": parameters}},
+            )
+
+            # --- SERVICE INSTANZIIEREN ---
+            ha_service = profile_ha_service(instrument_ha_service(HaService()))
+
+            result = await process_category(
+                category, parameters, ha_service, session_attributes, intent_name
+            )
+            
+            # Unwrap HandlerResult
+            if isinstance(result, HandlerResult):
+                response_text = result.text
+                should_end = result.should_end_session
+                new_session_attributes = result.session_attributes
             else:
-                response_text = "Ich habe Dich nicht verstanden."
+                # Fallback old style
+                response_text = str(result)
                 should_end = True
 
-        return {
-            "version": "1.0",
-            "sessionAttributes": new_session_attributes,
-            "response": {
-                "outputSpeech": {"type": "PlainText", "text": response_text},
-                "shouldEndSession": should_end,
-            },
-        }
+            logger.info("USER OUTPUT", extra={"data": {"category": category.name, "output": response_text}})
+
+        else:
+            response_text = "Ich habe Dich nicht verstanden."
+            should_end = True
 
-    except Exception as e:
-        print(f"CRITICAL: {e}")
-        traceback.print_exc()
     return {
         "version": "1.0",
-        "response": {"outputSpeech": {"type": "PlainText", "text": "Systemfehler."}},
+        "sessionAttributes": new_session_attributes,
+        "response": {
+            "outputSpeech": {"type": "PlainText", "text": response_text},
+            "shouldEndSession": should_end,
+        },
     }
 
 
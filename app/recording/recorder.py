@@ -0,0 +1,184 @@
+"""
+Opt-in Recorder für echten Webhook-Traffic.
+
+Pro `/alexa-webhook` Request wird eine JSONL-Zeile geschrieben (gleiches Format-Prinzip wie `requests.jsonl`):
+    - der eingehende Alexa-Payload
+    - alle HA-Aufrufe (Methode, Argumente, Ergebnis, Dauer)
+    - alle LLM-Aufrufe (Modell, Antwort-Parts, Dauer)
+    - die Webhook-Antwort und die Gesamtdauer
+
+Aktiviert wird der Recorder über die Umgebungsvariable `RECORD_TRAFFIC_PATH`.
+Die Aufnahmen können mit `helper_scripts/replay_traffic.py` wieder abgespielt werden.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from const import RECORD_TRAFFIC_PATH
+from serialization.fast_json import json_default
+
+logger = logging.getLogger(__name__)
+
+# Die aktive Aufnahme des aktuellen Requests (None = es wird nicht aufgenommen)
+_current_recording: contextvars.ContextVar[Optional["Recording"]] = contextvars.ContextVar(
+    "current_recording", default=None
+)
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def serialize_llm_response(response: Any) -> List[Dict[str, Any]]:
+    """
+    Reduziert eine `generate_content` Antwort auf die Parts, die die Handler auswerten (Text + Function Calls).
+    """
+    parts = []
+    candidates = getattr(response, "candidates", None)
+    if candidates and candidates[0].content and candidates[0].content.parts:
+        for part in candidates[0].content.parts:
+            if part.function_call:
+                parts.append(
+                    {
+                        "function_call": {
+                            "name": part.function_call.name,
+                            "args": dict(part.function_call.args or {}),
+                        }
+                    }
+                )
+            elif part.text:
+                parts.append({"text": part.text})
+    return parts
+
+
+class Recording:
+    """Sammelt alle Daten eines einzelnen Webhook-Requests."""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+        self.recorded_at = datetime.now(timezone.utc).isoformat()
+        self.ha_calls: List[Dict[str, Any]] = []
+        self.llm_calls: List[Dict[str, Any]] = []
+        self._start = time.perf_counter()
+
+    def add_ha_call(self, method: str, args: List[Any], result: Any, duration_ms: float) -> None:
+        self.ha_calls.append(
+            {"method": method, "args": args, "result": result, "duration_ms": duration_ms}
+        )
+
+    def add_llm_call(self, model: str, parts: List[Dict[str, Any]], duration_ms: float) -> None:
+        self.llm_calls.append({"model": model, "parts": parts, "duration_ms": duration_ms})
+
+    def to_record(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "recorded_at": self.recorded_at,
+            "payload": self.payload,
+            "ha_calls": self.ha_calls,
+            "llm_calls": self.llm_calls,
+            "response": response,
+            "duration_ms": _elapsed_ms(self._start),
+        }
+
+
+class RecordingHaService:
+    """
+    Proxy um den HaService: Jeder awaitbare Methodenaufruf wird samt Ergebnis und Dauer mitgeschrieben.
+    """
+
+    def __init__(self, inner: Any, recording: Recording):
+        self._inner = inner
+        self._recording = recording
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._inner, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def recorded_call(*args, **kwargs):
+            start = time.perf_counter()
+            result = await attr(*args, **kwargs)
+            self._recording.add_ha_call(name, [*args, *kwargs.values()], result, _elapsed_ms(start))
+            return result
+
+        return recorded_call
+
+
+class _RecordingModels:
+    def __init__(self, inner: Any, recording: Recording):
+        self._inner = inner
+        self._recording = recording
+
+    def generate_content(self, *, model: str, **kwargs) -> Any:
+        start = time.perf_counter()
+        response = self._inner.generate_content(model=model, **kwargs)
+        self._recording.add_llm_call(model, serialize_llm_response(response), _elapsed_ms(start))
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class RecordingGenAiClient:
+    """Proxy um den Gemini Client, der `models.generate_content` Aufrufe mitschreibt."""
+
+    def __init__(self, inner: Any, recording: Recording):
+        self._inner = inner
+        self.models = _RecordingModels(inner.models, recording)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+class TrafficRecorder:
+    """Schreibt abgeschlossene Aufnahmen als JSONL-Zeilen (Datei-I/O außerhalb des Event Loops)."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def start(self, payload: Dict[str, Any]) -> Recording:
+        recording = Recording(payload)
+        _current_recording.set(recording)
+        return recording
+
+    async def finish(self, recording: Recording, response: Dict[str, Any]) -> None:
+        _current_recording.set(None)
+        line = json.dumps(recording.to_record(response), ensure_ascii=False, default=json_default)
+        try:
+            await asyncio.to_thread(self._append, line)
+        except OSError as e:
+            logger.error(f"Aufnahme konnte nicht geschrieben werden: {e}")
+
+    def _append(self, line: str) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def current_recording() -> Optional[Recording]:
+    return _current_recording.get()
+
+
+def instrument_ha_service(ha_service: Any) -> Any:
+    """Gibt den HaService zurück – bei aktiver Aufnahme eingepackt in den RecordingHaService."""
+    recording = current_recording()
+    return RecordingHaService(ha_service, recording) if recording else ha_service
+
+
+def instrument_genai_client(client: Any) -> Any:
+    """Gibt den Gemini Client zurück – bei aktiver Aufnahme eingepackt in den RecordingGenAiClient."""
+    recording = current_recording()
+    if recording is None or client is None:
+        return client
+    return RecordingGenAiClient(client, recording)
+
+
+traffic_recorder = TrafficRecorder(RECORD_TRAFFIC_PATH)
@@ -0,0 +1,82 @@
+"""
+Stubs für das Abspielen aufgenommener Webhook-Requests (siehe `recording/recorder.py`).
+
+Die Stubs liefern die aufgenommenen HA- und LLM-Antworten in Aufnahme-Reihenfolge zurück
+und warten dabei die aufgenommene Dauer (multipliziert mit `time_scale`) ab.
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+
+def load_recordings(path: str) -> List[Dict[str, Any]]:
+    recordings = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                recordings.append(json.loads(line))
+    return recordings
+
+
+def build_llm_response(parts: List[Dict[str, Any]]) -> SimpleNamespace:
+    """Baut aus den aufgenommenen Parts ein Objekt mit der Form einer `generate_content` Antwort."""
+    response_parts = []
+    for part in parts:
+        function_call = None
+        if "function_call" in part:
+            function_call = SimpleNamespace(**part["function_call"])
+        response_parts.append(SimpleNamespace(text=part.get("text"), function_call=function_call))
+
+    texts = [p["text"] for p in parts if p.get("text")]
+    return SimpleNamespace(
+        text="".join(texts) if texts else None,
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=response_parts))],
+    )
+
+
+class ReplayHaService:
+    """Ersetzt den HaService: Liefert pro Methode die aufgenommenen Ergebnisse der Reihe nach."""
+
+    def __init__(self, ha_calls: List[Dict[str, Any]], time_scale: float = 1.0):
+        self.time_scale = time_scale
+        self._calls: Dict[str, List[Dict[str, Any]]] = {}
+        for call in ha_calls:
+            self._calls.setdefault(call["method"], []).append(call)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or name not in self._calls:
+            raise AttributeError(f"Keine Aufnahme für HaService.{name}")
+
+        async def replayed_call(*args, **kwargs):
+            queue = self._calls[name]
+            if not queue:
+                raise RuntimeError(f"Aufnahme für HaService.{name} erschöpft")
+            call = queue.pop(0)
+            await asyncio.sleep(call["duration_ms"] / 1000 * self.time_scale)
+            return call["result"]
+
+        return replayed_call
+
+
+class _ReplayModels:
+    def __init__(self, llm_calls: List[Dict[str, Any]], time_scale: float):
+        self._calls = list(llm_calls)
+        self._time_scale = time_scale
+
+    def generate_content(self, *, model: str, **kwargs) -> SimpleNamespace:
+        if not self._calls:
+            raise RuntimeError("Aufnahme für generate_content erschöpft")
+        call = self._calls.pop(0)
+        # Der echte Client blockiert synchron, also tut es der Stub auch
+        time.sleep(call["duration_ms"] / 1000 * self._time_scale)
+        return build_llm_response(call["parts"])
+
+
+class ReplayGenAiClient:
+    """Ersetzt den Gemini Client: Liefert die aufgenommenen Antworten der Reihe nach."""
+
+    def __init__(self, llm_calls: List[Dict[str, Any]], time_scale: float = 1.0):
+        self.models = _ReplayModels(llm_calls, time_scale)
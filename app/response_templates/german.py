@@ -0,0 +1,168 @@
+"""
+Deutsche Antwort-Templates: Formuliert einfache Antworten lokal in wenigen Millisekunden,
+ohne Gemini. LLM-Formulierung bleibt über `LLM_PHRASING=true` als Opt-in erhalten.
+
+Alle Funktionen geben `None` zurück, wenn sie eine Frage nicht sicher beantworten können –
+der Handler fällt dann auf das LLM zurück.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from category_handler.home_status import open_windows_doors
+
+ALL_SAFE_TEXT = "Alles sicher, schönen Tag!"
+ASK_LIGHTS_OFF_TEXT = "Soll ich die Lichter ausschalten?"
+GOODBYE_TEXT = "Schönen Tag!"
+
+
+def join_natural(items: List[str]) -> str:
+    """["Wohnzimmer", "Küche", "Bad"] -> "Wohnzimmer, Küche und Bad" (Duplikate fallen weg)."""
+    unique = list(dict.fromkeys(i for i in items if i))
+    if len(unique) <= 1:
+        return "".join(unique)
+    return f"{', '.join(unique[:-1])} und {unique[-1]}"
+
+
+def format_number(value: float, decimals: int = 0) -> str:
+    """Deutsche Schreibweise: 5.25 -> "5,3" (decimals=1), 1200.4 -> "1200"."""
+    if decimals == 0:
+        return str(round(value))
+    return f"{value:.{decimals}f}".replace(".", ",")
+
+
+def _label(entry: Dict[str, Any]) -> Optional[str]:
+    """Bereich, sonst der Anzeigename. Nie die Entity-ID ("light.flur_spot_2" klingt vorgelesen absurd)."""
+    name = entry.get("name")
+    return entry.get("area") or (name if name and name != entry["eid"] else None)
+
+
+def _listing(prefix: str, entries: List[Dict[str, Any]]) -> str:
+    """"Licht an: Wohnzimmer und Spot Flur." bzw. nur "Licht an.", wenn kein Eintrag einen Namen hat."""
+    labels = join_natural([_label(e) for e in entries])
+    return f"{prefix}: {labels}." if labels else f"{prefix}."
+
+
+def _openings_sentences(fenster_tueren: List[Dict[str, Any]]) -> List[str]:
+    sentences = []
+    windows = [e for e in fenster_tueren if e.get("device_class") != "door"]
+    doors = [e for e in fenster_tueren if e.get("device_class") == "door"]
+    if windows:
+        sentences.append(_listing("Fenster offen", windows))
+    if doors:
+        sentences.append(_listing("Tür offen", doors))
+    return sentences
+
+
+# ---------------------------------------------------------
+# LEAVE HOME
+# ---------------------------------------------------------
+def render_leave_home(
+    fenster_tueren: List[Dict[str, Any]],
+    aktive_lichter: List[Dict[str, Any]],
+    hoher_verbrauch: List[Dict[str, Any]],
+) -> str:
+    if not (fenster_tueren or aktive_lichter or hoher_verbrauch):
+        return ALL_SAFE_TEXT
+
+    sentences = _openings_sentences(fenster_tueren)
+    if aktive_lichter:
+        sentences.append(_listing("Licht an", aktive_lichter))
+    if hoher_verbrauch:
+        consumers = [f"{_label(e) or 'ein Gerät'} mit {format_number(float(e['state']))} Watt" for e in hoher_verbrauch]
+        sentences.append(f"Hoher Verbrauch: {join_natural(consumers)}.")
+
+    sentences.append(ASK_LIGHTS_OFF_TEXT if aktive_lichter else GOODBYE_TEXT)
+    return " ".join(sentences)
+
+
+# ---------------------------------------------------------
+# STATUS INFO (Subjects aus ENERGY_MAPPING)
+# ---------------------------------------------------------
+def _number(energy_context: Dict[str, Any], key: str) -> Optional[float]:
+    val = energy_context.get(key)
+    return float(val) if isinstance(val, (int, float)) else None
+
+
+def _render_car_battery(smart_home_context: Dict[str, Any]) -> Optional[str]:
+    percent = _number(smart_home_context.get("energy_context", {}), "batterie_auto_prozent")
+    if percent is None:
+        return None
+    return f"Das Auto ist zu {format_number(percent)} Prozent geladen."
+
+
+def _render_house_battery(smart_home_context: Dict[str, Any]) -> Optional[str]:
+    percent = _number(smart_home_context.get("energy_context", {}), "batterie_haus_prozent")
+    if percent is None:
+        return None
+    return f"Der Hausakku ist bei {format_number(percent)} Prozent."
+
+
+def _render_pv_forecast(smart_home_context: Dict[str, Any]) -> Optional[str]:
+    energy_context = smart_home_context.get("energy_context", {})
+    rest_kwh = _number(energy_context, "pv_rest_prognose_kwh")
+    if rest_kwh is None:
+        return None
+    text = f"Heute sind noch {format_number(rest_kwh, 1)} kWh PV-Ertrag zu erwarten."
+    current_watt = _number(energy_context, "pv_aktuell_watt")
+    if current_watt is not None:
+        text += f" Aktuell erzeugt die Anlage {format_number(current_watt)} Watt."
+    return text
+
+
+def _render_house_power(smart_home_context: Dict[str, Any]) -> Optional[str]:
+    energy_context = smart_home_context.get("energy_context", {})
+    house_watt = _number(energy_context, "haus_power")
+    if house_watt is None:
+        return None
+    text = f"Das Haus verbraucht gerade {format_number(house_watt)} Watt."
+    grid_watt = _number(energy_context, "netz_saldo_watt")
+    # Positiv = Netzbezug, negativ = PV-Einspeisung
+    if grid_watt is not None and round(grid_watt) < 0:
+        text += f" Wir speisen {format_number(-grid_watt)} Watt ins Netz ein."
+    elif grid_watt is not None and round(grid_watt) > 0:
+        text += f" Aus dem Netz beziehen wir {format_number(grid_watt)} Watt."
+    return text
+
+
+def _render_windows(smart_home_context: Dict[str, Any]) -> Optional[str]:
+    openings = open_windows_doors(smart_home_context)
+    if not openings:
+        return "Alle Fenster und Türen sind zu."
+    return " ".join(_openings_sentences(openings))
+
+
+# Ganze Subjects: Slot-Werte aus `InfoSubjectType` (Strom, Fenster, Prognose) plus feste Synonyme.
+# Kein Stichwort-Treffer im Freitext ("Ist der Strom gerade sauber?" ist keine Frage nach dem Hausverbrauch).
+STATUS_TEMPLATES: Dict[str, Callable[[Dict[str, Any]], Optional[str]]] = {
+    **dict.fromkeys(["strom", "stromverbrauch", "verbrauch", "hausverbrauch"], _render_house_power),
+    **dict.fromkeys(["fenster", "türen", "fenster und türen"], _render_windows),
+    **dict.fromkeys(["prognose", "pv prognose", "pv-prognose", "solarprognose", "pv"], _render_pv_forecast),
+    **dict.fromkeys(["akku", "batterie", "hausakku", "hausbatterie"], _render_house_battery),
+    **dict.fromkeys(["auto", "autoakku", "auto akku", "akku vom auto"], _render_car_battery),
+}
+# "sind {subject} offen" -> Subject mit Artikel ("die Fenster")
+SUBJECT_ARTICLES = ("der ", "die ", "das ", "den ")
+# /query schickt den ganzen Satz: nur die Beispielsätze des StatusInfoIntent (alexa_model.json) als Ganzes
+STATUS_QUESTION_PATTERNS = [
+    re.compile(r"wie ist der status (?:von|vom) (.+)"),
+    re.compile(r"sind (.+) offen"),
+]
+
+
+def _normalize_subject(subject: str) -> str:
+    words = " ".join(subject.lower().strip(" ?!.").split())
+    for pattern in STATUS_QUESTION_PATTERNS:
+        match = pattern.fullmatch(words)
+        if match:
+            words = match.group(1)
+            break
+    for article in SUBJECT_ARTICLES:
+        if words.startswith(article):
+            return words[len(article):]
+    return words
+
+
+def render_status_info(subject: str, smart_home_context: Dict[str, Any]) -> Optional[str]:
+    """Beantwortet eine einfache Status-Frage lokal, wenn `subject` genau ein bekanntes Subject ist, sonst `None`."""
+    renderer = STATUS_TEMPLATES.get(_normalize_subject(subject))
+    return renderer(smart_home_context) if renderer else None
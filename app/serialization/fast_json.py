@@ -0,0 +1,45 @@
+"""
+Schneller JSON-Encoder für Prompt-Fragmente und API-Antworten.
+
+Mit `orjson` (optional, siehe requirements.txt) wird dessen Rust-Encoder genutzt, sonst ein
+einmal konfigurierter stdlib-Encoder. Beide liefern dasselbe kompakte UTF-8 Format
+(ohne Leerzeichen, Umlaute nicht escaped) – das spart auch Tokens im Prompt.
+
+Objekte mit `to_dict()` (z.B. `ha_service.entities.Entity`) werden erst hier zu Dicts.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - abhängig von der Installation
+    orjson = None
+
+def json_default(obj: Any) -> Any:
+    to_dict = getattr(obj, "to_dict", None)
+    return to_dict() if to_dict is not None else str(obj)
+
+
+# Ein Encoder für alle Aufrufe: `json.dumps(..., **kwargs)` baut sonst bei jedem Aufruf einen neuen
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False, default=json_default)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+    return _stdlib_encoder.encode(obj).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return _stdlib_encoder.encode(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default Response-Klasse der App (`FastAPI(default_response_class=...)`)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
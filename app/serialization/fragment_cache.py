@@ -0,0 +1,111 @@
+"""
+Cache für serialisierte Prompt-Fragmente (Geräteliste, Sensoren, Energie-Werte, Historie).
+
+Schlüssel ist der Inhalt der Daten, nicht das Objekt: Ein unveränderter Context aus einem neuen
+HA-Abruf trifft denselben Eintrag und wird nicht erneut encodiert. Zusätzlich gibt es einen
+Identitäts-Pfad für dasselbe Objekt (Batch-Snapshot, Vorberechnung), der ganz ohne Durchlauf auskommt.
+
+Annahme: Context-Daten werden nach dem Aufbau im HaService nicht mehr verändert.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from serialization.fast_json import dumps
+
+
+# True == 1 == 1.0 (gleicher Hash), encodiert aber verschieden -> Zahlen im Schlüssel mit Typ
+_NUMBER_TYPES = (bool, int, float)
+
+
+def _value_key(value: Any) -> Any:
+    t = type(value)
+    if t is str or value is None:
+        return value
+    if t in _NUMBER_TYPES:
+        return t, value
+    return content_key(value)
+
+
+def content_key(obj: Any) -> Any:
+    """
+    Hashbares Abbild der Daten: Listen und Dicts als getaggte Tupel, Zahlen mit ihrem Typ.
+    Listen von Entity-Dicts (alle Zeilen mit denselben Schlüsseln in derselben Reihenfolge, wie sie
+    der HaService baut) werden nur über ihre Werte abgebildet – das ist günstiger als sie zu encodieren.
+    Listen von Datensätzen mit `row()` (`ha_service.entities.Entity`) entsprechend über ihre Zeilen.
+    Die Tupel verweisen auf die vorhandenen Werte (keine Kopie der Strings), gehalten werden höchstens
+    `max_entries` Schlüssel.
+    """
+    if isinstance(obj, list):
+        if obj and hasattr(obj[0], "row"):
+            try:
+                return ("records", tuple(item.row() for item in obj))
+            except AttributeError:  # gemischte Liste
+                pass
+        if obj and type(obj[0]) is dict:
+            keys = tuple(obj[0])
+            rows = []
+            for row in obj:
+                if type(row) is not dict or tuple(row) != keys:
+                    break  # anderes Schema -> Zeilen einzeln mit ihren Schlüsseln
+                rows.append(tuple(map(_value_key, row.values())))
+            else:
+                return ("rows", keys, tuple(rows))
+        return list, tuple(content_key(item) for item in obj)
+    if isinstance(obj, dict):
+        return dict, tuple((k, _value_key(v)) for k, v in obj.items())
+    return _value_key(obj)
+
+
+class FragmentCache:
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._by_content: "OrderedDict[Any, str]" = OrderedDict()
+        # id -> (Objekt, Text); das Objekt wird gehalten, damit die id nicht wiederverwendet wird
+        self._by_id: "OrderedDict[int, Tuple[Any, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def fragment(self, obj: Any) -> str:
+        if self.max_entries <= 0:
+            return dumps(obj)
+
+        entry = self._by_id.get(id(obj))
+        if entry is not None and entry[0] is obj:
+            self._by_id.move_to_end(id(obj))
+            self.hits += 1
+            return entry[1]
+
+        key = content_key(obj)
+        try:
+            text = self._by_content.get(key)
+        except TypeError:  # nicht hashbare Werte (z.B. Listen in Entity-Zeilen) -> ohne Cache
+            return dumps(obj)
+
+        if text is None:
+            self.misses += 1
+            text = dumps(obj)
+            self._by_content[key] = text
+            self._trim(self._by_content)
+        else:
+            self.hits += 1
+            self._by_content.move_to_end(key)
+
+        self._by_id[id(obj)] = (obj, text)
+        self._trim(self._by_id)
+        return text
+
+    def _trim(self, entries: Dict) -> None:
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._by_content.clear()
+        self._by_id.clear()
+
+
+fragment_cache = FragmentCache()
+
+
+def prompt_json(obj: Any) -> str:
+    """Serialisiertes Prompt-Fragment aus dem gemeinsamen Cache."""
+    return fragment_cache.fragment(obj)
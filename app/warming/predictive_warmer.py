@@ -0,0 +1,105 @@
+"""
+Hintergrund-Job: Wärmt Smart Home Context, Historie und vorberechenbare Antworten kurz vor den
+üblichen Nutzungszeiten (siehe `UsageHistogram`).
+
+Außerhalb der Zeitfenster ([Stunde - WARMING_LEAD_MINUTES, Stundenende]) wird HA nicht abgefragt,
+innerhalb höchstens einmal pro `WARMING_INTERVAL_SECONDS`. Gestartet über den Lifespan (`main.py`).
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from category_handler.advice_precompute import AdvicePrecomputer
+from const import (
+    PREDICTIVE_WARMING,
+    RECORD_TRAFFIC_PATH,
+    WARMING_INTERVAL_SECONDS,
+    WARMING_LEAD_MINUTES,
+    WARMING_MAX_HOURS_PER_DAY,
+    WARMING_MIN_REQUESTS,
+)
+from warming.usage_histogram import Slot, UsageHistogram
+
+logger = logging.getLogger(__name__)
+
+# Intents, deren Antwort sich vorberechnen lässt (zusätzlich zum Context)
+PRECOMPUTABLE_INTENTS = {"EnergyAdviceIntent"}
+
+
+class PredictiveWarmer:
+    def __init__(
+        self,
+        ha_service_factory: Callable[[], Any],
+        advice_precomputer: Optional[AdvicePrecomputer] = None,
+        histogram_loader: Callable[[], UsageHistogram] = lambda: UsageHistogram.from_recordings(RECORD_TRAFFIC_PATH),
+        enabled: bool = PREDICTIVE_WARMING,
+        lead_minutes: int = WARMING_LEAD_MINUTES,
+        interval_seconds: int = WARMING_INTERVAL_SECONDS,
+        min_requests: int = WARMING_MIN_REQUESTS,
+        max_hours_per_day: int = WARMING_MAX_HOURS_PER_DAY,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.ha_service_factory = ha_service_factory
+        self.advice_precomputer = advice_precomputer
+        self.histogram_loader = histogram_loader
+        self.enabled = enabled
+        self.lead = timedelta(minutes=lead_minutes)
+        self.interval_seconds = interval_seconds
+        self.min_requests = min_requests
+        self.max_hours_per_day = max_hours_per_day
+        self.clock = clock
+        self.hot_slots: Dict[str, Set[Slot]] = {}
+        self.warmups = 0
+        self._learned_on = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def relearn(self) -> None:
+        # Die Aufnahmen können groß sein -> im Thread lesen, nicht auf dem Event Loop
+        histogram = await asyncio.to_thread(self.histogram_loader)
+        self.hot_slots = histogram.hot_slots(self.min_requests, self.max_hours_per_day)
+        self._learned_on = self.clock().date()
+        logger.info(f"Vorwärm-Zeitfenster: { {k: sorted(v) for k, v in self.hot_slots.items()} }")
+
+    def expected_intents(self, now: datetime) -> List[str]:
+        """Intents, deren Nutzungszeit gerade läuft oder in `lead` Minuten beginnt."""
+        slots = {(now.weekday(), now.hour), ((now + self.lead).weekday(), (now + self.lead).hour)}
+        return sorted(intent for intent, hot in self.hot_slots.items() if hot & slots)
+
+    async def warm_once(self) -> List[str]:
+        now = self.clock()
+        if self._learned_on != now.date():
+            await self.relearn()
+
+        intents = self.expected_intents(now)
+        if not intents:
+            return []
+
+        # Füllt Context- und Historien-Cache im HaService
+        await self.ha_service_factory().get_smart_home_context()
+        if self.advice_precomputer and PRECOMPUTABLE_INTENTS.intersection(intents):
+            await self.advice_precomputer.refresh_once()
+        self.warmups += 1
+        logger.info(f"Vorgewärmt für: {', '.join(intents)}")
+        return intents
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm_once()
+            except Exception as e:
+                logger.error(f"Vorwärmen fehlgeschlagen: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
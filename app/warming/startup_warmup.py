@@ -0,0 +1,99 @@
+"""
+Kaltstart (Scale-to-Zero): Baut nach dem Start im Hintergrund alles auf, was sonst der erste
+Nutzer-Request bezahlt – Gemini SDK/Client samt Verbindung, HA-Verbindung mit Raum-Zuordnung und
+Context, lokales Intent-Modell. `/health` antwortet sofort (Liveness), `/ready` erst danach.
+
+Schlägt ein Schritt fehl oder läuft in den Timeout, meldet `/ready` trotzdem bereit, aber "degraded"
+(der erste Request baut den Schritt dann wie bisher selbst auf). Gestartet über den Lifespan (`main.py`).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from const import AI_HANDLER_MODEL_NAME, STARTUP_WARMUP, STARTUP_WARMUP_TIMEOUT_SECONDS
+from genai_client import client as genai_client
+from intent_classifier.classifier import get_local_classifier
+
+logger = logging.getLogger(__name__)
+
+# Startzeitpunkt des Prozesses (Import der App), Basis für `ready_after_ms`
+PROCESS_START = time.monotonic()
+
+
+class StartupWarmup:
+    def __init__(
+        self,
+        ha_service_factory: Callable[[], Any],
+        enabled: bool = STARTUP_WARMUP,
+        timeout_seconds: float = STARTUP_WARMUP_TIMEOUT_SECONDS,
+        steps: Optional[List[Tuple[str, Callable[[], Awaitable[Any]]]]] = None,
+    ):
+        self.ha_service_factory = ha_service_factory
+        self.enabled = enabled
+        self.timeout_seconds = timeout_seconds
+        self.steps = steps if steps is not None else [
+            ("intent_model", self._warm_intent_model),
+            ("gemini", self._warm_gemini),
+            ("home_assistant", self._warm_home_assistant),
+        ]
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.ready_after_ms: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        # Ohne Warmup gibt es nichts abzuwarten
+        return not self.enabled or self.ready_after_ms is not None
+
+    async def _warm_intent_model(self) -> None:
+        await asyncio.to_thread(get_local_classifier)
+
+    async def _warm_gemini(self) -> None:
+        # SDK-Import, Client und TLS-Verbindung; synchron -> im Thread, der Loop bleibt frei für /health
+        await asyncio.to_thread(genai_client.warm_up_connection, AI_HANDLER_MODEL_NAME)
+
+    async def _warm_home_assistant(self) -> None:
+        # Keep-Alive-Verbindung, Raum-Zuordnung und (mit Context Cache) der erste Context
+        context = await self.ha_service_factory().get_smart_home_context()
+        if not context.get("energy_context"):
+            raise RuntimeError("Kein Smart Home Context (HA nicht konfiguriert oder nicht erreichbar)")
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), self.timeout_seconds)
+            result = {"ok": True}
+        except Exception as e:
+            result = {"ok": False, "error": str(e) or type(e).__name__}
+            logger.warning(f"Warmup-Schritt {name} fehlgeschlagen: {result['error']}")
+        result["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        self.results[name] = result
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._run_step(name, step) for name, step in self.steps))
+        self.ready_after_ms = round((time.monotonic() - PROCESS_START) * 1000, 2)
+        logger.info(f"Warmup abgeschlossen, bereit nach {self.ready_after_ms} ms: {self.results}")
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        degraded = any(not r["ok"] for r in self.results.values())
+        return {
+            "ready": self.ready,
+            "status": "warming" if not self.ready else "degraded" if degraded else "ready",
+            "warmup": self.enabled,
+            "ready_after_ms": self.ready_after_ms,
+            "steps": self.results,
+        }
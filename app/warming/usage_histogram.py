@@ -0,0 +1,95 @@
+"""
+Histogramm der Nutzungszeiten pro Intent, Wochentag und Stunde (lokale Zeit),
+gelernt aus dem aufgenommenen Traffic (`RECORD_TRAFFIC_PATH`).
+"""
+import json
+import logging
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (Wochentag 0=Montag, Stunde)
+Slot = Tuple[int, int]
+
+# Zeilenanfang einer Aufnahme (`Recording.to_record`: `recorded_at` und `payload` zuerst)
+_RECORD_PREFIX = re.compile(r'\{"recorded_at": "([^"]*)", "payload": ')
+_decoder = json.JSONDecoder()
+
+
+def read_intent_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Liest pro Aufnahme nur `recorded_at` und den Alexa Request. HA-Contexts und LLM-Payloads
+    dahinter werden nicht geparst (`raw_decode` hört nach dem Payload auf), die Datei wird gestreamt.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                match = _RECORD_PREFIX.match(line)
+                if match:
+                    payload, _ = _decoder.raw_decode(line, match.end())
+                    yield {"recorded_at": match.group(1), "payload": payload}
+                elif line.strip():
+                    yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def _intent_name(payload: Dict[str, Any]) -> Optional[str]:
+    return payload.get("request", {}).get("intent", {}).get("name")
+
+
+class UsageHistogram:
+    def __init__(self):
+        self.counts: Dict[str, Counter] = {}
+
+    def observe(self, intent_name: str, when: datetime) -> None:
+        local = when.astimezone() if when.tzinfo else when
+        self.counts.setdefault(intent_name, Counter())[(local.weekday(), local.hour)] += 1
+
+    def learn(self, records: Iterable[Dict[str, Any]]) -> int:
+        learned = 0
+        for record in records:
+            intent_name = _intent_name(record.get("payload", {}))
+            try:
+                when = datetime.fromisoformat(record["recorded_at"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if intent_name:
+                self.observe(intent_name, when)
+                learned += 1
+        return learned
+
+    @classmethod
+    def from_recordings(cls, path: Optional[str]) -> "UsageHistogram":
+        histogram = cls()
+        if path and os.path.exists(path):
+            learned = histogram.learn(read_intent_records(path))
+            logger.info(f"Nutzungszeiten aus {learned} aufgenommenen Requests gelernt")
+        return histogram
+
+    def hot_slots(self, min_requests: int, max_hours_per_day: int) -> Dict[str, Set[Slot]]:
+        """
+        Nutzungszeiten pro Intent: Stunden mit mindestens `min_requests` Requests,
+        pro Wochentag über alle Intents höchstens `max_hours_per_day` (die häufigsten).
+        """
+        candidates: List[Tuple[int, str, Slot]] = [
+            (count, intent_name, slot)
+            for intent_name, counter in self.counts.items()
+            for slot, count in counter.items()
+            if count >= min_requests
+        ]
+        candidates.sort(key=lambda c: c[0], reverse=True)
+
+        hours_per_day: Dict[int, Set[int]] = {}
+        hot: Dict[str, Set[Slot]] = {}
+        for _, intent_name, (weekday, hour) in candidates:
+            hours = hours_per_day.setdefault(weekday, set())
+            if hour not in hours and len(hours) >= max_hours_per_day:
+                continue
+            hours.add(hour)
+            hot.setdefault(intent_name, set()).add((weekday, hour))
+        return hot
@@ -0,0 +1,113 @@
+import sys
+import os
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from category_handler.advice_cache import AdviceCache, energy_fingerprint
+from category_handler.advice_handler import AdviceHandler
+from category_handler.advice_precompute import AdvicePrecomputer
+
+
+def make_context(netz_saldo_watt):
+    return {
+        "energy_context": {"netz_saldo_watt": netz_saldo_watt, "batterie_haus_prozent": 80.0},
+        "energy_history": {},
+    }
+
+
+class TestAdvicePrecompute(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = AdviceCache(max_age_seconds=300, recompute_after_seconds=3600)
+        self.mock_ha_service = AsyncMock()
+        self.mock_ha_service.get_smart_home_context.return_value = make_context(-2500.0)
+
+        self.mock_client_instance = MagicMock()
+        self.mock_client_instance.models.generate_content.return_value.text = "Ja, mach an!"
+        self.mock_client_instance.models.generate_content.return_value.candidates = []
+
+        self.client_patcher = patch("category_handler.advice_handler.get_client", return_value=self.mock_client_instance)
+        self.client_patcher.start()
+        self.cache_patcher = patch("category_handler.advice_handler.advice_cache", self.cache)
+        self.cache_patcher.start()
+
+        self.precomputer = AdvicePrecomputer(
+            ha_service_factory=lambda: self.mock_ha_service,
+            interval_seconds=60,
+            devices=["Waschmaschine", "Auto"],
+            cache=self.cache,
+        )
+
+    def tearDown(self):
+        self.client_patcher.stop()
+        self.cache_patcher.stop()
+
+    def test_fingerprint_ignores_small_changes(self):
+        """Kleine Schwankungen ändern den Abdruck nicht, große schon."""
+        self.assertEqual(
+            energy_fingerprint(make_context(-2500.0)["energy_context"]),
+            energy_fingerprint(make_context(-2450.0)["energy_context"]),
+        )
+        self.assertNotEqual(
+            energy_fingerprint(make_context(-2500.0)["energy_context"]),
+            energy_fingerprint(make_context(300.0)["energy_context"]),
+        )
+
+    async def test_refresh_computes_all_devices_once(self):
+        """Erster Lauf berechnet alle Geräte, unveränderte Sensoren lösen nichts aus."""
+        self.assertEqual(await self.precomputer.refresh_once(), ["Waschmaschine", "Auto"])
+        self.assertEqual(await self.precomputer.refresh_once(), [])
+        self.assertEqual(self.mock_client_instance.models.generate_content.call_count, 2)
+
+        self.mock_ha_service.get_smart_home_context.return_value = make_context(800.0)
+        self.assertEqual(await self.precomputer.refresh_once(), ["Waschmaschine", "Auto"])
+
+    async def test_handler_returns_precomputed_answer(self):
+        """Handler antwortet aus dem Cache, ohne HA oder LLM zu fragen."""
+        await self.precomputer.refresh_once()
+        self.mock_ha_service.reset_mock()
+        self.mock_client_instance.models.generate_content.reset_mock()
+
+        result = await AdviceHandler().execute(["waschmaschine"], self.mock_ha_service)
+
+        self.assertEqual(result.text, "Ja, mach an!")
+        self.mock_ha_service.get_smart_home_context.assert_not_called()
+        self.mock_client_instance.models.generate_content.assert_not_called()
+
+    async def test_handler_recomputes_when_stale(self):
+        """Veraltete Antwort -> synchrone Neuberechnung."""
+        stale_cache = AdviceCache(max_age_seconds=0, recompute_after_seconds=3600)
+        with patch("category_handler.advice_handler.advice_cache", stale_cache):
+            result = await AdviceHandler().execute(["Auto"], self.mock_ha_service)
+
+        self.assertEqual(result.text, "Ja, mach an!")
+        self.mock_client_instance.models.generate_content.assert_called_once()
+
+    async def test_free_text_bypasses_and_never_overwrites_slot_entry(self):
+        """Freitext mit Gerätename geht ans LLM und überschreibt die Antwort für den Slot-Wert nicht."""
+        await self.precomputer.refresh_once()
+        self.mock_client_instance.models.generate_content.reset_mock()
+        self.mock_client_instance.models.generate_content.return_value.text = "Morgen um 8 scheint die Sonne."
+
+        result = await AdviceHandler().execute(["Waschmaschine morgen um 8?"], self.mock_ha_service)
+        self.assertEqual(result.text, "Morgen um 8 scheint die Sonne.")
+        self.mock_client_instance.models.generate_content.assert_called_once()
+
+        async def fake_stream(model, contents, config=None):
+            yield "Nachts ist es günstig."
+
+        with patch("category_handler.advice_handler.stream_text", fake_stream):
+            chunks = [c async for c in AdviceHandler().stream(["Auto heute Nacht?"], self.mock_ha_service)]
+        self.assertEqual(chunks, ["Nachts ist es günstig."])
+
+        self.assertEqual(self.cache.get_fresh("Waschmaschine"), "Ja, mach an!")
+        self.assertEqual(self.cache.get_fresh("Auto"), "Ja, mach an!")
+        self.assertIsNone(self.cache.get_fresh("Waschmaschine morgen um 8?"))
+        self.assertEqual(len(self.cache._entries), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+import sys
+import os
+import base64
+import json
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+import main
+from alexa_auth.signature import AlexaSignatureVerifier, SignatureVerificationError
+from const import ALEXA_ACCESS_TOKEN
+
+CERT_URL = "https://s3.amazonaws.com/echo.api/echo-api-cert.pem"
+
+
+def _name(common_name):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def _cert(subject, issuer, public_key, signing_key, ca, not_after, san=None):
+    now = datetime.now(timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(_name(issuer))
+        .public_key(public_key)
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(not_after)
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(signing_key.public_key()), critical=False)
+    )
+    if ca:
+        builder = builder.add_extension(
+            x509.KeyUsage(False, False, False, False, False, True, True, False, False), critical=True
+        )
+    else:
+        builder = builder.add_extension(
+            x509.KeyUsage(True, False, True, False, False, False, False, False, False), critical=True
+        ).add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+    if san:
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName(san)]), critical=False)
+    return builder.sign(signing_key, hashes.SHA256())
+
+
+def make_chain(san="echo-api.amazon.com", leaf_days=30):
+    """Lokale Test-PKI: Root -> Leaf (wie die Alexa-Kette, nur selbst signiert)."""
+    root_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    leaf_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    root = _cert("Test Root", "Test Root", root_key.public_key(), root_key, True, datetime.now(timezone.utc) + timedelta(days=365))
+    leaf = _cert(
+        "echo-api.amazon.com", "Test Root", leaf_key.public_key(), root_key, False,
+        datetime.now(timezone.utc) + timedelta(days=leaf_days), san=san,
+    )
+    return root, leaf.public_bytes(serialization.Encoding.PEM), leaf_key
+
+
+def sign(key, body):
+    return base64.b64encode(key.sign(body, padding.PKCS1v15(), hashes.SHA256())).decode()
+
+
+def alexa_body(timestamp=None):
+    timestamp = timestamp or datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return json.dumps({"version": "1.0", "request": {"type": "LaunchRequest", "timestamp": timestamp}}).encode()
+
+
+class TestAlexaSignatureVerifier(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.root, self.pem, self.leaf_key = make_chain()
+        self.downloads = 0
+
+        async def fetch_pem(url):
+            self.downloads += 1
+            return self.pem
+
+        self.verifier = AlexaSignatureVerifier(trusted_roots=[self.root], fetch_pem=fetch_pem)
+
+    def headers(self, body):
+        return {"signaturecertchainurl": CERT_URL, "signature-256": sign(self.leaf_key, body)}
+
+    async def _verify(self, body, headers=None):
+        timestamp = json.loads(body)["request"]["timestamp"]
+        await self.verifier.verify(headers or self.headers(body), body, timestamp)
+
+    async def test_valid_request_downloads_chain_once(self):
+        for _ in range(3):
+            await self._verify(alexa_body())
+        self.assertEqual(self.downloads, 1)
+
+    async def test_cached_verification_is_fast(self):
+        body = alexa_body()
+        headers = self.headers(body)
+        await self._verify(body, headers)
+
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            await self._verify(body, headers)
+        per_request_ms = (time.perf_counter() - start) * 1000 / runs
+
+        self.assertLess(per_request_ms, 1.0)
+
+    async def test_rejects_tampered_body(self):
+        body = alexa_body()
+        headers = self.headers(body)
+        with self.assertRaises(SignatureVerificationError):
+            await self._verify(body.replace(b"LaunchRequest", b"IntentRequest"), headers)
+
+    async def test_rejects_old_timestamp(self):
+        old = (datetime.now(timezone.utc) - timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        with self.assertRaises(SignatureVerificationError):
+            await self._verify(alexa_body(old))
+
+    async def test_rejects_untrusted_chain_and_wrong_san(self):
+        _, other_pem, other_key = make_chain()
+        self.pem = other_pem
+        body = alexa_body()
+        with self.assertRaises(SignatureVerificationError):
+            await self._verify(body, {"signaturecertchainurl": CERT_URL, "signature-256": sign(other_key, body)})
+
+        self.root, self.pem, self.leaf_key = make_chain(san="evil.example.com")
+        self.verifier = AlexaSignatureVerifier(trusted_roots=[self.root], fetch_pem=self.verifier._fetch_pem)
+        with self.assertRaises(SignatureVerificationError):
+            await self._verify(alexa_body())
+
+    async def test_expired_cache_entry_is_refetched(self):
+        await self._verify(alexa_body())
+        self.verifier._certs[CERT_URL].not_after = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await self._verify(alexa_body())
+        self.assertEqual(self.downloads, 2)
+
+    async def test_rejects_foreign_cert_urls(self):
+        body = alexa_body()
+        for url in [
+            "http://s3.amazonaws.com/echo.api/echo-api-cert.pem",
+            "https://notamazon.com/echo.api/echo-api-cert.pem",
+            "https://s3.amazonaws.com/EcHo.aPi/echo-api-cert.pem",
+            "https://s3.amazonaws.com/echo.api/../invalid.pem",
+            "https://s3.amazonaws.com:563/echo.api/echo-api-cert.pem",
+        ]:
+            with self.assertRaises(SignatureVerificationError, msg=url):
+                await self._verify(body, {"signaturecertchainurl": url, "signature-256": sign(self.leaf_key, body)})
+        self.assertEqual(self.downloads, 0)
+
+    async def test_download_error_is_rejected_and_not_retried_immediately(self):
+        self.now = 0.0
+
+        async def unreachable(url):
+            self.downloads += 1
+            raise httpx.ConnectError("unreachable")
+
+        self.verifier = AlexaSignatureVerifier(trusted_roots=[self.root], fetch_pem=unreachable, clock=lambda: self.now)
+        for _ in range(3):
+            with self.assertRaises(SignatureVerificationError):
+                await self._verify(alexa_body())
+        self.assertEqual(self.downloads, 1)
+
+        self.now = 61.0  # nach der Sperrzeit wird neu geladen
+        with self.assertRaises(SignatureVerificationError):
+            await self._verify(alexa_body())
+        self.assertEqual(self.downloads, 2)
+
+    async def test_invalid_pem_is_rejected(self):
+        for pem in [b"kein Zertifikat", b""]:
+            self.pem = pem
+            self.verifier.clear()
+            with self.assertRaises(SignatureVerificationError, msg=pem):
+                await self._verify(alexa_body())
+
+    async def test_webhook_answers_400_when_chain_cannot_be_loaded(self):
+        async def not_found(url):
+            request = httpx.Request("GET", url)
+            httpx.Response(404, request=request).raise_for_status()
+
+        verifier = AlexaSignatureVerifier(trusted_roots=[self.root], fetch_pem=not_found)
+        with patch.object(main, "ALEXA_VERIFY_SIGNATURE", True), patch.object(main, "alexa_signature_verifier", verifier):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+                body = alexa_body()
+                resp = await http_client.post(
+                    "/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, content=body, headers=self.headers(body)
+                )
+
+        self.assertEqual(resp.status_code, 400)
+
+    async def test_webhook_rejects_unsigned_request(self):
+        with patch.object(main, "ALEXA_VERIFY_SIGNATURE", True), patch.object(main, "alexa_signature_verifier", self.verifier):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+                body = alexa_body()
+                unsigned = await http_client.post("/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, content=body)
+                signed = await http_client.post(
+                    "/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, content=body, headers=self.headers(body)
+                )
+
+        self.assertEqual(unsigned.status_code, 400)
+        self.assertEqual(signed.json()["response"]["outputSpeech"]["text"], "Hallo! Ich bin bereit.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import sys
+import os
+import json
+import unittest
+from unittest.mock import patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import ha_service.main as ha_main
+from ha_service.entities import Entity, as_entities, build_entities
+from ha_service.leave_home_view import leave_home_view
+from ha_service.main import CONTROLLABLE_DOMAINS, SENSOR_DOMAINS, HaService, TtlCache
+from helper_scripts.fake_backends import BackgroundServer, create_fake_ha_app
+from serialization.fast_json import dumps
+from serialization.fragment_cache import FragmentCache
+
+
+def states():
+    # Strings wie aus `response.json()`: jede Zeile mit eigenen Objekten
+    return json.loads(json.dumps([
+        {"entity_id": "sensor.power_2", "state": "1200.5", "attributes": {"friendly_name": "Leistung", "device_class": "power", "unit_of_measurement": "W"}},
+        {"entity_id": "sensor.power_5", "state": "80", "attributes": {"friendly_name": "Kühlschrank", "device_class": "power"}},
+        {"entity_id": "light.flur", "state": "on", "attributes": {"friendly_name": "Licht Flur", "brightness": 180}},
+        {"entity_id": "light.bad", "state": "unavailable", "attributes": {"friendly_name": "Licht Bad"}},
+        {"entity_id": "binary_sensor.fenster", "state": "off", "attributes": {"device_class": "window"}},
+    ]))
+
+
+AREAS = {"sensor.power_2": "Keller", "sensor.power_5": "Keller", "light.flur": "Flur"}
+
+
+class TestEntities(unittest.TestCase):
+
+    def test_build_parses_numbers_and_interns_repeated_strings(self):
+        power, kuehlschrank, flur, bad, fenster = build_entities(states(), json.loads(json.dumps(AREAS)))
+
+        self.assertEqual((power.value, power.state), (1200.5, "1200.5"))
+        self.assertEqual((flur.value, flur.state, flur.domain), (None, "on", "light"))
+        self.assertIs(power.device_class, kuehlschrank.device_class)
+        self.assertIs(power.area, kuehlschrank.area)
+        self.assertIs(power.domain, kuehlschrank.domain)
+        # Ohne Geräteklasse/Namen wie bisher die Entity-ID, ohne Bereich None
+        self.assertEqual(flur.device_class, "light.flur")
+        self.assertEqual(fenster.name, "binary_sensor.fenster")
+        self.assertIsNone(fenster.area)
+        self.assertFalse(hasattr(flur, "__dict__"))
+
+    def test_filter_skips_unavailable_and_other_domains(self):
+        entities = build_entities(states(), AREAS)
+        service = HaService()
+
+        devices = service.filter_entities(entities, CONTROLLABLE_DOMAINS, ["Update"])
+        sensors = service.filter_entities(entities, SENSOR_DOMAINS, ["Kühlschrank"])
+
+        self.assertEqual([e.eid for e in devices], ["light.flur"])
+        self.assertEqual([e.eid for e in sensors], ["sensor.power_2", "binary_sensor.fenster"])
+
+    def test_serializes_to_the_previous_dict_format_only_at_the_edges(self):
+        flur = build_entities(states(), AREAS)[2]
+        expected = {"eid": "light.flur", "name": "Licht Flur", "area": "Flur", "state": "on", "device_class": "light.flur"}
+
+        self.assertEqual(list(flur.to_dict()), list(expected))
+        self.assertEqual(json.loads(dumps([flur])), [expected])
+        self.assertEqual(json.loads(json.dumps([flur], default=lambda o: o.to_dict())), [expected])
+
+    def test_as_entities_converts_dicts_and_keeps_records(self):
+        flur = build_entities(states(), AREAS)[2]
+
+        converted = as_entities([flur, flur.to_dict()])
+
+        self.assertIs(converted[0], flur)
+        self.assertEqual(converted[1], flur)
+
+    def test_fragment_cache_hits_for_rebuilt_entities(self):
+        cache = FragmentCache()
+
+        first = cache.fragment(build_entities(states(), AREAS))
+        second = cache.fragment(build_entities(states(), AREAS))
+
+        self.assertIs(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+class TestHaServiceEntities(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncTearDown(self):
+        await ha_main.close_http_client()
+        leave_home_view.clear()
+
+    async def test_context_holds_entities_and_parsed_energy_values(self):
+        server = BackgroundServer(create_fake_ha_app(entity_count=30, latency_ms=0))
+        url = server.start()
+        try:
+            service = HaService()
+            service.base_url, service.token = url, "test"
+            with patch.object(ha_main, "context_cache", TtlCache(0)), patch.object(ha_main, "history_cache", TtlCache(0)):
+                ctx = await service.get_smart_home_context()
+        finally:
+            server.stop()
+
+        self.assertTrue(ctx["controllable_devices"])
+        self.assertTrue(all(isinstance(e, Entity) for e in ctx["controllable_devices"] + ctx["sensors"]))
+        self.assertEqual(ctx["energy_context"]["haus_power"], 450.0)
+        self.assertEqual(ctx["energy_history"]["Wallbox"][0], 1000.0)
+        self.assertEqual(json.loads(dumps(ctx["sensors"]))[0]["eid"], ctx["sensors"][0].eid)
+
+
+if __name__ == "__main__":
+    unittest.main()
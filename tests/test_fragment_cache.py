@@ -0,0 +1,85 @@
+import sys
+import os
+import copy
+import json
+import unittest
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from serialization.fast_json import FastJSONResponse, dumps
+from serialization.fragment_cache import FragmentCache
+
+DEVICES = [
+    {"eid": "light.kueche", "name": "Licht Küche", "area": "Küche", "state": "on", "device_class": "light"},
+    {"eid": "light.bad", "name": "Licht Bad", "area": "Bad", "state": "off", "device_class": "light"},
+]
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = FragmentCache()
+
+    def test_unchanged_content_is_encoded_once(self):
+        first = self.cache.fragment(DEVICES)
+        second = self.cache.fragment(copy.deepcopy(DEVICES))  # neuer HA-Abruf, gleicher Inhalt
+
+        self.assertIs(first, second)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(json.loads(first), DEVICES)
+
+    def test_changed_state_is_reencoded(self):
+        changed = copy.deepcopy(DEVICES)
+        changed[1]["state"] = "on"
+
+        self.cache.fragment(DEVICES)
+        text = self.cache.fragment(changed)
+
+        self.assertEqual(self.cache.misses, 2)
+        self.assertEqual(json.loads(text)[1]["state"], "on")
+
+    def test_nested_and_unhashable_values(self):
+        history = {"Wallbox": [1.5, None, 2.0]}
+        rows_with_lists = [{"eid": "sensor.a", "values": [1, 2]}]
+
+        self.assertEqual(json.loads(self.cache.fragment(history)), history)
+        self.assertEqual(json.loads(self.cache.fragment(copy.deepcopy(history))), history)
+        self.assertEqual(json.loads(self.cache.fragment(rows_with_lists)), rows_with_lists)
+
+    def test_rows_with_different_schemas_do_not_collide(self):
+        first = [{"eid": "x", "area": "K"}, {"eid": "y", "state": "on"}]
+        second = [{"eid": "x", "area": "K"}, {"eid": "y", "area": "on"}]
+
+        self.assertEqual(json.loads(self.cache.fragment(first)), first)
+        self.assertEqual(json.loads(self.cache.fragment(second)), second)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_bool_int_and_float_do_not_collide(self):
+        for value in [True, 1, 1.0]:
+            self.assertEqual(json.loads(self.cache.fragment({"on": value})), {"on": value})
+            self.assertEqual(self.cache.fragment([{"on": value}]), dumps([{"on": value}]))
+        self.assertEqual(self.cache.fragment([[0, 1]]), "[[0,1]]")
+        self.assertEqual(self.cache.fragment([{"0": 1}]), '[{"0":1}]')
+        self.assertEqual(self.cache.misses, 8)
+
+    def test_lru_bound(self):
+        cache = FragmentCache(max_entries=2)
+        for i in range(5):
+            cache.fragment({"n": i})
+        self.assertEqual(len(cache._by_content), 2)
+        self.assertEqual(len(cache._by_id), 2)
+
+
+class TestFastJson(unittest.TestCase):
+
+    def test_compact_utf8(self):
+        self.assertEqual(dumps({"name": "Küche", "w": [1, 2.5]}), '{"name":"Küche","w":[1,2.5]}')
+
+    def test_response_render(self):
+        body = FastJSONResponse({"text": "Schönen Tag!"}).body
+        self.assertEqual(json.loads(body), {"text": "Schönen Tag!"})
+
+
+if __name__ == "__main__":
+    unittest.main()
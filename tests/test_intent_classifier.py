@@ -0,0 +1,71 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from const import Category
+from intent_classifier.classifier import get_local_classifier, load_training_samples
+from intent_classifier.router import classification_stats, classify_intent
+
+
+class TestLocalIntentClassifier(unittest.TestCase):
+
+    def test_training_samples_from_alexa_model(self):
+        """Slot-Platzhalter werden mit den Slot-Werten expandiert."""
+        texts = [text for text, _, _ in load_training_samples()]
+        self.assertIn("lohnt sich Waschmaschine", texts)
+        self.assertNotIn("lohnt sich {device}", texts)
+
+    def test_confident_examples(self):
+        examples = {
+            "Mach das Licht im Wohnzimmer aus": Category.CONTROL,
+            "Lohnt sich Waschmaschine jetzt?": Category.ADVICE,
+            "Wann soll ich das Auto laden?": Category.ADVICE,
+            "Wie warm ist es im Bad?": Category.INFO,
+            "Sind Fenster offen?": Category.INFO,
+            "Wir verlassen das Haus": Category.LEAVE_HOME,
+        }
+        classifier = get_local_classifier()
+        for text, expected in examples.items():
+            with self.subTest(text=text):
+                result = classifier.predict(text)
+                self.assertEqual(result.category, expected)
+                self.assertGreaterEqual(result.confidence, 0.75)
+
+    def test_no_evidence_has_zero_confidence(self):
+        self.assertEqual(get_local_classifier().predict("Xylophon").confidence, 0.0)
+
+
+class TestClassifyIntent(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_client_instance = MagicMock()
+        self.client_patcher = patch("intent_classifier.router.get_client", return_value=self.mock_client_instance)
+        self.client_patcher.start()
+
+    def tearDown(self):
+        self.client_patcher.stop()
+
+    async def test_confident_local_skips_llm(self):
+        self.assertEqual(await classify_intent("Lohnt sich Waschmaschine?"), Category.ADVICE)
+        self.mock_client_instance.models.generate_content.assert_not_called()
+
+    async def test_low_confidence_asks_llm(self):
+        self.mock_client_instance.models.generate_content.return_value.text = '{"intent": "CONTROL"}'
+        decisions_before = classification_stats.llm_decisions
+
+        self.assertEqual(await classify_intent("Xylophon"), Category.CONTROL)
+        self.mock_client_instance.models.generate_content.assert_called_once()
+        self.assertEqual(classification_stats.llm_decisions, decisions_before + 1)
+
+    async def test_llm_failure_returns_local_category(self):
+        """Kein "FOO" mehr: Auch bei kaputter LLM-Antwort kommt eine Category zurück."""
+        self.mock_client_instance.models.generate_content.return_value.text = '{"intent": "FOO"}'
+        self.assertIsInstance(await classify_intent("Xylophon"), Category)
+
+
+if __name__ == "__main__":
+    unittest.main()
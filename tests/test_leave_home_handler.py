@@ -7,21 +7,6 @@ from unittest.mock import AsyncMock, MagicMock, patch
 # 1. Pfad Setup
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
 
-# 2. Pre-Import Mocking
-mock_const_module = MagicMock()
-mock_const_module.tools_schema = [{"name": "dummy_tool"}]
-class MockCategory:
-    LEAVE_HOME = MagicMock()
-    LEAVE_HOME.value = "LEAVE_HOME"
-mock_const_module.Category = MockCategory
-
-sys.modules["const"] = mock_const_module
-
-mock_genai_pkg = MagicMock()
-sys.modules["genai_client"] = mock_genai_pkg
-mock_genai_client_module = MagicMock()
-sys.modules["genai_client.client"] = mock_genai_client_module
-
 # Import Handler
 try:
     from category_handler.leave_home_handler import LeaveHomeHandler
@@ -51,7 +36,7 @@ class TestLeaveHomeHandler(unittest.IsolatedAsyncioTestCase):
             "sensors": []
         }
 
-        handler = LeaveHomeHandler()
+        handler = LeaveHomeHandler(use_llm_phrasing=True)
         # Optional: Info Logs unterdrücken oder prüfen, hier lassen wir sie zu Debug-Zwecken
         result = await handler.execute([], self.mock_ha_service)
 
@@ -85,7 +70,7 @@ class TestLeaveHomeHandler(unittest.IsolatedAsyncioTestCase):
             ]
         }
 
-        handler = LeaveHomeHandler()
+        handler = LeaveHomeHandler(use_llm_phrasing=True)
         await handler.execute([], self.mock_ha_service)
         
         call_args = self.mock_client_instance.models.generate_content.call_args
@@ -103,7 +88,7 @@ class TestLeaveHomeHandler(unittest.IsolatedAsyncioTestCase):
             ]
         }
 
-        handler = LeaveHomeHandler()
+        handler = LeaveHomeHandler(use_llm_phrasing=True)
         await handler.execute([], self.mock_ha_service)
         
         call_args = self.mock_client_instance.models.generate_content.call_args
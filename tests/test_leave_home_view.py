@@ -0,0 +1,80 @@
+import sys
+import os
+import unittest
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from category_handler.home_status import is_high_consumer, leave_home_summary
+from ha_service.entities import Entity
+from ha_service.leave_home_view import LeaveHomeView
+
+
+def light(eid, state="on", area="Wohnzimmer"):
+    return Entity(eid, eid, area, state, "light")
+
+
+def sensor(eid, state, device_class, area="Keller"):
+    return Entity(eid, eid, area, state, device_class)
+
+
+class TestLeaveHomeView(unittest.TestCase):
+
+    def setUp(self):
+        self.view = LeaveHomeView()
+        self.devices = [light("light.wohnzimmer"), light("light.flur", state="off"), light("light.bad")]
+        self.sensors = [
+            sensor("binary_sensor.fenster_gast", "on", "window", area="Gast"),
+            sensor("binary_sensor.tuer", "off", "door"),
+            sensor("sensor.waschmaschine", "1200", "power"),
+            sensor("sensor.waermepumpe", "2500", "power", area="Wärmepumpe"),
+            sensor("sensor.kuehlschrank", "80", "power"),
+        ]
+
+    def test_summary_matches_full_scan(self):
+        summary = self.view.refresh(self.devices, self.sensors)
+
+        expected = leave_home_summary({"controllable_devices": self.devices, "sensors": self.sensors})
+        self.assertEqual(summary, expected)
+        self.assertEqual([e["eid"] for e in summary["lights"]], ["light.wohnzimmer", "light.bad"])
+        self.assertEqual([e["eid"] for e in summary["consumers"]], ["sensor.waschmaschine"])
+
+    def test_only_changed_entities_are_reevaluated(self):
+        first = self.view.refresh(self.devices, self.sensors)
+        changed_before = self.view.changed_entities
+
+        # Unverändert -> gleiche Zusammenfassung, kein Prädikat neu geprüft
+        self.assertIs(self.view.refresh(self.devices, self.sensors), first)
+        self.assertEqual(self.view.changed_entities, changed_before)
+
+        self.devices[0] = light("light.wohnzimmer", state="off")
+        self.sensors[1] = sensor("binary_sensor.tuer", "on", "door")
+        summary = self.view.refresh(self.devices, self.sensors)
+
+        self.assertEqual(self.view.changed_entities, changed_before + 2)
+        self.assertEqual([e["eid"] for e in summary["lights"]], ["light.bad"])
+        self.assertIn("binary_sensor.tuer", [e["eid"] for e in summary["openings"]])
+        # Ältere Zusammenfassung (z.B. im Context Cache) bleibt unverändert
+        self.assertEqual(len(first["lights"]), 2)
+
+    def test_disappeared_entities_leave_the_sets(self):
+        self.view.refresh(self.devices, self.sensors)
+
+        summary = self.view.refresh(self.devices[1:], self.sensors[1:])
+
+        self.assertEqual([e["eid"] for e in summary["lights"]], ["light.bad"])
+        self.assertEqual(summary["openings"], [])
+        self.assertEqual(self.view.snapshot()["entities"], 6)
+
+    def test_threshold_and_excluded_areas_are_configurable(self):
+        kuehlschrank = sensor("sensor.kuehlschrank", "80", "power")
+        waermepumpe = sensor("sensor.waermepumpe", "2500", "power", area="Wärmepumpe")
+
+        self.assertFalse(is_high_consumer(kuehlschrank))
+        self.assertTrue(is_high_consumer(kuehlschrank, threshold_watt=50))
+        self.assertFalse(is_high_consumer(waermepumpe))
+        self.assertTrue(is_high_consumer(waermepumpe, excluded_areas=[]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from category_handler import control_handler
+from category_handler.control_handler import ControlHandler
+from genai_client.hedging import CircuitBreaker, HedgingPolicy
+from genai_client.scheduler import LlmScheduler
+from genai_client.usage import UsageTracker, UsageTrackingClient
+
+PRIMARY = "gemini-flash-lite-latest"
+SECONDARY = "gemini-2.5-flash-lite"
+
+
+class ScriptedLatencyClient:
+    """
+    Fake Gemini Client: pro Modell eine Liste von Latenzen (Sekunden) für die aufeinanderfolgenden Calls.
+    Ein Eintrag `None` wirft einen Fehler, eine Exception wird geworfen. Abgebrochene Calls schlafen bis `close()` nicht weiter.
+    """
+
+    def __init__(self, script):
+        self.script = {model: list(latencies) for model, latencies in script.items()}
+        self.calls = []
+        self._closed = threading.Event()
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, *, model, contents, config=None):
+        self.calls.append(model)
+        latency = self.script[model].pop(0) if self.script[model] else 0.0
+        if latency is None:
+            raise RuntimeError(f"{model} nicht verfügbar")
+        if isinstance(latency, Exception):
+            raise latency
+        self._closed.wait(latency)
+        return SimpleNamespace(text=f"Antwort von {model}", candidates=[])
+
+    def close(self):
+        self._closed.set()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_and_half_opens_after_cooldown(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=30, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertFalse(breaker.available)
+
+        now[0] = 31.0
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        breaker.record_failure()  # Probe-Call fehlgeschlagen -> wieder offen
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        now[0] = 62.0
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_lets_only_one_probe_through(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=30, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 31.0
+
+        self.assertTrue(breaker.start_probe())
+        self.assertFalse(breaker.available)
+        self.assertFalse(breaker.start_probe())
+
+        breaker.release_probe()  # Probe abgebrochen -> nächster Call darf proben
+        self.assertTrue(breaker.available)
+
+
+class TestHedgingPolicy(unittest.IsolatedAsyncioTestCase):
+
+    def policy(self, **kwargs):
+        defaults = dict(
+            secondary_model=SECONDARY, default_threshold_ms=100, min_samples=5, timeout_seconds=2,
+            breaker_failures=2, breaker_cooldown_seconds=30, scheduler=LlmScheduler(),
+        )
+        defaults.update(kwargs)
+        return HedgingPolicy(**defaults)
+
+    def client(self, script):
+        client = ScriptedLatencyClient(script)
+        self.addCleanup(client.close)
+        return client
+
+    async def test_fast_primary_is_not_hedged(self):
+        policy = self.policy()
+        client = self.client({PRIMARY: [0.01]})
+
+        response = await policy.generate_content(client, model=PRIMARY, contents="x")
+
+        self.assertEqual(response.text, f"Antwort von {PRIMARY}")
+        self.assertEqual(client.calls, [PRIMARY])
+        self.assertEqual(policy.hedged, 0)
+
+    async def test_slow_primary_is_hedged_and_cancelled(self):
+        policy = self.policy()
+        client = self.client({PRIMARY: [3.0], SECONDARY: [0.02]})
+
+        start = time.perf_counter()
+        response = await policy.generate_content(client, model=PRIMARY, contents="x")
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.text, f"Antwort von {SECONDARY}")
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual((policy.hedged, policy.hedge_wins), (1, 1))
+        self.assertEqual(policy.scheduler.in_flight, 0)  # Slot des Verlierers ist frei
+
+    async def test_threshold_follows_measured_percentile(self):
+        policy = self.policy(percentile=90, default_threshold_ms=5000)
+        client = self.client({PRIMARY: [0.01] * 5 + [0.5], SECONDARY: [0.01]})
+        for _ in range(5):
+            await policy.generate_content(client, model=PRIMARY, contents="x")
+        self.assertLess(policy.hedge_threshold_ms(PRIMARY), 100)
+
+        response = await policy.generate_content(client, model=PRIMARY, contents="x")
+
+        self.assertEqual(response.text, f"Antwort von {SECONDARY}")
+        self.assertEqual(policy.hedged, 1)
+
+    async def test_breaker_routes_around_failing_model(self):
+        policy = self.policy()
+        client = self.client({PRIMARY: [None, None], SECONDARY: [0.01] * 3})
+
+        for _ in range(2):  # schneller Fehler -> Fallback auf das zweite Modell
+            response = await policy.generate_content(client, model=PRIMARY, contents="x")
+            self.assertEqual(response.text, f"Antwort von {SECONDARY}")
+        self.assertEqual(policy.breaker(PRIMARY).state, CircuitBreaker.OPEN)
+
+        await policy.generate_content(client, model=PRIMARY, contents="x")
+
+        self.assertEqual(client.calls, [PRIMARY, SECONDARY, PRIMARY, SECONDARY, SECONDARY])
+        self.assertEqual((policy.fallbacks, policy.rerouted), (2, 1))
+
+    async def test_without_secondary_only_timeout_applies(self):
+        policy = self.policy(secondary_model="", timeout_seconds=0.1)
+        client = self.client({PRIMARY: [1.0]})
+
+        with self.assertRaises(TimeoutError):
+            await policy.generate_content(client, model=PRIMARY, contents="x")
+        self.assertEqual(client.calls, [PRIMARY])
+
+    async def test_queue_wait_neither_hedges_nor_times_out(self):
+        """Wartezeit auf den Scheduler-Slot zählt nicht als langsames oder gestörtes Modell."""
+        policy = self.policy(timeout_seconds=0.2, scheduler=LlmScheduler(max_in_flight=1))
+        client = self.client({PRIMARY: [0.01], SECONDARY: [0.01]})
+        await policy.scheduler.acquire(1)  # Slot belegt, der Call muss warten
+
+        call = asyncio.create_task(policy.generate_content(client, model=PRIMARY, contents="x"))
+        await asyncio.sleep(0.3)
+        self.assertEqual((client.calls, policy.hedged), ([], 0))
+        policy.scheduler.release()
+        response = await call
+
+        self.assertEqual(response.text, f"Antwort von {PRIMARY}")
+        self.assertEqual(client.calls, [PRIMARY])
+        self.assertEqual(policy.breaker(PRIMARY).failures, 0)
+        self.assertLess(policy.latencies[PRIMARY].percentile(50), 100)
+
+    async def test_rate_limit_is_no_breaker_failure(self):
+        policy = self.policy(breaker_failures=1, scheduler=LlmScheduler(max_retries=0))
+        rate_limited = RuntimeError("429 RESOURCE_EXHAUSTED")
+        client = self.client({PRIMARY: [rate_limited], SECONDARY: [rate_limited]})
+
+        with self.assertRaises(RuntimeError):
+            await policy.generate_content(client, model=PRIMARY, contents="x")
+
+        self.assertEqual(client.calls, [PRIMARY, SECONDARY])
+        self.assertEqual(policy.breaker(PRIMARY).state, CircuitBreaker.CLOSED)
+        self.assertEqual(policy.breaker(SECONDARY).state, CircuitBreaker.CLOSED)
+
+    async def test_no_hedge_to_the_same_resolved_model(self):
+        """Budget überschritten: beide Modelle werden zum Budget-Modell -> nur ein Call, Latenz unter dessen Namen."""
+        policy = self.policy()
+        inner = self.client({"budget": [0.3]})
+        tracker = UsageTracker(daily_token_budget=100, budget_model="budget")
+        tracker._today["INFO"] = 500
+
+        response = await policy.generate_content(UsageTrackingClient(inner, tracker), model=PRIMARY, contents="x")
+
+        self.assertEqual(response.text, "Antwort von budget")
+        self.assertEqual((inner.calls, policy.hedged), (["budget"], 0))
+        self.assertEqual(set(policy.latencies), {"budget"})
+
+        client = self.client({SECONDARY: [0.3]})
+        await policy.generate_content(client, model=SECONDARY, contents="x")
+        self.assertEqual((client.calls, policy.hedged), ([SECONDARY], 0))
+
+    async def test_half_open_breaker_probes_with_a_single_call(self):
+        now = [0.0]
+        policy = self.policy(clock=lambda: now[0])
+        policy.breaker(PRIMARY).record_failure()
+        policy.breaker(PRIMARY).record_failure()
+        now[0] = 31.0
+        client = self.client({PRIMARY: [0.05], SECONDARY: [0.01, 0.01]})
+
+        responses = await asyncio.gather(
+            *(policy.generate_content(client, model=PRIMARY, contents="x") for _ in range(3))
+        )
+
+        self.assertEqual(client.calls.count(PRIMARY), 1)
+        self.assertEqual(sorted(r.text for r in responses), sorted([f"Antwort von {PRIMARY}"] + [f"Antwort von {SECONDARY}"] * 2))
+        self.assertEqual(policy.breaker(PRIMARY).state, CircuitBreaker.CLOSED)
+
+    async def test_handler_uses_hedging(self):
+        policy = self.policy()
+        client = self.client({PRIMARY: [3.0], SECONDARY: [0.01]})
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = {"controllable_devices": []}
+
+        with patch.object(control_handler, "get_client", return_value=client), \
+                patch.object(control_handler, "hedging_policy", policy):
+            result = await ControlHandler().execute(["Licht", "an"], ha_service)
+
+        self.assertEqual(result.text, f"Antwort von {SECONDARY}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from google.genai.errors import ClientError
+
+from genai_client.scheduler import LlmScheduler, Priority, TokenBucket, llm_priority
+
+RATE_LIMITED = {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "details": [{"retryDelay": "0.01s"}]}}
+
+
+class ScriptedClient:
+    """Sync `generate_content`, der der Reihe nach Fehler wirft oder antwortet und die Aufrufe mitschreibt."""
+
+    def __init__(self, failures=0, latency_seconds=0.0, gate=None):
+        self.failures = failures
+        self.latency_seconds = latency_seconds
+        self.gate = gate
+        self.calls = []
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, *, model, contents, config=None):
+        self.calls.append(contents)
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.latency_seconds)
+        if self.failures:
+            self.failures -= 1
+            raise ClientError(429, RATE_LIMITED)
+        return SimpleNamespace(text=f"ok: {contents}", usage_metadata=None)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_refills_per_minute(self):
+        now = [0.0]
+        bucket = TokenBucket(60, clock=lambda: now[0])
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        now[0] = 30.0
+        self.assertEqual(bucket.wait_time(30), 0.0)
+        # Mehr als die Kapazität wartet nur auf einen vollen Bucket
+        self.assertAlmostEqual(bucket.wait_time(500), 30.0)
+
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        bucket.take(10_000)
+        self.assertEqual(bucket.wait_time(10_000), 0.0)
+
+
+class TestLlmScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_voice_overtakes_queued_background(self):
+        scheduler = LlmScheduler(max_in_flight=1)
+        gate = threading.Event()
+        client = ScriptedClient(gate=gate)
+
+        def call(contents, priority):
+            return asyncio.create_task(scheduler.generate_content(client, model="m", contents=contents, priority=priority))
+
+        running = call("vorberechnung-1", Priority.BACKGROUND)
+        await asyncio.sleep(0.05)
+        with llm_priority(Priority.BACKGROUND):
+            background = asyncio.create_task(scheduler.generate_content(client, model="m", contents="vorberechnung-2"))
+        await asyncio.sleep(0)
+        voice = call("licht aus", Priority.VOICE)
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.snapshot()["queued"], 2)
+
+        gate.set()
+        await asyncio.gather(running, background, voice)
+
+        self.assertEqual(client.calls, ["vorberechnung-1", "licht aus", "vorberechnung-2"])
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(scheduler.snapshot()["queue_wait"]["VOICE"]["count"], 1)
+
+    async def test_max_in_flight(self):
+        scheduler = LlmScheduler(max_in_flight=2)
+        client = ScriptedClient(latency_seconds=0.05)
+        peak = 0
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, scheduler.in_flight)
+                await asyncio.sleep(0.005)
+
+        watcher = asyncio.create_task(watch())
+        await asyncio.gather(*(scheduler.generate_content(client, model="m", contents=str(i)) for i in range(6)))
+        watcher.cancel()
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(len(client.calls), 6)
+
+    async def test_tpm_bucket_delays_large_prompts(self):
+        # 600 Tokens pro Minute = 10 pro Sekunde; zwei Prompts mit je ~301 Tokens
+        scheduler = LlmScheduler(tpm_limit=600)
+        client = ScriptedClient()
+        prompt = "x" * 1200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(scheduler.generate_content(client, model="m", contents=prompt) for _ in range(2)))
+        elapsed = time.perf_counter() - start
+
+        self.assertGreaterEqual(elapsed, 0.15)
+        self.assertGreater(scheduler.snapshot()["queue_wait"]["INTERACTIVE"]["wait_ms_max"], 150)
+
+    async def test_retries_429_with_backoff(self):
+        scheduler = LlmScheduler(max_retries=3, retry_base_seconds=0.01)
+        client = ScriptedClient(failures=2)
+
+        response = await scheduler.generate_content(client, model="m", contents="status")
+
+        self.assertEqual(response.text, "ok: status")
+        self.assertEqual((scheduler.rate_limited, scheduler.retries), (2, 2))
+        self.assertEqual(scheduler.in_flight, 0)
+
+    async def test_gives_up_after_max_retries(self):
+        scheduler = LlmScheduler(max_retries=1, retry_base_seconds=0.01)
+        client = ScriptedClient(failures=5)
+
+        with self.assertRaises(ClientError):
+            await scheduler.generate_content(client, model="m", contents="status")
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    async def test_other_errors_are_not_retried(self):
+        scheduler = LlmScheduler(retry_base_seconds=0.01)
+        client = SimpleNamespace(models=SimpleNamespace(generate_content=lambda **kw: 1 / 0))
+
+        with self.assertRaises(ZeroDivisionError):
+            await scheduler.generate_content(client, model="m", contents="status")
+        self.assertEqual(scheduler.retries, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
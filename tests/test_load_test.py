@@ -0,0 +1,43 @@
+import sys
+import os
+import unittest
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from helper_scripts.load_test import parse_mix, run_load_test, saturation_point
+
+
+def stage(concurrency, rps, p95=100.0, error_rate=0.0):
+    return {"concurrency": concurrency, "throughput_rps": rps, "p95_ms": p95, "error_rate": error_rate}
+
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stage_against_fake_backends(self):
+        """Kurze Stufe gegen Fake-HA/-Gemini: alle Intents laufen fehlerfrei durch."""
+        stages = await run_load_test(
+            [2], stage_seconds=0.5, mix=parse_mix("leave=1,advice=1,status=1,control=1"),
+            entity_count=30, ha_latency_ms=0, llm_latency_ms=10,
+        )
+
+        self.assertEqual(len(stages), 1)
+        self.assertGreater(stages[0]["requests"], 0)
+        self.assertEqual(stages[0]["error_rate"], 0.0)
+        self.assertGreaterEqual(stages[0]["p95_ms"], stages[0]["p50_ms"])
+
+    def test_saturation_point(self):
+        self.assertIsNone(saturation_point([stage(1, 2.0), stage(2, 4.0)]))
+        # Durchsatz steigt nicht mehr
+        self.assertEqual(saturation_point([stage(1, 2.0), stage(2, 4.0), stage(4, 4.1)]), 4)
+        # Deadline gerissen
+        self.assertEqual(saturation_point([stage(1, 2.0), stage(2, 4.0, p95=9000)]), 2)
+
+    def test_parse_mix_rejects_unknown_intent(self):
+        self.assertEqual(parse_mix("leave=1,advice"), {"leave": 1.0, "advice": 1.0})
+        with self.assertRaises(ValueError):
+            parse_mix("dance=1")
+
+
+if __name__ == "__main__":
+    unittest.main()
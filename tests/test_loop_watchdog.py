@@ -0,0 +1,90 @@
+import sys
+import os
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+from fastapi import FastAPI
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from diagnostics.loop_watchdog import LoopWatchdog, RouteTagMiddleware
+from genai_client import client as genai_client
+
+ADVICE_PAYLOAD = {
+    "request": {
+        "type": "IntentRequest",
+        "intent": {"name": "EnergyAdviceIntent", "slots": {"device": {"name": "device", "value": "Waschmaschine"}}},
+    }
+}
+
+
+def blocking_work(seconds):
+    time.sleep(seconds)
+
+
+class SlowSyncClient:
+    """Sync `generate_content` mit Latenz – darf den Loop nur im Thread belasten."""
+
+    def __init__(self, latency_seconds):
+        self.latency_seconds = latency_seconds
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, *, model, contents, config=None):
+        time.sleep(self.latency_seconds)
+        return SimpleNamespace(text="Ja, mach an!", candidates=[])
+
+
+class TestLoopWatchdog(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reports_stack_of_blocking_code_per_route(self):
+        app = FastAPI()
+        app.add_middleware(RouteTagMiddleware)
+
+        @app.get("/blockiert")
+        async def blocking_route():
+            blocking_work(0.2)
+            return {}
+
+        async with LoopWatchdog(threshold_ms=50) as watchdog:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+                await http_client.get("/blockiert")
+            await asyncio.sleep(0.05)
+
+        self.assertEqual(watchdog.stalls_per_route, {"GET /blockiert": 1})
+        stall = watchdog.stalls[0]
+        self.assertIn("blocking_work", "".join(stall.stack))
+        self.assertGreaterEqual(stall.blocked_ms, 150)
+
+    async def test_disabled_by_default(self):
+        watchdog = LoopWatchdog(threshold_ms=0)
+        async with watchdog:
+            blocking_work(0.05)
+        self.assertFalse(watchdog.enabled)
+        self.assertEqual(watchdog.snapshot()["recent_stalls"], [])
+
+    async def test_alexa_webhook_does_not_block_loop(self):
+        """Regression: LLM-Latenz (sync SDK) darf den Event Loop nicht blockieren."""
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = {"energy_context": {"netz_saldo_watt": -2500.0}, "energy_history": {}}
+
+        with patch.object(main, "HaService", lambda: ha_service), \
+                patch.object(genai_client, "_client_instance", SlowSyncClient(0.3)):
+            async with LoopWatchdog(threshold_ms=100) as watchdog:
+                transport = httpx.ASGITransport(app=main.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+                    resp = await http_client.post("/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, json=ADVICE_PAYLOAD)
+
+        self.assertEqual(resp.json()["response"]["outputSpeech"]["text"], "Ja, mach an!")
+        self.assertEqual(watchdog.stalls_per_route, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+import sys
+import os
+import json
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from ha_service import main as ha_main
+from ha_service.main import HaService, TtlCache
+from helper_scripts.fake_backends import BackgroundServer, create_fake_ha_app
+from warming.predictive_warmer import PredictiveWarmer
+from recording.recorder import Recording
+from warming.usage_histogram import UsageHistogram
+
+
+def record(intent_name, when):
+    return {"recorded_at": when.isoformat(), "payload": {"request": {"intent": {"name": intent_name}}}}
+
+
+def weekday_mornings(intent_name, hour, weeks=4):
+    # 2026-01-05 ist ein Montag
+    return [record(intent_name, datetime(2026, 1, 5, hour, 10) + timedelta(days=7 * w + d)) for w in range(weeks) for d in range(5)]
+
+
+class TestUsageHistogram(unittest.TestCase):
+
+    def test_hot_slots_per_intent(self):
+        histogram = UsageHistogram()
+        histogram.learn(weekday_mornings("LeaveHomeIntent", 7) + weekday_mornings("EnergyAdviceIntent", 12))
+        histogram.learn([record("StatusInfoIntent", datetime(2026, 1, 5, 20, 0))])  # Einzelfall
+
+        hot = histogram.hot_slots(min_requests=3, max_hours_per_day=6)
+
+        self.assertEqual(hot["LeaveHomeIntent"], {(d, 7) for d in range(5)})
+        self.assertEqual(hot["EnergyAdviceIntent"], {(d, 12) for d in range(5)})
+        self.assertNotIn("StatusInfoIntent", hot)
+
+    def test_hours_per_day_are_bounded(self):
+        histogram = UsageHistogram()
+        for hour in range(6, 12):
+            histogram.learn(weekday_mornings("StatusInfoIntent", hour, weeks=hour))
+
+        hot = histogram.hot_slots(min_requests=3, max_hours_per_day=2)
+
+        # Die zwei häufigsten Stunden gewinnen
+        self.assertEqual({hour for _, hour in hot["StatusInfoIntent"]}, {10, 11})
+
+
+class TestHistogramFromRecordings(unittest.TestCase):
+
+    def test_reads_only_timestamp_and_request_of_each_recording(self):
+        lines = []
+        for when in [datetime(2026, 1, 5, 7, 10), datetime(2026, 1, 6, 7, 20)]:
+            recording = Recording({"request": {"type": "IntentRequest", "intent": {"name": "LeaveHomeIntent"}}})
+            recording.recorded_at = when.isoformat()
+            recording.add_ha_call("get_smart_home_context", [], {"sensors": [{"eid": f"sensor.{i}"} for i in range(2000)]}, 5.0)
+            lines.append(json.dumps(recording.to_record({"response": {}}), ensure_ascii=False))
+        # HA-Contexts und LLM-Payloads hinter dem Request werden gar nicht geparst (hier abgeschnitten)
+        lines[1] = lines[1][: lines[1].index('"ha_calls"') + 30]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recordings.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines + ["kein json"]) + "\n")
+            histogram = UsageHistogram.from_recordings(path)
+
+        self.assertEqual(histogram.counts["LeaveHomeIntent"], {(0, 7): 1, (1, 7): 1})
+
+
+class TestPredictiveWarmer(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        histogram = UsageHistogram()
+        histogram.learn(weekday_mornings("LeaveHomeIntent", 7) + weekday_mornings("EnergyAdviceIntent", 12))
+        self.ha_service = AsyncMock()
+        self.precomputer = MagicMock(refresh_once=AsyncMock(return_value=[]))
+        self.now = datetime(2026, 3, 2, 6, 50)  # Montag
+        self.warmer = PredictiveWarmer(
+            ha_service_factory=lambda: self.ha_service,
+            advice_precomputer=self.precomputer,
+            histogram_loader=lambda: histogram,
+            lead_minutes=15,
+            min_requests=3,
+            max_hours_per_day=6,
+            clock=lambda: self.now,
+        )
+
+    async def test_relearns_off_the_event_loop(self):
+        loader_threads = []
+        loader = self.warmer.histogram_loader
+
+        def tracking_loader():
+            loader_threads.append(threading.get_ident())
+            return loader()
+
+        self.warmer.histogram_loader = tracking_loader
+        await self.warmer.warm_once()
+
+        self.assertEqual(len(loader_threads), 1)
+        self.assertNotEqual(loader_threads[0], threading.get_ident())
+        self.assertIn("LeaveHomeIntent", self.warmer.hot_slots)
+
+    async def test_warms_shortly_before_expected_use(self):
+        self.assertEqual(await self.warmer.warm_once(), ["LeaveHomeIntent"])
+        self.ha_service.get_smart_home_context.assert_awaited_once()
+        self.precomputer.refresh_once.assert_not_awaited()
+
+    async def test_precomputes_advice_in_its_window(self):
+        self.now = datetime(2026, 3, 2, 12, 5)
+        self.assertEqual(await self.warmer.warm_once(), ["EnergyAdviceIntent"])
+        self.precomputer.refresh_once.assert_awaited_once()
+
+    async def test_no_ha_load_outside_windows(self):
+        for now in [datetime(2026, 3, 2, 3, 0), datetime(2026, 3, 2, 9, 30), datetime(2026, 3, 7, 7, 0)]:
+            self.now = now
+            self.assertEqual(await self.warmer.warm_once(), [])
+        self.ha_service.get_smart_home_context.assert_not_awaited()
+        self.assertEqual(self.warmer.warmups, 0)
+
+
+class TestHaServiceCaches(unittest.IsolatedAsyncioTestCase):
+
+    async def test_context_and_history_caches(self):
+        requests = []
+        app = create_fake_ha_app(entity_count=10, latency_ms=0)
+        app.middleware("http")(self._count(requests))
+        server = BackgroundServer(app)
+        url = server.start()
+
+        def service():
+            s = HaService()
+            s.base_url, s.token = url, "test"
+            return s
+
+        try:
+            with patch.object(ha_main, "context_cache", TtlCache(60)), patch.object(ha_main, "history_cache", TtlCache(3600)):
+                first = await service().get_smart_home_context()
+                after_first = len(requests)
+                second = await service().get_smart_home_context()
+                self.assertIs(first, second)
+                self.assertEqual(len(requests), after_first)
+
+                # Nach dem Schalten ist der Context veraltet, die Historie bleibt gecacht
+                await service().execute_ha_service("light", "turn_off", "light.load_3")
+                await service().get_smart_home_context()
+                history_calls = [r for r in requests[after_first:] if "/api/history/" in r]
+                self.assertEqual(history_calls, [])
+                self.assertIn("/api/states", requests[after_first:])
+        finally:
+            server.stop()
+
+    async def test_area_map_is_cached_across_fetches(self):
+        requests = []
+        app = create_fake_ha_app(entity_count=10, latency_ms=0)
+        app.middleware("http")(self._count(requests))
+        server = BackgroundServer(app)
+        url = server.start()
+        try:
+            with patch.object(ha_main, "context_cache", TtlCache(0)), patch.object(ha_main, "area_cache", TtlCache(3600)):
+                for _ in range(2):
+                    s = HaService()
+                    s.base_url, s.token = url, "test"
+                    ctx = await s.get_smart_home_context()
+                    self.assertTrue(ctx["controllable_devices"][0].area.startswith("Raum "))
+        finally:
+            await ha_main.close_http_client()
+            server.stop()
+
+        self.assertEqual(requests.count("/api/states"), 2)
+        self.assertEqual(requests.count("/api/template"), 1)
+
+    async def test_history_cache_keys_on_the_queried_hour(self):
+        """Gecachte Zählerstände gehören zu dem Zeitpunkt, der auch abgefragt wurde."""
+        history = []
+        app = create_fake_ha_app(entity_count=10, latency_ms=0)
+
+        @app.middleware("http")
+        async def record_history(request, call_next):
+            if "/api/history/period/" in request.url.path:
+                history.append(request.url.path.rsplit("/", 1)[-1])
+            return await call_next(request)
+
+        server = BackgroundServer(app)
+        url = server.start()
+        clock = {"now": datetime(2026, 3, 10, 10, 10, 42)}
+
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock["now"]
+
+        def service():
+            s = HaService()
+            s.base_url, s.token = url, "test"
+            return s
+
+        try:
+            with patch.object(ha_main, "context_cache", TtlCache(0)), patch.object(ha_main, "history_cache", TtlCache(3600)), \
+                    patch.object(ha_main, "datetime", FakeDatetime):
+                await service().get_smart_home_context()
+                self.assertEqual(len(history), 7 * len(ha_main.HISTORY_MAPPING))
+                self.assertIn("2026-03-09T10:00:00", history)
+                self.assertTrue(all(ts.endswith(":00:00") for ts in history))
+
+                # Gleiche Stunde -> alles aus dem Cache
+                clock["now"] = datetime(2026, 3, 10, 10, 55)
+                await service().get_smart_home_context()
+                self.assertEqual(len(history), 7 * len(ha_main.HISTORY_MAPPING))
+
+                # Neue Stunde -> neue Zeitpunkte, kein alter Zählerstand
+                clock["now"] = datetime(2026, 3, 10, 11, 5)
+                await service().get_smart_home_context()
+                self.assertEqual(len(history), 14 * len(ha_main.HISTORY_MAPPING))
+                self.assertIn("2026-03-09T11:00:00", history)
+        finally:
+            await ha_main.close_http_client()
+            server.stop()
+
+    @staticmethod
+    def _count(requests):
+        async def middleware(request, call_next):
+            requests.append(request.url.path if "/history/" not in request.url.path else "/api/history/")
+            return await call_next(request)
+        return middleware
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import sys
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from google.genai.errors import ClientError
+
+from category_handler import advice_handler
+from category_handler.advice_handler import AdviceHandler
+from genai_client.hedging import HedgingPolicy
+from genai_client.prompt_cache import PromptCache
+from genai_client.scheduler import LlmScheduler
+from genai_client.usage import UsageTracker, UsageTrackingClient
+
+ENERGY = {"netz_saldo_watt": -2500.0, "pv_aktuell_watt": 4200.0}
+
+
+class FakeCachingClient:
+    """
+    Fake Gemini Client mit `caches.create/update`: Rechnet wie Gemini die Tokens eines
+    Cached Content als `cached_content_token_count` ab und merkt sich alle Configs.
+    """
+
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.configs = []
+        self.contents = []
+        self.models_used = []
+        self.expired = set()
+        self.caches = SimpleNamespace(create=self.create, update=self.update)
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def create(self, *, model, config):
+        name = f"cachedContents/{len(self.created) + 1}"
+        self.created.append((name, model, config))
+        return SimpleNamespace(name=name)
+
+    def update(self, *, name, config):
+        self.updated.append((name, config))
+
+    def generate_content(self, *, model, contents, config=None):
+        self.configs.append(config)
+        self.contents.append(contents)
+        self.models_used.append(model)
+        cached_name = (config or {}).get("cached_content")
+        if cached_name in self.expired:
+            raise ClientError(404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}})
+        # Wie Gemini: Cached Content nur mit dem Modell, für das er angelegt wurde
+        if cached_name and any(name == cached_name and m != model for name, m, _ in self.created):
+            raise ClientError(400, {"error": {"code": 400, "message": "Model mismatch for cached content", "status": "INVALID_ARGUMENT"}})
+        static_tokens = len(str(config.get("system_instruction", ""))) // 4 if config else 0
+        cached_tokens = 1000 if cached_name else 0
+        usage = SimpleNamespace(
+            prompt_token_count=len(contents) // 4 + static_tokens + cached_tokens,
+            candidates_token_count=10,
+            cached_content_token_count=cached_tokens,
+        )
+        return SimpleNamespace(text="Ja, mach an!", candidates=[], usage_metadata=usage)
+
+
+class TestPromptCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = PromptCache(ttl_seconds=600, min_tokens=0, clock=lambda: self.now)
+        self.scheduler = LlmScheduler(prompt_cache=self.cache)
+        self.policy = HedgingPolicy(secondary_model="", scheduler=self.scheduler)
+        self.client = FakeCachingClient()
+
+    async def _advice(self, device="Waschmaschine"):
+        with patch.object(advice_handler, "get_client", return_value=self.client), \
+                patch.object(advice_handler, "hedging_policy", self.policy):
+            return await AdviceHandler().generate_advice({"energy_context": ENERGY, "energy_history": {}}, [device])
+
+    async def test_static_part_is_cached_once_and_reused(self):
+        for device in ["Waschmaschine", "Trockner", "Auto"]:
+            text, _ = await self._advice(device)
+            self.assertEqual(text, "Ja, mach an!")
+
+        self.assertEqual(len(self.client.created), 1)
+        name, _, config = self.client.created[0]
+        self.assertIn("[ENTSCHEIDUNGS-LOGIK]", config["system_instruction"])
+        self.assertIn("tools", config)
+        for request_config in self.client.configs:
+            self.assertEqual(request_config, {"cached_content": name})
+        # Nur der kleine dynamische Teil geht pro Request mit
+        self.assertNotIn("[ENTSCHEIDUNGS-LOGIK]", self.client.contents[-1])
+        self.assertIn("Trockner", self.client.contents[1])
+        self.assertEqual(self.cache.hits, 3)
+
+    async def test_refreshes_before_expiry_and_recreates_after(self):
+        await self._advice()
+        self.now = 580.0  # im letzten Zehntel der TTL -> verlängern
+        await self._advice()
+        self.assertEqual(len(self.client.updated), 1)
+        self.assertEqual(len(self.client.created), 1)
+
+        self.now = 2000.0  # abgelaufen -> neu anlegen
+        await self._advice()
+        self.assertEqual(len(self.client.created), 2)
+
+    async def test_small_or_rejected_prompts_are_sent_inline(self):
+        self.cache.min_tokens = 100_000
+        await self._advice()
+        self.assertEqual(self.client.created, [])
+        self.assertIn("system_instruction", self.client.configs[0])
+
+        def reject(**kwargs):
+            raise ClientError(400, {"error": {"code": 400, "message": "too small", "status": "INVALID_ARGUMENT"}})
+
+        self.cache = PromptCache(ttl_seconds=600, min_tokens=0, clock=lambda: self.now)
+        self.scheduler.prompt_cache = self.cache
+        self.client.caches.create = reject
+        await self._advice()
+        await self._advice()
+        self.assertEqual((self.cache.failures, self.cache.inline), (1, 2))
+
+    async def test_server_side_expiry_falls_back_to_inline(self):
+        await self._advice()
+        self.client.expired.add(self.client.created[0][0])
+
+        text, _ = await self._advice()
+
+        self.assertEqual(text, "Ja, mach an!")
+        self.assertIn("system_instruction", self.client.configs[-1])
+        await self._advice()
+        self.assertEqual(len(self.client.created), 2)
+
+    async def test_cached_tokens_reach_usage_tracking(self):
+        tracker = UsageTracker()
+        self.client = UsageTrackingClient(self.client, tracker)
+        await self._advice()
+
+        stats = next(iter(tracker.totals.values()))
+        self.assertEqual(stats.cached_tokens, 1000)
+
+    async def test_cache_is_created_for_the_budget_model(self):
+        """Budget überschritten -> Cached Content gleich für das Budget-Modell, kein 400 mit Neuversuch."""
+        tracker = UsageTracker(daily_token_budget=100, budget_model="budget-model")
+        tracker._today["ADVICE"] = 500
+        fake = self.client
+        self.client = UsageTrackingClient(fake, tracker)
+
+        for device in ["Waschmaschine", "Trockner"]:
+            text, _ = await self._advice(device)
+            self.assertEqual(text, "Ja, mach an!")
+
+        self.assertEqual([model for _, model, _ in fake.created], ["budget-model"])
+        self.assertEqual(fake.models_used, ["budget-model", "budget-model"])
+        self.assertTrue(all("cached_content" in config for config in fake.configs))
+        self.assertEqual(self.cache.hits, 2)
+
+
+class TestHandlerPromptSplit(unittest.TestCase):
+
+    def test_dynamic_prompt_contains_only_live_values(self):
+        prompt = AdviceHandler().build_prompt({"energy_context": ENERGY, "energy_history": {"Wallbox": [1.0]}}, ["Auto"])
+
+        self.assertIn("-2500.0", prompt)
+        self.assertIn("Wallbox", prompt)
+        self.assertNotIn("BEISPIELE", prompt)
+        self.assertLess(len(prompt), len(advice_handler.SYSTEM_INSTRUCTION) / 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import sys
+import os
+import json
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from genai_client import client as genai_client
+
+SMART_HOME_CONTEXT = {
+    "energy_context": {"netz_saldo_watt": -2500.0, "haus_power": 450.0},
+    "energy_history": {},
+    "controllable_devices": [],
+    "sensors": [],
+}
+
+
+class FakeStreamingClient:
+    """Liefert die Chunks über `aio.models.generate_content_stream` wie das SDK."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.prompts = []
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self.generate_content_stream))
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        self.prompts.append(contents)
+
+        async def iterate():
+            for chunk in self.chunks:
+                yield SimpleNamespace(text=chunk)
+
+        return iterate()
+
+
+class SlowFakeClient:
+    """Sync `models.generate_content` mit fester Latenz (wie der echte Client im Thread)."""
+
+    def __init__(self, latency_seconds):
+        self.latency_seconds = latency_seconds
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, *, model, contents, config=None):
+        time.sleep(self.latency_seconds)
+        return SimpleNamespace(text="Antwort.", candidates=[])
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestQueryEndpoint(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.ha_service = AsyncMock()
+        self.ha_service.get_smart_home_context.return_value = SMART_HOME_CONTEXT
+        self.patchers = [patch.object(main, "HaService", lambda: self.ha_service)]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+
+    async def _query(self, text, token=ALEXA_ACCESS_TOKEN):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+            return await http_client.post("/query", params={"token": token}, json={"text": text})
+
+    async def test_streams_llm_tokens(self):
+        fake_client = FakeStreamingClient(["Ja, ", "mach ", "an!"])
+        with patch.object(genai_client, "_client_instance", fake_client):
+            resp = await self._query("Lohnt sich die Waschmaschine jetzt?")
+
+        self.assertEqual(resp.headers["content-type"], "text/event-stream; charset=utf-8")
+        events = parse_sse(resp.text)
+        self.assertEqual(events[0], ("category", {"category": "ADVICE"}))
+        self.assertEqual([data["text"] for event, data in events if event == "token"], ["Ja, ", "mach ", "an!"])
+        self.assertEqual(events[-1][0], "done")
+        self.assertIn("Lohnt sich die Waschmaschine jetzt?", fake_client.prompts[0])
+
+    async def test_template_answer_is_single_token(self):
+        resp = await self._query("Wie ist der Status von Strom?")
+        events = parse_sse(resp.text)
+
+        self.assertEqual(events[0], ("category", {"category": "INFO"}))
+        self.assertEqual(
+            events[1], ("token", {"text": "Das Haus verbraucht gerade 450 Watt. Wir speisen 2500 Watt ins Netz ein."})
+        )
+        self.assertEqual(events[-1][0], "done")
+
+    async def test_invalid_token(self):
+        resp = await self._query("Licht an", token="falsch")
+        self.assertEqual(resp.status_code, 403)
+
+
+
+class TestBatchQueryEndpoint(unittest.IsolatedAsyncioTestCase):
+
+    async def _batch(self, queries):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+            return await http_client.post("/query/batch", params={"token": ALEXA_ACCESS_TOKEN}, json={"queries": queries})
+
+    async def test_shared_context_and_concurrent_handlers(self):
+        """Context wird einmal geholt, LLM-Aufrufe laufen parallel statt nacheinander."""
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = SMART_HOME_CONTEXT
+        queries = ["Lohnt sich Waschmaschine?", "Lohnt sich Trockner?", "Wann soll ich das Auto laden?"]
+
+        with patch.object(main, "HaService", lambda: ha_service), \
+                patch.object(genai_client, "_client_instance", SlowFakeClient(0.2)):
+            start = time.perf_counter()
+            resp = await self._batch(queries)
+            duration = time.perf_counter() - start
+
+        body = resp.json()
+        self.assertEqual([item["query"] for item in body["items"]], queries)
+        self.assertTrue(all(item["text"] == "Antwort." and item["category"] == "ADVICE" for item in body["items"]))
+        ha_service.get_smart_home_context.assert_awaited_once()
+        self.assertLess(duration, 0.5)
+
+    async def test_errors_are_reported_per_item(self):
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.side_effect = Exception("HA nicht erreichbar")
+
+        with patch.object(main, "HaService", lambda: ha_service):
+            resp = await self._batch(["Lohnt sich Waschmaschine?"])
+
+        item = resp.json()["items"][0]
+        self.assertEqual(item["category"], "ADVICE")
+        self.assertEqual(item["error"], "HA nicht erreichbar")
+        self.assertIsNone(item["text"])
+
+
+if __name__ == "__main__":
+    unittest.main()
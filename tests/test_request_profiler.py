@@ -0,0 +1,121 @@
+import sys
+import os
+import json
+import pstats
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from diagnostics.request_profiler import ProfilingMiddleware, RequestProfiler, current_profile
+from genai_client import client as genai_client
+
+PROFILE_TOKEN = "geheim"
+
+ENERGY_ADVICE_PAYLOAD = {
+    "version": "1.0",
+    "session": {"new": True, "sessionId": "test-session-id"},
+    "request": {
+        "type": "IntentRequest",
+        "intent": {"name": "EnergyAdviceIntent", "slots": {"device": {"name": "device", "value": "Waschmaschine"}}},
+    },
+}
+
+SMART_HOME_CONTEXT = {
+    "energy_context": {"netz_saldo_watt": -2500.0},
+    "energy_history": {},
+    "controllable_devices": [],
+    "sensors": [],
+}
+
+
+class FakeGenAiClient:
+    def __init__(self, text):
+        part = SimpleNamespace(text=text, function_call=None)
+        self.response = SimpleNamespace(text=text, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, **kwargs):
+        return self.response
+
+
+class TestRequestProfiler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.profiler = RequestProfiler(profile_dir=self.tmp_dir.name, token=PROFILE_TOKEN, sample_interval_ms=1)
+        self.ha_service = AsyncMock()
+        self.ha_service.get_smart_home_context.return_value = SMART_HOME_CONTEXT
+        self.patchers = [
+            patch.object(main, "HaService", lambda: self.ha_service),
+            patch.object(genai_client, "_client_instance", FakeGenAiClient("Ja, mach an!")),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+        self.tmp_dir.cleanup()
+
+    async def _post(self, headers=None, params=None):
+        app = ProfilingMiddleware(main.app, profiler=self.profiler)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+            return await http_client.post(
+                "/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN, **(params or {})}, headers=headers, json=ENERGY_ADVICE_PAYLOAD
+            )
+
+    async def test_profiled_request_writes_profile_stacks_and_stages(self):
+        resp = await self._post(headers={"X-Profile-Token": PROFILE_TOKEN})
+
+        self.assertEqual(resp.json()["response"]["outputSpeech"]["text"], "Ja, mach an!")
+        profile_id = resp.headers["x-profile-id"]
+        base = os.path.join(self.tmp_dir.name, profile_id)
+
+        stats = pstats.Stats(f"{base}.pstats")
+        self.assertTrue(any(func[2] == "process_alexa_payload" for func in stats.stats))
+        with open(f"{base}.folded", encoding="utf-8") as f:
+            for line in f:
+                stack, count = line.rsplit(" ", 1)
+                self.assertGreater(int(count), 0)
+                self.assertNotIn(" ", stack.split(";")[0])
+
+        with open(f"{base}.json", encoding="utf-8") as f:
+            summary = json.load(f)
+        self.assertEqual((summary["path"], summary["status"]), ("/alexa-webhook", 200))
+        kinds = [(stage["kind"], stage["name"]) for stage in summary["stages"]]
+        self.assertIn(("ha", "get_smart_home_context"), kinds)
+        self.assertIn("llm_queue", [kind for kind, _ in kinds])
+        self.assertIn("llm", [kind for kind, _ in kinds])
+        self.assertIsNone(current_profile())
+
+    async def test_query_flag_works_too(self):
+        resp = await self._post(params={"profile": PROFILE_TOKEN})
+        self.assertIn("x-profile-id", resp.headers)
+
+    async def test_without_flag_or_with_wrong_token_nothing_is_profiled(self):
+        resp = await self._post()
+        self.assertNotIn("x-profile-id", resp.headers)
+
+        with self.assertLogs("diagnostics.request_profiler", level="WARNING"):
+            resp = await self._post(headers={"X-Profile-Token": "falsch"})
+        self.assertNotIn("x-profile-id", resp.headers)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+        self.assertEqual(self.profiler.profiled, 0)
+
+    def test_disabled_without_dir_or_token(self):
+        self.assertFalse(RequestProfiler(profile_dir=None, token=PROFILE_TOKEN).enabled)
+        self.assertFalse(RequestProfiler(profile_dir=self.tmp_dir.name, token=None).enabled)
+        self.assertFalse(any(m.cls is ProfilingMiddleware for m in main.app.user_middleware))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import sys
+import os
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from category_handler.home_status import active_lights
+from category_handler.info_handler import InfoHandler
+from category_handler.leave_home_handler import LeaveHomeHandler
+from response_templates.german import join_natural, render_leave_home, render_status_info
+
+ENERGY_CONTEXT = {
+    "netz_saldo_watt": -1234.6,
+    "pv_aktuell_watt": 3100.0,
+    "pv_rest_prognose_kwh": 5.25,
+    "batterie_haus_prozent": 85.0,
+    "batterie_auto_prozent": 61.4,
+    "haus_power": 452.3,
+}
+
+
+def light(eid, area, name=None):
+    return {"eid": eid, "name": name or eid, "area": area, "state": "on"}
+
+
+def opening(eid, area, device_class):
+    return {"eid": eid, "area": area, "state": "on", "device_class": device_class}
+
+
+class TestJoinNatural(unittest.TestCase):
+
+    def test_join_natural(self):
+        self.assertEqual(join_natural([]), "")
+        self.assertEqual(join_natural(["Küche"]), "Küche")
+        self.assertEqual(join_natural(["Wohnzimmer", "Küche"]), "Wohnzimmer und Küche")
+        self.assertEqual(join_natural(["Wohnzimmer", "Küche", "Bad"]), "Wohnzimmer, Küche und Bad")
+        self.assertEqual(join_natural(["Küche", "Küche", "Bad"]), "Küche und Bad")
+
+
+class TestLeaveHomeTemplate(unittest.TestCase):
+    """Golden Outputs: Änderungen an den Formulierungen müssen hier bewusst nachgezogen werden."""
+
+    def test_all_safe(self):
+        self.assertEqual(render_leave_home([], [], []), "Alles sicher, schönen Tag!")
+
+    def test_lights_grouped_by_area(self):
+        lights = [light("light.decke", "Wohnzimmer"), light("light.spots", "Küche"), light("light.stehlampe", "Wohnzimmer")]
+        self.assertEqual(
+            render_leave_home([], lights, []),
+            "Licht an: Wohnzimmer und Küche. Soll ich die Lichter ausschalten?",
+        )
+
+    def test_everything(self):
+        openings = [
+            opening("binary_sensor.fenster_gast", "Gast", "window"),
+            opening("binary_sensor.fenster_bad", "Bad", "window"),
+            opening("binary_sensor.haustuer", "Flur", "door"),
+        ]
+        consumers = [{"eid": "sensor.waschmaschine", "area": "Keller", "state": "1200.4"}]
+        self.assertEqual(
+            render_leave_home(openings, [light("light.flur", None, "Licht Flur")], consumers),
+            "Fenster offen: Gast und Bad. Tür offen: Flur. Licht an: Licht Flur. "
+            "Hoher Verbrauch: Keller mit 1200 Watt. Soll ich die Lichter ausschalten?",
+        )
+
+    def test_light_without_area_uses_friendly_name_never_entity_id(self):
+        context = {"controllable_devices": [
+            {"eid": "light.decke", "name": "Decke", "area": "Wohnzimmer", "state": "on", "device_class": "light.decke"},
+            {"eid": "light.flur_spot_2", "name": "Spot Flur", "area": None, "state": "on", "device_class": "light.flur_spot_2"},
+        ]}
+        self.assertEqual(
+            render_leave_home([], active_lights(context), []),
+            "Licht an: Wohnzimmer und Spot Flur. Soll ich die Lichter ausschalten?",
+        )
+        # Ohne Bereich und ohne Anzeigenamen (Name = Entity-ID) wird kein Raum genannt
+        self.assertEqual(
+            render_leave_home([], [light("light.flur_spot_2", None)], []),
+            "Licht an. Soll ich die Lichter ausschalten?",
+        )
+
+    def test_without_lights_says_goodbye(self):
+        openings = [opening("binary_sensor.fenster_gast", "Gast", "window")]
+        self.assertEqual(render_leave_home(openings, [], []), "Fenster offen: Gast. Schönen Tag!")
+
+
+class TestStatusTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.context = {
+            "energy_context": dict(ENERGY_CONTEXT),
+            "sensors": [opening("binary_sensor.fenster_kueche", "Küche", "window")],
+        }
+
+    def test_subjects(self):
+        golden = {
+            "Batterie": "Der Hausakku ist bei 85 Prozent.",
+            "Akku vom Auto": "Das Auto ist zu 61 Prozent geladen.",
+            "Prognose": "Heute sind noch 5,2 kWh PV-Ertrag zu erwarten. Aktuell erzeugt die Anlage 3100 Watt.",
+            "Strom": "Das Haus verbraucht gerade 452 Watt. Wir speisen 1235 Watt ins Netz ein.",
+            "Fenster": "Fenster offen: Küche.",
+        }
+        for subject, expected in golden.items():
+            with self.subTest(subject=subject):
+                self.assertEqual(render_status_info(subject, self.context), expected)
+
+    def test_grid_import(self):
+        self.context["energy_context"]["netz_saldo_watt"] = 300.0
+        self.assertEqual(
+            render_status_info("Strom", self.context),
+            "Das Haus verbraucht gerade 452 Watt. Aus dem Netz beziehen wir 300 Watt.",
+        )
+
+    def test_all_windows_closed(self):
+        self.context["sensors"] = []
+        self.assertEqual(render_status_info("Fenster", self.context), "Alle Fenster und Türen sind zu.")
+
+    def test_unknown_or_missing_values_fall_back(self):
+        self.context["energy_context"]["batterie_haus_prozent"] = "N/A"
+        self.assertIsNone(render_status_info("Batterie", self.context))
+        self.assertIsNone(render_status_info("Heizung", self.context))
+
+    def test_subject_synonyms_and_articles(self):
+        self.assertEqual(render_status_info("die Fenster", self.context), "Fenster offen: Küche.")
+        self.assertEqual(render_status_info(" Hausverbrauch? ", self.context), render_status_info("Strom", self.context))
+        # Ganzer Beispielsatz des StatusInfoIntent (/query)
+        self.assertEqual(render_status_info("Sind die Fenster offen?", self.context), "Fenster offen: Küche.")
+        self.assertIsNone(render_status_info("Wie ist der Status von Strom gestern?", self.context))
+
+    def test_free_text_is_left_to_the_llm(self):
+        """Stichwörter im Freitext reichen nicht – sonst gäbe es selbstsicher falsche Antworten."""
+        for text in [
+            "Ist der Strom gerade sauber?",
+            "Wie hoch war der Verbrauch gestern?",
+            "Wie viel Strom hat die Wallbox gestern verbraucht?",
+            "Wann geht die Sonne unter?",
+            "Automatisch Rollläden runter?",
+            "Ist die Tür zum Keller offen?",
+        ]:
+            with self.subTest(text=text):
+                self.assertIsNone(render_status_info(text, self.context))
+
+
+class TestHandlersUseTemplates(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_ha_service = AsyncMock()
+        self.mock_client_instance = MagicMock()
+        self.patchers = [
+            patch("category_handler.leave_home_handler.get_client", return_value=self.mock_client_instance),
+            patch("category_handler.info_handler.get_client", return_value=self.mock_client_instance),
+        ]
+        for p in self.patchers:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patchers:
+            p.stop()
+
+    async def test_leave_home_without_llm(self):
+        self.mock_ha_service.get_smart_home_context.return_value = {
+            "controllable_devices": [{"eid": "light.wohnzimmer", "area": "Wohnzimmer", "state": "on", "device_class": "light"}],
+            "sensors": [],
+        }
+        result = await LeaveHomeHandler(use_llm_phrasing=False).execute([], self.mock_ha_service)
+
+        self.assertEqual(result.text, "Licht an: Wohnzimmer. Soll ich die Lichter ausschalten?")
+        self.assertEqual(result.session_attributes["lights_to_turn_off"], ["light.wohnzimmer"])
+        self.mock_client_instance.models.generate_content.assert_not_called()
+
+    async def test_info_without_llm(self):
+        self.mock_ha_service.get_smart_home_context.return_value = {"energy_context": dict(ENERGY_CONTEXT)}
+        result = await InfoHandler(use_llm_phrasing=False).execute(["Batterie"], self.mock_ha_service)
+
+        self.assertEqual(result.text, "Der Hausakku ist bei 85 Prozent.")
+        self.mock_client_instance.models.generate_content.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
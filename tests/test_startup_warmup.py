@@ -0,0 +1,80 @@
+import sys
+import os
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+
+import main
+from warming.startup_warmup import StartupWarmup
+
+SMART_HOME_CONTEXT = {"energy_context": {"netz_saldo_watt": -2500.0}, "energy_history": {}, "controllable_devices": [], "sensors": []}
+
+
+class TestStartupWarmup(unittest.IsolatedAsyncioTestCase):
+
+    async def _ready(self, warmup):
+        with patch.object(main, "startup_warmup", warmup):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+                return await http_client.get("/ready")
+
+    async def test_ready_only_after_all_steps(self):
+        release = asyncio.Event()
+        warmup = StartupWarmup(ha_service_factory=AsyncMock, enabled=True, steps=[("gemini", release.wait)])
+
+        warmup.start()
+        await asyncio.sleep(0)
+        resp = await self._ready(warmup)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.json()["status"], "warming")
+
+        release.set()
+        await warmup._task
+        resp = await self._ready(warmup)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["status"], "ready")
+        self.assertTrue(resp.json()["steps"]["gemini"]["ok"])
+
+    async def test_failing_or_slow_steps_mark_degraded(self):
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = {"energy_context": {}}
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        warmup = StartupWarmup(ha_service_factory=lambda: ha_service, enabled=True, timeout_seconds=0.05)
+        warmup.steps = [("home_assistant", warmup._warm_home_assistant), ("gemini", hang)]
+
+        with self.assertLogs("warming.startup_warmup", level="WARNING"):
+            await warmup.run()
+
+        status = warmup.snapshot()
+        self.assertTrue(status["ready"])
+        self.assertEqual(status["status"], "degraded")
+        self.assertIn("Kein Smart Home Context", status["steps"]["home_assistant"]["error"])
+        self.assertFalse(status["steps"]["gemini"]["ok"])
+
+    async def test_home_assistant_step_builds_context(self):
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = SMART_HOME_CONTEXT
+        warmup = StartupWarmup(ha_service_factory=lambda: ha_service, enabled=True)
+        warmup.steps = [("home_assistant", warmup._warm_home_assistant)]
+
+        await warmup.run()
+
+        ha_service.get_smart_home_context.assert_awaited_once()
+        self.assertEqual(warmup.snapshot()["status"], "ready")
+
+    async def test_without_warmup_ready_immediately(self):
+        resp = await self._ready(StartupWarmup(ha_service_factory=AsyncMock, enabled=False))
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.json()["warmup"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import sys
+import os
+import io
+import json
+import logging
+import queue
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from diagnostics.structured_logging import DroppingQueueHandler, logging_setup, set_request_id
+from genai_client import client as genai_client
+
+ENERGY_ADVICE_PAYLOAD = {
+    "version": "1.0",
+    "session": {"new": True, "sessionId": "test-session-id", "user": {"userId": "u1", "accessToken": "alexa-user-secret"}},
+    "context": {"System": {"apiAccessToken": "eyJ-alexa-api-token"}},
+    "request": {
+        "type": "IntentRequest",
+        "requestId": "amzn1.echo-api.request.1",
+        "intent": {"name": "EnergyAdviceIntent", "slots": {"device": {"name": "device", "value": "Waschmaschine"}}},
+    },
+}
+
+SMART_HOME_CONTEXT = {"energy_context": {"netz_saldo_watt": -2500.0}, "energy_history": {}, "controllable_devices": [], "sensors": []}
+
+
+class LoggingGenAiClient:
+    """Loggt im Thread von `asyncio.to_thread`, wie Retries/Fehler im SDK."""
+
+    def __init__(self):
+        part = SimpleNamespace(text="Ja, mach an!", function_call=None)
+        self.response = SimpleNamespace(text="Ja, mach an!", candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, **kwargs):
+        logging.getLogger("genai_client.fake").info("LLM Call")
+        return self.response
+
+
+class TestStructuredLogging(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+
+    def tearDown(self):
+        logging_setup.configure()
+
+    def _configure(self, **kwargs):
+        logging_setup.configure(stream=self.stream, log_format="json", **kwargs)
+
+    def _lines(self):
+        logging_setup.shutdown()  # Queue leeren
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    async def test_webhook_lines_share_correlation_id_and_hide_tokens(self):
+        self._configure(payload_sample_rate=1.0)
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = SMART_HOME_CONTEXT
+
+        with patch.object(main, "HaService", lambda: ha_service), \
+                patch.object(genai_client, "_client_instance", LoggingGenAiClient()):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+                resp = await http_client.post(
+                    "/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, headers={"X-Request-Id": "req-42"}, json=ENERGY_ADVICE_PAYLOAD
+                )
+
+        self.assertEqual(resp.headers["x-request-id"], "req-42")
+        lines = self._lines()
+        by_logger = {line["logger"]: line for line in lines}
+        for name in ["main", "category_handler.advice_handler", "genai_client.fake"]:
+            self.assertEqual(by_logger[name]["request_id"], "req-42", name)
+
+        request_line = next(line for line in lines if line["msg"].startswith("REQUEST"))
+        self.assertEqual(request_line["alexa_request_id"], "amzn1.echo-api.request.1")
+        self.assertEqual(request_line["payload"]["intent"]["name"], "EnergyAdviceIntent")
+        output = self.stream.getvalue()
+        self.assertNotIn("alexa-user-secret", output)
+        self.assertNotIn("eyJ-alexa-api-token", output)
+
+    async def test_redaction_of_messages_and_structured_fields(self):
+        self._configure()
+        logger = logging.getLogger("ha_service.test")
+        logger.info("Authorization: Bearer abc.def.ghi", extra={"data": {"url": "/alexa-webhook?token=geheim&x=1"}})
+        logger.info("Request", extra={"payload": {"headers": {"Authorization": "Bearer xyz"}, "apiKey": "k", "text": "ok"}})
+
+        first, second = self._lines()
+        self.assertEqual(first["msg"], "Authorization: Bearer ***")
+        self.assertEqual(first["url"], "/alexa-webhook?token=***&x=1")
+        self.assertEqual(second["payload"], {"headers": {"Authorization": "***"}, "apiKey": "***", "text": "ok"})
+
+    async def test_payload_logs_are_sampled_per_request(self):
+        self._configure(payload_sample_rate=0.5)
+        logger = logging.getLogger("main")
+        kept_ids = set()
+        for i in range(200):
+            request_id = set_request_id(f"r{i}")
+            logger.info("REQUEST", extra={"payload": {"n": i}})
+            logger.info("Energie-Werte", extra={"payload": {"n": i}})
+            logger.info("USER OUTPUT")
+            kept_ids.add(request_id)
+
+        lines = self._lines()
+        payload_lines = [line for line in lines if "payload" in line]
+        sampled = {line["request_id"] for line in payload_lines}
+        self.assertEqual(len([line for line in lines if line["msg"] == "USER OUTPUT"]), 200)
+        self.assertTrue(40 < len(sampled) < 160)
+        # Ein gesampelter Request behält alle seine Payload-Logs
+        self.assertEqual(len(payload_lines), 2 * len(sampled))
+        self.assertEqual(logging_setup.snapshot()["payloads_sampled_out"], 2 * (200 - len(sampled)))
+
+    async def test_per_logger_levels(self):
+        self._configure(level="INFO", levels={"ha_service": "WARNING", "genai_client": "DEBUG"})
+        logging.getLogger("ha_service.main").info("leise")
+        logging.getLogger("ha_service.main").warning("laut")
+        logging.getLogger("genai_client.scheduler").debug("debug")
+
+        self.assertEqual([line["msg"] for line in self._lines()], ["laut", "debug"])
+        logging.getLogger("ha_service").setLevel(logging.NOTSET)
+        logging.getLogger("genai_client").setLevel(logging.NOTSET)
+
+    async def test_exceptions_are_formatted_before_queueing(self):
+        self._configure()
+        try:
+            raise ValueError("kaputt")
+        except ValueError:
+            logging.getLogger("main").exception("Fehler")
+
+        line = self._lines()[0]
+        self.assertIn("ValueError: kaputt", line["exc"])
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+        handler.handle(record)
+        handler.handle(record)
+        self.assertEqual(handler.dropped, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
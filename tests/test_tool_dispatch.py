@@ -0,0 +1,99 @@
+import sys
+import os
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+from category_handler.control_handler import ControlHandler
+from category_handler.tool_dispatch import ToolDispatcher
+
+DEVICES = [
+    {"eid": "light.flur", "name": "Licht Flur", "area": "Flur", "state": "on", "device_class": "light"},
+    {"eid": "light.kueche", "name": "Licht Küche", "area": "Küche", "state": "on", "device_class": "light"},
+    {"eid": "light.bad", "name": "Licht Bad", "area": "Bad", "state": "on", "device_class": "light"},
+]
+
+
+def tool_response(*calls):
+    parts = [
+        SimpleNamespace(text=None, function_call=SimpleNamespace(name=name, args=args))
+        for name, args in calls
+    ]
+    return SimpleNamespace(text=None, candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+
+
+def turn_off(eid):
+    return ("control_device", {"entity_id": eid, "action": "turn_off"})
+
+
+class TestToolDispatcher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mock_ha_service = AsyncMock()
+        self.mock_ha_service.execute_ha_service.return_value = True
+
+    async def test_executes_all_calls(self):
+        """Alle Lichter aus -> alle Calls, nicht nur der erste."""
+        response = tool_response(turn_off("light.flur"), turn_off("light.kueche"), turn_off("light.bad"))
+
+        text = await ToolDispatcher(self.mock_ha_service, DEVICES).dispatch(response)
+
+        self.assertEqual(self.mock_ha_service.execute_ha_service.await_count, 3)
+        self.assertEqual(text, "Okay. Ausgeschaltet: Licht Flur, Licht Küche und Licht Bad.")
+
+    async def test_rejects_unknown_entities_and_reports_failures(self):
+        self.mock_ha_service.execute_ha_service.side_effect = lambda dom, act, eid: eid != "light.bad"
+        response = tool_response(
+            turn_off("light.flur"),
+            turn_off("light.bad"),
+            turn_off("lock.haustuer"),
+            ("control_device", {"entity_id": "light.kueche", "action": "explode"}),
+        )
+
+        text = await ToolDispatcher(self.mock_ha_service, DEVICES).dispatch(response)
+
+        self.assertEqual(self.mock_ha_service.execute_ha_service.await_count, 2)
+        self.assertEqual(
+            text, "Ausgeschaltet: Licht Flur. Fehler beim Schalten von Licht Bad. Unbekannt: lock.haustuer und light.kueche."
+        )
+
+    async def test_concurrency_is_bounded(self):
+        running = 0
+        peak = 0
+
+        async def slow_call(dom, act, eid):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return True
+
+        self.mock_ha_service.execute_ha_service.side_effect = slow_call
+        response = tool_response(*(turn_off(d["eid"]) for d in DEVICES))
+
+        await ToolDispatcher(self.mock_ha_service, DEVICES, max_concurrency=2).dispatch(response)
+
+        self.assertEqual(peak, 2)
+
+    async def test_no_tool_calls(self):
+        response = SimpleNamespace(text="Hallo", candidates=[])
+        self.assertIsNone(await ToolDispatcher(self.mock_ha_service, DEVICES).dispatch(response))
+
+    async def test_control_handler_uses_dispatcher(self):
+        self.mock_ha_service.get_smart_home_context.return_value = {"controllable_devices": DEVICES}
+        mock_client_instance = MagicMock()
+        mock_client_instance.models.generate_content.return_value = tool_response(turn_off("light.flur"), turn_off("light.bad"))
+
+        with patch("category_handler.control_handler.get_client", return_value=mock_client_instance):
+            result = await ControlHandler().execute(["alle Lichter aus"], self.mock_ha_service)
+
+        self.assertEqual(result.text, "Okay. Ausgeschaltet: Licht Flur und Licht Bad.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+
+import main
+from const import ALEXA_ACCESS_TOKEN
+from genai_client import client as genai_client
+from recording.recorder import traffic_recorder
+from recording.replay import ReplayGenAiClient, ReplayHaService, load_recordings
+
+ENERGY_ADVICE_PAYLOAD = {
+    "version": "1.0",
+    "session": {"new": True, "sessionId": "test-session-id"},
+    "request": {
+        "type": "IntentRequest",
+        "intent": {"name": "EnergyAdviceIntent", "slots": {"device": {"name": "device", "value": "Waschmaschine"}}},
+    },
+}
+
+SMART_HOME_CONTEXT = {
+    "energy_context": {"netz_saldo_watt": -2500.0},
+    "energy_history": {},
+    "controllable_devices": [],
+    "sensors": [],
+}
+
+
+class FakeGenAiClient:
+    def __init__(self, text):
+        part = SimpleNamespace(text=text, function_call=None)
+        self.response = SimpleNamespace(
+            text=text, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))]
+        )
+        self.models = SimpleNamespace(generate_content=lambda **kwargs: self.response)
+
+
+class TestTrafficRecording(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "recordings.jsonl")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    async def _post(self, payload):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+            resp = await http_client.post("/alexa-webhook", params={"token": ALEXA_ACCESS_TOKEN}, json=payload)
+        return resp.json()
+
+    async def test_record_and_replay_roundtrip(self):
+        """Aufgenommener Request liefert beim Replay die gleiche Antwort, ohne echtes HA/LLM."""
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = SMART_HOME_CONTEXT
+
+        with patch.object(traffic_recorder, "path", self.path), \
+                patch.object(main, "HaService", lambda: ha_service), \
+                patch.object(genai_client, "_client_instance", FakeGenAiClient("Ja, mach an! Wir speisen 2500 Watt ein.")):
+            recorded_response = await self._post(ENERGY_ADVICE_PAYLOAD)
+
+        recordings = load_recordings(self.path)
+        self.assertEqual(len(recordings), 1)
+        record = recordings[0]
+        self.assertEqual(record["payload"], ENERGY_ADVICE_PAYLOAD)
+        self.assertEqual(record["ha_calls"][0]["method"], "get_smart_home_context")
+        self.assertEqual(record["ha_calls"][0]["result"], SMART_HOME_CONTEXT)
+        self.assertEqual(record["llm_calls"][0]["parts"], [{"text": "Ja, mach an! Wir speisen 2500 Watt ein."}])
+        self.assertEqual(record["response"], recorded_response)
+
+        ha_stub = ReplayHaService(record["ha_calls"], time_scale=0)
+        llm_stub = ReplayGenAiClient(record["llm_calls"], time_scale=0)
+        with patch.object(main, "HaService", lambda: ha_stub), \
+                patch.object(genai_client, "_client_instance", llm_stub):
+            replayed_response = await self._post(record["payload"])
+
+        self.assertEqual(replayed_response, recorded_response)
+
+    async def test_recorder_disabled_by_default(self):
+        """Ohne RECORD_TRAFFIC_PATH wird nichts geschrieben."""
+        with patch.object(main, "process_alexa_payload", AsyncMock(return_value={"version": "1.0"})):
+            await self._post(ENERGY_ADVICE_PAYLOAD)
+
+        self.assertFalse(traffic_recorder.enabled)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import sys
+import os
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# 1. Pfad Setup
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../app")))
+
+import httpx
+
+import main
+from category_handler.leave_home_handler import LeaveHomeHandler
+from const import ALEXA_ACCESS_TOKEN
+from genai_client.usage import UsageTracker, UsageTrackingClient, set_usage_labels, usage_labels
+
+
+def usage(prompt, candidates, cached=None):
+    return SimpleNamespace(
+        prompt_token_count=prompt, candidates_token_count=candidates, cached_content_token_count=cached
+    )
+
+
+class FakeClient:
+    """Sync und async Client, der feste Token-Zahlen meldet und das genutzte Modell merkt."""
+
+    def __init__(self):
+        self.models_used = []
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content_stream=self.generate_content_stream)
+        )
+
+    def generate_content(self, *, model, contents, config=None):
+        self.models_used.append(model)
+        return SimpleNamespace(text="Antwort.", usage_metadata=usage(100, 20, 40))
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        self.models_used.append(model)
+
+        async def iterate():
+            yield SimpleNamespace(text="Ja, ", usage_metadata=None)
+            yield SimpleNamespace(text="klar.", usage_metadata=usage(50, 5))
+
+        return iterate()
+
+
+class TestUsageTracker(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tracker = UsageTracker()
+        self.fake = FakeClient()
+        self.client = UsageTrackingClient(self.fake, self.tracker)
+
+    async def test_aggregates_per_category_intent_and_model(self):
+        with usage_labels("ADVICE", "EnergyAdviceIntent"):
+            self.client.models.generate_content(model="m1", contents="x")
+            self.client.models.generate_content(model="m1", contents="x")
+        with usage_labels("ROUTER"):
+            self.client.models.generate_content(model="m1", contents="x")
+
+        rows = {(r["category"], r["intent"], r["model"]): r for r in self.tracker.snapshot()["usage"]}
+        advice = rows[("ADVICE", "EnergyAdviceIntent", "m1")]
+        self.assertEqual(advice["calls"], 2)
+        self.assertEqual(advice["input_tokens"], 200)
+        self.assertEqual(advice["output_tokens"], 40)
+        self.assertEqual(advice["cached_tokens"], 80)
+        self.assertEqual(rows[("ROUTER", "-", "m1")]["calls"], 1)
+        self.assertEqual(self.tracker.tokens_today(), 360)
+
+    async def test_stream_usage_from_last_chunk(self):
+        set_usage_labels("INFO", "query")
+        stream = await self.client.aio.models.generate_content_stream(model="m1", contents="x")
+        texts = [chunk.text async for chunk in stream]
+
+        self.assertEqual(texts, ["Ja, ", "klar."])
+        self.assertEqual(self.tracker.tokens_today("INFO"), 55)
+
+    async def test_budget_switches_to_cheaper_model(self):
+        self.tracker.daily_token_budget = 100
+        self.tracker.budget_model = "billig"
+        with usage_labels("ADVICE"):
+            self.client.models.generate_content(model="teuer", contents="x")
+            self.client.models.generate_content(model="teuer", contents="x")
+
+        self.assertEqual(self.fake.models_used, ["teuer", "billig"])
+
+    async def test_budget_without_budget_model_keeps_model(self):
+        """Standard (AI_BUDGET_MODEL_NAME leer): kein Modellwechsel, nur die Templates greifen."""
+        self.tracker.daily_token_budget = 100
+        with usage_labels("ADVICE"):
+            self.client.models.generate_content(model="teuer", contents="x")
+            self.client.models.generate_content(model="teuer", contents="x")
+
+        self.assertTrue(self.tracker.budget_exceeded())
+        self.assertEqual(self.fake.models_used, ["teuer", "teuer"])
+
+    async def test_category_budget(self):
+        self.tracker.category_budgets = {"ADVICE": 100}
+        with usage_labels("ADVICE"):
+            self.client.models.generate_content(model="m1", contents="x")
+
+        self.assertTrue(self.tracker.budget_exceeded("ADVICE"))
+        self.assertFalse(self.tracker.budget_exceeded("INFO"))
+
+    async def test_leave_home_falls_back_to_template_when_budget_exceeded(self):
+        ha_service = AsyncMock()
+        ha_service.get_smart_home_context.return_value = {"sensors": [], "controllable_devices": []}
+        tracker = UsageTracker(category_budgets={"LEAVE_HOME": 1})
+        tracker._today["LEAVE_HOME"] = 10
+
+        with patch("category_handler.leave_home_handler.usage_tracker", tracker), \
+                patch("category_handler.leave_home_handler.get_client") as get_client:
+            result = await LeaveHomeHandler(use_llm_phrasing=True).execute(["gehen"], ha_service)
+
+        get_client.assert_not_called()
+        self.assertEqual(result.text, "Alles sicher, schönen Tag!")
+
+    async def test_usage_endpoint_requires_token(self):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+            denied = await http_client.get("/usage", params={"token": "falsch"})
+            allowed = await http_client.get("/usage", params={"token": ALEXA_ACCESS_TOKEN})
+
+        self.assertEqual(denied.status_code, 403)
+        self.assertIn("usage", allowed.json())
+
+
+if __name__ == "__main__":
+    unittest.main()